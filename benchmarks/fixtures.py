@@ -0,0 +1,347 @@
+"""Fixture pages for the benchmark suite.
+
+The benchmarks never touch the network: they run against copies of PEP 0
+and a handful of representative PEP pages, stored in benchmarks/fixtures/.
+
+usage: python benchmarks/fixtures.py record
+       python benchmarks/fixtures.py synthesize
+
+`record` downloads the current pages from peps.python.org. `synthesize`
+writes deterministic stand-ins instead, using the same markup as
+peps.python.org (and about the same size: ~700 PEPs in the index, and
+pages with full headers and several sections of body text), for when
+peps.python.org can't be reached. manifest.json records which of the two
+the fixtures are, and the benchmark results include it, so numbers from
+different kinds of fixtures are never compared by accident.
+"""
+
+import datetime
+import hashlib
+import html
+import json
+import pathlib
+import random
+import sys
+from urllib.request import urlopen
+
+FIXTURES_DIR = pathlib.Path(__file__).resolve().parent.joinpath("fixtures")
+RECORD_URL_BASE = "https://peps.python.org/pep-"
+
+# a mix of short and long, old and new, plain and heavily linked PEPs
+PEPS = {
+    1: ("PEP Purpose and Guidelines", "Process", "Active"),
+    8: ("Style Guide for Python Code", "Process", "Active"),
+    20: ("The Zen of Python", "Informational", "Active"),
+    257: ("Docstring Conventions", "Informational", "Active"),
+    484: ("Type Hints", "Standards Track", "Final"),
+    572: ("Assignment Expressions", "Standards Track", "Final"),
+    634: ("Structural Pattern Matching: Specification", "Standards Track", "Final"),
+    683: ("Immortal Objects, Using a Fixed Refcount", "Standards Track", "Final"),
+    695: ("Type Parameter Syntax", "Standards Track", "Final"),
+    3000: ("Python 3000", "Process", "Withdrawn"),
+}
+
+TYPES = ("Informational", "Process", "Standards Track")
+STATUSES = {
+    "Accepted": "A",
+    "Active": "A",
+    "Deferred": "D",
+    "Draft": "",
+    "Final": "F",
+    "Provisional": "P",
+    "Rejected": "R",
+    "Superseded": "S",
+    "Withdrawn": "W",
+}
+AUTHORS = (
+    "Guido van Rossum",
+    "Barry Warsaw",
+    "Nick Coghlan",
+    "Łukasz Langa",
+    "Brett Cannon",
+    "Eric Snow",
+    "Victor Stinner",
+    "Larry Hastings",
+    "Pablo Galindo Salgado",
+    "Steve Dower",
+    "Jelle Zijlstra",
+    "Petr Viktorin",
+)
+WORDS = (
+    "the interpreter module import object type annotation generator syntax "
+    "reference count garbage collector exception bytes literal release "
+    "specification backwards compatibility proposal implementation runtime "
+    "statement expression function class attribute dictionary iteration"
+).split()
+
+PAGE_HEAD = (
+    '<!DOCTYPE html>\n<html lang="en">\n<head>\n'
+    '<meta charset="utf-8">\n'
+    '<meta name="viewport" content="width=device-width, initial-scale=1.0">\n'
+    '<meta name="color-scheme" content="light dark">\n'
+    "<title>{title} | peps.python.org</title>\n"
+    '<link rel="shortcut icon" href="../_static/py.png">\n'
+    '<link rel="canonical" href="https://peps.python.org/pep-{number:04}/">\n'
+    '<link rel="stylesheet" href="../_static/style.css" type="text/css">\n'
+    '<link rel="stylesheet" href="../_static/mq.css" type="text/css">\n'
+    '<link rel="stylesheet" href="../_static/pygments.css" type="text/css">\n'
+    '<meta property="og:title" content="{title}">\n'
+    '<meta property="og:type" content="website">\n'
+    '<meta name="description" content="Python Enhancement Proposals (PEPs)">\n'
+    "</head>\n<body>\n"
+    '<section id="pep-page-section">\n<header>\n<h1>Python Enhancement Proposals</h1>\n'
+    '<ul class="breadcrumbs">\n<li><a href="https://www.python.org/" title="The Python Programming Language">Python</a> &raquo; </li>\n'
+    '<li><a href="../pep-0000/">PEP Index</a> &raquo; </li>\n<li>PEP {number}</li>\n</ul>\n'
+    "</header>\n<article>\n"
+)
+PAGE_FOOT = (
+    "</article>\n"
+    '<nav id="pep-sidebar">\n<h2>Contents</h2>\n{toc}\n'
+    '<br>\n<a id="source" href="https://github.com/python/peps/blob/main/peps/pep-{number:04}.rst">Page Source (GitHub)</a>\n'
+    "</nav>\n</section>\n"
+    '<script src="../_static/colour_scheme.js"></script>\n'
+    '<script src="../_static/wrap_tables.js"></script>\n'
+    '<script src="../_static/sticky_banner.js"></script>\n'
+    "</body>\n</html>\n"
+)
+
+
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(8, 24))]
+    if rng.random() < 0.2:
+        pep = rng.randint(1, 720)
+        words.append(
+            f'<a class="pep reference internal" href="../pep-{pep:04}/" '
+            f'title="PEP {pep}">PEP {pep}</a>'
+        )
+    if rng.random() < 0.2:
+        words.append(
+            f'<code class="docutils literal notranslate"><span class="pre">'
+            f"{rng.choice(WORDS)}()</span></code>"
+        )
+    return " ".join(words).capitalize() + "."
+
+
+def _pep_row(number: int, title: str, pep_type: str, status: str, authors) -> str:
+    title = html.escape(title)
+    return (
+        '<tr class="row-odd">'
+        f'<td><abbr title="{pep_type}, {status}">{pep_type[0]}{STATUSES[status]}</abbr></td>\n'
+        f'<td><a class="pep reference internal" href="../pep-{number:04}/" title="PEP {number} – {title}">{number}</a></td>\n'
+        f'<td><a class="pep reference internal" href="../pep-{number:04}/" title="PEP {number} – {title}">{title}</a></td>\n'
+        f"<td>{', '.join(author.split()[-1] for author in authors)}</td>\n"
+        "</tr>\n"
+    )
+
+
+def _pep_table(rows: list) -> str:
+    return (
+        '<table class="pep-zero-table docutils align-default">\n'
+        '<thead>\n<tr class="row-odd"><th class="head"></th>\n'
+        '<th class="head">PEP</th>\n<th class="head">Title</th>\n'
+        '<th class="head">Authors</th>\n</tr>\n</thead>\n<tbody>\n'
+        + "".join(rows)
+        + "</tbody>\n</table>\n"
+    )
+
+
+def _synthetic_index(rng: random.Random) -> list:
+    peps = []
+    for number in [*range(1, 721), 3000, 3001, 3099, 3100, 8000, 8001, 8016]:
+        if number in PEPS:
+            title, pep_type, status = PEPS[number]
+        else:
+            title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 7)))
+            title = title.title()
+            pep_type = rng.choice(TYPES)
+            status = rng.choice(list(STATUSES))
+        authors = rng.sample(AUTHORS, rng.randint(1, 3))
+        peps.append((number, title, pep_type, status, authors))
+    return peps
+
+
+def _synthetic_pep_zero(rng: random.Random, peps: list) -> str:
+    rows = {pep[0]: _pep_row(*pep) for pep in peps}
+    categories = (
+        ("Meta-PEPs (PEPs about PEPs or Processes)", "Process", "Active"),
+        ("Other Informational PEPs", "Informational", "Active"),
+        ("Accepted PEPs (accepted; may not be implemented yet)", None, "Accepted"),
+        ("Open PEPs (under consideration)", None, "Draft"),
+        ("Finished PEPs (done, with a stable interface)", None, "Final"),
+        ("Historical Meta-PEPs and Informational PEPs", None, "Superseded"),
+        (
+            "Deferred PEPs (postponed pending further research or updates)",
+            None,
+            "Deferred",
+        ),
+        ("Abandoned, Withdrawn, and Rejected PEPs", None, "Rejected"),
+    )
+    body = [
+        PAGE_HEAD.format(
+            title="PEP 0 – Index of Python Enhancement Proposals (PEPs)", number=0
+        ),
+        '<h1 class="page-title">PEP 0 – Index of Python Enhancement Proposals (PEPs)</h1>\n',
+        '<section id="introduction">\n<h2>Introduction</h2>\n<p>'
+        + " ".join(_sentence(rng) for _ in range(6))
+        + "</p>\n</section>\n",
+        '<section id="index-by-category">\n<h2>Index by Category</h2>\n',
+    ]
+    for i, (heading, pep_type, status) in enumerate(categories):
+        matching = [
+            rows[number]
+            for number, _, t, s, _ in peps
+            if s == status and (pep_type is None or t == pep_type)
+        ]
+        body.append(f'<section id="category-{i}">\n<h3>{html.escape(heading)}</h3>\n')
+        body.append(_pep_table(matching) + "</section>\n")
+    body.append("</section>\n")
+    body.append('<section id="numerical-index">\n<h2>Numerical Index</h2>\n')
+    body.append(_pep_table(list(rows.values())) + "</section>\n")
+    body.append('<section id="reserved-pep-numbers">\n<h2>Reserved PEP Numbers</h2>\n')
+    body.append(
+        _pep_table([_pep_row(801, "Reserved", "Informational", "Active", ["Warsaw"])])
+    )
+    body.append("</section>\n")
+    body.append('<section id="pep-types-key">\n<h2>PEP Types Key</h2>\n<ul>\n')
+    body.extend(
+        f"<li><p><strong>{t[0]}</strong> — <em>{t}</em></p></li>\n" for t in TYPES
+    )
+    body.append("</ul>\n</section>\n")
+    body.append('<section id="pep-status-key">\n<h2>PEP Status Key</h2>\n<ul>\n')
+    body.extend(
+        f"<li><p><strong>{code or '&lt;No letter&gt;'}</strong> — <em>{s}</em></p></li>\n"
+        for s, code in STATUSES.items()
+    )
+    body.append("</ul>\n</section>\n")
+    body.append(PAGE_FOOT.format(toc="<ul><li>Introduction</li></ul>", number=0))
+    return "".join(body)
+
+
+def _synthetic_pep(rng: random.Random, pep: tuple) -> str:
+    number, title, pep_type, status, authors = pep
+    fields = [
+        (
+            "Author",
+            ", ".join(
+                html.escape(f"{a} <{a.split()[-1].lower()} at python.org>")
+                for a in authors
+            ),
+        ),
+        (
+            "Discussions-To",
+            f'<a class="reference external" href="https://discuss.python.org/t/{number + 1000}">Discourse thread</a>',
+        ),
+        ("Status", f'<abbr title="{status}">{status}</abbr>'),
+        ("Type", f'<abbr title="{pep_type}">{pep_type}</abbr>'),
+        ("Created", f"{rng.randint(1, 28):02}-Feb-{2000 + number % 24}"),
+        ("Python-Version", f"3.{number % 13}"),
+        (
+            "Post-History",
+            ",\n".join(
+                f'<a class="reference external" href="https://mail.python.org/archives/{i}">'
+                f"{rng.randint(1, 28):02}-Mar-{2000 + number % 24}</a>"
+                for i in range(rng.randint(1, 6))
+            ),
+        ),
+    ]
+    if number in PEPS and number % 2:
+        fields.append(
+            (
+                "Replaces",
+                f'<a class="pep reference internal" href="../pep-{number - 1:04}/">{number - 1}</a>',
+            )
+        )
+    header = "".join(
+        f'<dt class="field-{"odd" if i % 2 else "even"}">{key}<span class="colon">:</span></dt>\n'
+        f'<dd class="field-{"odd" if i % 2 else "even"}">{value}</dd>\n'
+        for i, (key, value) in enumerate(fields)
+    )
+    sections = []
+    toc = []
+    for i in range(rng.randint(6, 16)):
+        name = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 3))).title()
+        toc.append(
+            f'<li><a class="reference internal" href="#section-{i}">{name}</a></li>'
+        )
+        paragraphs = "".join(
+            "<p>"
+            + " ".join(_sentence(rng) for _ in range(rng.randint(2, 8)))
+            + "</p>\n"
+            for _ in range(rng.randint(1, 6))
+        )
+        if rng.random() < 0.4:
+            paragraphs += (
+                '<div class="highlight-python notranslate"><div class="highlight"><pre><span></span>'
+                + "\n".join(
+                    f'<span class="k">def</span> <span class="nf">{rng.choice(WORDS)}</span>'
+                    f'<span class="p">():</span>'
+                    for _ in range(rng.randint(2, 10))
+                )
+                + "\n</pre></div>\n</div>\n"
+            )
+        sections.append(
+            f'<section id="section-{i}">\n<h2><a class="toc-backref" href="#section-{i}" role="doc-backlink">{name}</a>'
+            f'<a class="headerlink" href="#section-{i}" title="Link to this heading">¶</a></h2>\n'
+            f"{paragraphs}</section>\n"
+        )
+    page_title = f"PEP {number} – {html.escape(title)}"
+    return (
+        PAGE_HEAD.format(title=page_title, number=number)
+        + f'<h1 class="page-title">{page_title}</h1>\n'
+        + f'<dl class="rfc2822 field-list simple">\n{header}</dl>\n'
+        + "".join(sections)
+        + PAGE_FOOT.format(toc="<ul>" + "\n".join(toc) + "</ul>", number=number)
+    )
+
+
+def _write(pages: dict, source: str) -> None:
+    FIXTURES_DIR.mkdir(exist_ok=True)
+    for old in FIXTURES_DIR.glob("pep-*.html"):
+        old.unlink()
+    for name, data in pages.items():
+        FIXTURES_DIR.joinpath(name).write_bytes(data)
+    manifest = {
+        "source": source,
+        "created": datetime.date.today().isoformat(),
+        "peps": sorted(PEPS),
+        "sha256": {
+            name: hashlib.sha256(data).hexdigest()
+            for name, data in sorted(pages.items())
+        },
+    }
+    FIXTURES_DIR.joinpath("manifest.json").write_text(
+        json.dumps(manifest, indent=2) + "\n"
+    )
+
+
+def synthesize() -> None:
+    rng = random.Random(20231)
+    peps = _synthetic_index(rng)
+    pages = {"pep-0000.html": _synthetic_pep_zero(rng, peps).encode()}
+    for pep in peps:
+        if pep[0] in PEPS:
+            pages[f"pep-{pep[0]:04}.html"] = _synthetic_pep(rng, pep).encode()
+    _write(pages, "synthetic")
+
+
+def record() -> None:
+    pages = {}
+    for number in [0, *PEPS]:
+        with urlopen(f"{RECORD_URL_BASE}{number:04}/") as res:
+            pages[f"pep-{number:04}.html"] = res.read()
+    _write(pages, "recorded")
+
+
+def load_manifest() -> dict:
+    return json.loads(FIXTURES_DIR.joinpath("manifest.json").read_text())
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["record"]:
+        record()
+    elif sys.argv[1:] == ["synthesize"]:
+        synthesize()
+    else:
+        sys.stderr.write(__doc__.split("\n\n")[2] + "\n")
+        raise SystemExit(1)
+    sys.stderr.write(f"Wrote fixtures to {FIXTURES_DIR}\n")
@@ -0,0 +1,247 @@
+"""Benchmark suite for pepper.
+
+Everything runs against the fixtures in benchmarks/fixtures/, served by a
+local stand-in for peps.python.org (see server.py), so no network access
+is needed and runs are comparable across commits and machines.
+
+usage: python benchmarks/run.py [--runs N] [--latency MS] [--only NAME...]
+                                [--output FILE] [--compare FILE]
+
+Results are written as JSON (by default to benchmarks/results/<commit>.json).
+Pass an older results file to --compare to print how each benchmark moved.
+"""
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import pathlib
+import platform
+import py_compile
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from fixtures import FIXTURES_DIR, PEPS, load_manifest
+from server import FixtureServer
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+RESULTS_DIR = ROOT.joinpath("benchmarks", "results")
+sys.path.insert(0, str(ROOT))
+
+import pepper_cli  # noqa: E402
+
+PEP_IDS = [str(number) for number in PEPS]
+
+# runs `pepper` in a fresh interpreter, pointed at the stand-in server
+CLI_TEMPLATE = (
+    "import sys; sys.path.insert(0, {root!r}); import pepper_cli; "
+    "pepper_cli.PEP_URL_BASE = {url_base!r}; pepper_cli.PEP_0_URL = {pep_0_url!r}; "
+    "sys.argv = ['pepper', *{args!r}]; pepper_cli.main()"
+)
+
+
+def _git(*args) -> str:
+    with contextlib.suppress(OSError, subprocess.CalledProcessError):
+        return subprocess.run(
+            ["git", *args], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    return ""
+
+
+@contextlib.contextmanager
+def _quiet():
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(
+        io.StringIO()
+    ):
+        yield
+
+
+def _run_command(name: str, *args) -> None:
+    with _quiet(), contextlib.suppress(SystemExit):
+        getattr(pepper_cli.Commands(), name)(*args)
+
+
+class Suite:
+    def __init__(self, server: FixtureServer, home: pathlib.Path) -> None:
+        self.server = server
+        self.home = home
+        self.pep_zero = FIXTURES_DIR.joinpath("pep-0000.html").read_bytes()
+        self.pages = [
+            FIXTURES_DIR.joinpath(f"pep-{number:04}.html").read_bytes()
+            for number in PEPS
+        ]
+
+    def _fresh_home(self) -> None:
+        """Point HOME at a new, empty directory, so nothing is cached."""
+        os.environ["HOME"] = tempfile.mkdtemp(dir=self.home)
+
+    # every benchmark is a (setup, timed) pair of callables: `setup` runs
+    # before each measured run, and isn't counted
+
+    def pep_zero_parse(self):
+        return None, lambda: pepper_cli.PepZeroParser.parse(self.pep_zero)
+
+    def pep_header_parse(self):
+        def parse_all():
+            for page in self.pages:
+                pepper_cli.PepFileHeaderParser.parse(page)
+
+        return None, parse_all
+
+    def search_cold(self):
+        return self._fresh_home, lambda: _run_command("search", "status:Final")
+
+    def search_warm(self):
+        self._fresh_home()
+        _run_command("search", "status:Final")
+        return None, lambda: _run_command("search", "status:Final", "type:S")
+
+    def info(self):
+        return self._fresh_home, lambda: _run_command("info", *PEP_IDS)
+
+    def info_single(self):
+        return self._fresh_home, lambda: _run_command("info", "8")
+
+    def _cli(self, *args, warm_cache=False):
+        code = CLI_TEMPLATE.format(
+            root=str(ROOT),
+            url_base=self.server.url_base,
+            pep_0_url=self.server.pep_0_url,
+            args=list(args),
+        )
+
+        def setup():
+            self._fresh_home()
+            if warm_cache:
+                run()
+
+        def run():
+            subprocess.run(
+                [sys.executable, "-c", code],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+
+        return setup, run
+
+    def cli_help(self):
+        return self._cli("help")
+
+    def cli_keys(self):
+        return self._cli("keys")
+
+    def cli_search(self):
+        return self._cli("search", "status:Final", warm_cache=True)
+
+    def cli_info(self):
+        return self._cli("info", "8")
+
+    BENCHMARKS = (
+        "pep_zero_parse",
+        "pep_header_parse",
+        "search_cold",
+        "search_warm",
+        "info",
+        "info_single",
+        "cli_help",
+        "cli_keys",
+        "cli_search",
+        "cli_info",
+    )
+
+    def run(self, name: str, runs: int) -> dict:
+        setup, timed = getattr(self, name)()
+        times = []
+        for _ in range(runs):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            timed()
+            times.append((time.perf_counter() - start) * 1000)
+        return {
+            "runs": runs,
+            "min_ms": round(min(times), 3),
+            "median_ms": round(statistics.median(times), 3),
+            "mean_ms": round(statistics.mean(times), 3),
+            "stdev_ms": round(statistics.stdev(times), 3) if runs > 1 else 0.0,
+        }
+
+
+def compare(old: dict, new: dict) -> None:
+    if old["meta"]["fixtures"] != new["meta"]["fixtures"]:
+        print("warning: the two runs used different fixtures\n")
+    print(f"{'benchmark':<20}{'old (ms)':>12}{'new (ms)':>12}{'change':>10}")
+    for name, result in new["results"].items():
+        if name not in old["results"]:
+            continue
+        before, after = old["results"][name]["min_ms"], result["min_ms"]
+        change = (after - before) / before * 100 if before else 0.0
+        print(f"{name:<20}{before:>12.2f}{after:>12.2f}{change:>+9.1f}%")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="added to every response, in ms"
+    )
+    parser.add_argument("--only", nargs="+", choices=Suite.BENCHMARKS)
+    parser.add_argument("--output", type=pathlib.Path)
+    parser.add_argument("--compare", type=pathlib.Path)
+    opts = parser.parse_args()
+
+    manifest = load_manifest()
+    commit = _git("rev-parse", "HEAD")
+    meta = {
+        "commit": commit,
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "latency_ms": opts.latency,
+        "fixtures": {"source": manifest["source"], "sha256": manifest["sha256"]},
+    }
+
+    # the cli_* benchmarks should measure an installed copy, which always
+    # has its bytecode cached
+    py_compile.compile(str(ROOT.joinpath("pepper_cli.py")), doraise=True)
+    # keep the output (and so the time spent wrapping it) the same everywhere
+    os.environ["COLUMNS"] = "100"
+    saved_home = os.environ.get("HOME")
+    results = {}
+    with tempfile.TemporaryDirectory() as home, FixtureServer(
+        latency=opts.latency / 1000
+    ) as server:
+        pepper_cli.PEP_URL_BASE = server.url_base
+        pepper_cli.PEP_0_URL = server.pep_0_url
+        suite = Suite(server, pathlib.Path(home))
+        try:
+            for name in opts.only or Suite.BENCHMARKS:
+                results[name] = suite.run(name, opts.runs)
+                print(
+                    f"{name:<20}{results[name]['min_ms']:>10.2f}ms min"
+                    f"{results[name]['median_ms']:>10.2f}ms median"
+                )
+        finally:
+            if saved_home is not None:
+                os.environ["HOME"] = saved_home
+
+    output = {"meta": meta, "results": results}
+    path = opts.output or RESULTS_DIR.joinpath(f"{commit[:12] or 'unknown'}.json")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(output, indent=2) + "\n")
+    print(f"\nResults written to {path}")
+
+    if opts.compare:
+        print()
+        compare(json.loads(opts.compare.read_text()), output)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,144 @@
+"""A local stand-in for peps.python.org, serving the benchmark fixtures.
+
+`/pep-NNNN` (and `/pep-NNNN/`) is answered with fixtures/pep-NNNN.html.
+Like the real server, it speaks HTTP/1.1 with keep-alive, sends an ETag
+and Last-Modified (and answers conditional requests with 304), and
+supports single byte Range requests, and If-Range. An optional delay is
+added before every response, to stand in for the round trip to the real
+server.
+
+usage: python benchmarks/server.py [--port PORT] [--latency MS]
+"""
+
+import argparse
+import email.utils
+import hashlib
+import http.server
+import re
+import sys
+import threading
+import time
+
+from fixtures import FIXTURES_DIR
+
+RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+class FixtureHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    fixtures_dir = FIXTURES_DIR
+    latency = 0.0
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _fixture(self):
+        match = re.fullmatch(r"/(pep-\d{4})/?", self.path.split("?")[0])
+        if match is None:
+            return None
+        path = self.fixtures_dir.joinpath(match.group(1) + ".html")
+        return path if path.exists() else None
+
+    def _send_empty(self, status: int, headers=()) -> None:
+        self.send_response(status)
+        for key, value in headers:
+            self.send_header(key, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_HEAD(self) -> None:
+        self.do_GET(head=True)
+
+    def do_GET(self, head: bool = False) -> None:
+        if self.latency:
+            time.sleep(self.latency)
+        path = self._fixture()
+        if path is None:
+            return self._send_empty(404)
+
+        data = path.read_bytes()
+        etag = '"' + hashlib.md5(data).hexdigest() + '"'
+        validators = (
+            ("ETag", etag),
+            (
+                "Last-Modified",
+                email.utils.formatdate(path.stat().st_mtime, usegmt=True),
+            ),
+        )
+        if self.headers.get("If-None-Match") == etag:
+            return self._send_empty(304, validators)
+
+        status, start, end = 200, 0, len(data)
+        match = RANGE_RE.match(self.headers.get("Range", ""))
+        if self.headers.get("If-Range", etag) != etag:
+            match = None  # changed since: send all of it
+        if match and any(match.groups()):
+            first, last = match.groups()
+            if not first:  # suffix range, i.e. the last N bytes
+                start = max(len(data) - int(last), 0)
+            else:
+                start = int(first)
+                end = min(int(last) + 1, len(data)) if last else len(data)
+            if start >= len(data):
+                return self._send_empty(
+                    416, (("Content-Range", f"bytes */{len(data)}"),)
+                )
+            status = 206
+
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(end - start))
+        self.send_header("Accept-Ranges", "bytes")
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end - 1}/{len(data)}")
+        for key, value in validators:
+            self.send_header(key, value)
+        self.end_headers()
+        if not head:
+            self.wfile.write(data[start:end])
+
+
+class FixtureHTTPServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address) -> None:
+        # clients hanging up on a kept-alive connection is expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class FixtureServer:
+    """
+    Serve the fixtures on localhost from a background thread.
+
+    Used as a context manager; `url_base` and `pep_0_url` are drop-in
+    replacements for pepper's PEP_URL_BASE and PEP_0_URL.
+    """
+
+    def __init__(self, port: int = 0, latency: float = 0.0) -> None:
+        handler = type("Handler", (FixtureHandler,), {"latency": latency})
+        self.httpd = FixtureHTTPServer(("127.0.0.1", port), handler)
+        self.url_base = f"http://127.0.0.1:{self.httpd.server_port}/pep-"
+        self.pep_0_url = self.url_base + "0000"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="in ms")
+    opts = parser.parse_args()
+    with FixtureServer(opts.port, opts.latency / 1000) as server:
+        print(f"Serving {FIXTURES_DIR} at {server.url_base}NNNN (Ctrl-C to stop)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
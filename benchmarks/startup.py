@@ -0,0 +1,119 @@
+"""Cold start regression check for the pepper CLI.
+
+Runs `pepper keys` and `pepper help` under `python -X importtime` and fails
+if either of them imports a module that only some commands need, or if the
+time spent importing (on top of a bare interpreter) goes over the budget.
+
+usage: python benchmarks/startup.py [--budget MS] [--runs N]
+"""
+
+import argparse
+import os
+import pathlib
+import py_compile
+import subprocess
+import sys
+import tempfile
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+
+# modules that must only ever be imported by the commands that need them
+FORBIDDEN = (
+    "bottle",
+    "concurrent.futures",
+    "hashlib",
+    "heapq",
+    "http.client",
+    "inspect",
+    "json",
+    "mmap",
+    "multiprocessing",
+    "shutil",
+    "signal",
+    "ssl",
+    "subprocess",
+    "typing",
+    "urllib.request",
+    "venv",
+    "webbrowser",
+    "webview",
+    "zlib",
+)
+
+COMMANDS = (("keys",), ("help",))
+
+
+def importtime(code: str, home: str) -> dict:
+    """Run `code` with -X importtime, return {module: (cumulative us, top level)}."""
+    env = dict(os.environ, HOME=home, PYTHONPATH=str(ROOT))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue  # the header line
+        # nested imports are indented by two more spaces than their parent
+        name = name[1:]
+        modules[name.strip()] = (int(cumulative), not name.startswith(" "))
+    return modules
+
+
+def measure(args: tuple, home: str, runs: int):
+    baseline = importtime("pass", home)
+    code = (
+        "import sys, pepper_cli; "
+        f"sys.argv = ['pepper', *{list(args)!r}]; "
+        "pepper_cli.main()"
+    )
+    best, modules = None, {}
+    for _ in range(runs):
+        modules = importtime(code, home)
+        total = sum(
+            cumulative
+            for name, (cumulative, top_level) in modules.items()
+            if top_level and name not in baseline
+        )
+        best = total if best is None else min(best, total)
+    return best / 1000, sorted(set(modules) - set(baseline))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--budget", type=float, default=50.0, help="in ms")
+    parser.add_argument("--runs", type=int, default=5)
+    opts = parser.parse_args()
+
+    # installed copies always have their bytecode cached, so make sure this
+    # one does too (even with PYTHONDONTWRITEBYTECODE set)
+    py_compile.compile(str(ROOT.joinpath("pepper_cli.py")), doraise=True)
+
+    failed = False
+    # a fresh HOME, so nothing in a real ~/.pepper affects the numbers
+    with tempfile.TemporaryDirectory() as home:
+        for args in COMMANDS:
+            elapsed, imported = measure(args, home, opts.runs)
+            forbidden = [mod for mod in FORBIDDEN if mod in imported]
+            ok = elapsed <= opts.budget and not forbidden
+            failed = failed or not ok
+            print(
+                f"pepper {' '.join(args)}: {elapsed:.1f}ms of imports "
+                f"(budget {opts.budget:.0f}ms) {'ok' if ok else 'FAILED'}"
+            )
+            for mod in forbidden:
+                print(f"    imports `{mod}`, which should be imported lazily")
+            if os.listdir(home):
+                print(f"    created {os.listdir(home)} in $HOME")
+                failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -21,30 +21,53 @@
 #    OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 #    SOFTWARE.
 
+from __future__ import annotations
+
+# only modules needed by every command are imported here, everything else
+# is imported by the function that uses it, to keep startup fast
 import re
+import io
 import os
 import sys
 import stat
-import inspect
-import shutil
-import webbrowser
-import multiprocessing
-import pathlib
-import subprocess
-import signal
 import time
-from contextlib import suppress
+import codecs
+import struct
+import pathlib
+from collections import Counter
+from contextlib import contextmanager, suppress
+from functools import cached_property
 from textwrap import TextWrapper
-from urllib.request import urlopen, HTTPError
-from urllib.error import URLError
-from http.client import HTTPResponse
 from html.parser import HTMLParser
 
+# `typing` itself is slow to import, and this is only needed by type checkers
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from http.client import HTTPResponse
+
 __version__ = "0.2.0"
 PEP_URL_BASE = "https://peps.python.org/pep-"
 PEP_0_URL = "https://peps.python.org/pep-0000"
 BOTTLE_HOST = "127.0.0.1"
 BOTTLE_PORT = 9090
+DAEMON_IDLE_TIMEOUT = 3600  # seconds without requests before the daemon exits
+PEP_INDEX_TTL = 86400  # seconds before a cached PEP 0 index is revalidated
+FULLTEXT_RESULTS = 10
+FUZZY_RESULTS = 10
+FUZZY_CUTOFF = 0.6  # minimum similarity (0-1) of a fuzzy search result
+INFO_WORKERS = 8  # maximum number of PEPs fetched at once by `info`
+HTTP_CACHE_TTL = 86400  # seconds a cached response is used without revalidation
+HTTP_CACHE_STALE = 604800  # seconds after that it's still used, while revalidated
+HTTP_CACHE_SIZE = 50  # MiB of cached responses kept at most
+HEADER_RANGE_SIZE = 16384  # bytes requested at a time when fetching PEP headers
+PAGE_RANGE_SIZE = 1 << 20  # bytes requested at a time when fetching whole pages
+MIRROR_WORKERS = 8  # maximum number of pages downloaded at once by `mirror`
+EXPORT_CHUNK_SIZE = 32  # local PEPs handed to an `export` worker process at a time
+BUILD_REQUIREMENTS = (
+    "Pygments >= 2.9.0",
+    "Sphinx >= 5.1.1, != 6.1.0, != 6.1.1",
+    "docutils >= 0.19.0",
+)
 
 PEP_TYPES = {
     "Informational": (
@@ -79,60 +102,590 @@ def ensure_interactive_mode():
         raise SystemExit(1)
 
 
-with suppress(ImportError):
-    # this is only set up this way for syntax
-    # highlighting purposes. sorry.
-    import venv
-    import webview
-    import bottle
-
-
 def ensure_module(mod: str):
     try:
-        _ = __import__(mod)
+        return __import__(mod)
     except ModuleNotFoundError:
         sys.stderr.write(
             f"Required module `{mod}` not found! It may need to be installed manually...\n"
         )
+        raise SystemExit(1)
+
+
+PRECOMPRESSED_SUFFIXES = (".html", ".css", ".js", ".svg", ".txt", ".xml", ".json")
+
+
+def _precompress_site(site_dir: pathlib.Path) -> None:
+    """Write a gzipped copy next to every compressible file that changed."""
+    import gzip
+
+    for path in site_dir.rglob("*"):
+        if path.suffix not in PRECOMPRESSED_SUFFIXES or not path.is_file():
+            continue
+        gz_path = path.with_name(path.name + ".gz")
+        with suppress(FileNotFoundError):
+            if gz_path.stat().st_mtime >= path.stat().st_mtime:
+                continue
+        gz_path.write_bytes(gzip.compress(path.read_bytes(), 9, mtime=0))
+
+
+class SiteArchive:
+    """
+    The offline docs' site, packed into a single indexed file.
+
+    Layout (all integers little-endian):
+        header:  magic, then the number of entries
+        entries: (path start/end offsets in the path blob, data offset,
+                 stored size, size, CRC-32, flags) entries, sorted by path
+        blob:    the paths (relative to the site's root, `/`-separated)
+        data:    every entry's contents, one after the other
+
+    Compressible files are stored as gzip members, which the local server
+    sends as-is to browsers accepting gzip, and everything else is stored
+    uncompressed. Looking a file up is a binary search over the entries,
+    and reading it a single slice of the mmap'd archive.
+    """
+
+    MAGIC = b"PEPPAK01"
+    HEADER = struct.Struct("<8sI")
+    ENTRY = struct.Struct("<2IQ4I")
+    GZIP = 1
+
+    def __init__(self, path: pathlib.Path) -> None:
+        import mmap
+
+        with open(path, "rb") as fp:
+            self._map = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count = self.HEADER.unpack_from(self._map, 0)
+        if magic != self.MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a pepper site archive")
+        self._blob_offset = self.HEADER.size + self._count * self.ENTRY.size
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _entry(self, position: int) -> tuple:
+        return self.ENTRY.unpack_from(
+            self._map, self.HEADER.size + position * self.ENTRY.size
+        )
+
+    def _name(self, entry: tuple) -> str:
+        return str(
+            self._map[self._blob_offset + entry[0] : self._blob_offset + entry[1]],
+            "utf-8",
+        )
+
+    def find(self, name: str):
+        """Return the entry for the file `name`, or None if it isn't archived."""
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._name(self._entry(middle)) < name:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._count:
+            entry = self._entry(low)
+            if self._name(entry) == name:
+                return entry
+        return None
+
+    @classmethod
+    def etag(cls, entry: tuple) -> str:
+        return f'"{entry[5]:08x}-{entry[4]:x}"'
+
+    @classmethod
+    def is_gzipped(cls, entry: tuple) -> bool:
+        return bool(entry[6] & cls.GZIP)
+
+    def raw(self, entry: tuple) -> bytes:
+        """Return the entry's contents as stored (gzipped or not)."""
+        return self._map[entry[2] : entry[2] + entry[3]]
+
+    def read(self, entry: tuple) -> bytes:
+        import zlib
+
+        data = self.raw(entry)
+        return zlib.decompress(data, 31) if self.is_gzipped(entry) else data
+
+    def close(self) -> None:
+        self._map.close()
+
+    @classmethod
+    def build(cls, path: pathlib.Path, site_dir: pathlib.Path) -> int:
+        """Pack every file under `site_dir` into `path`, returning the count."""
+        import zlib
+
+        names = sorted(
+            file.relative_to(site_dir).as_posix()
+            for file in site_dir.rglob("*")
+            # hidden files (i.e. Sphinx's doctrees) and gzipped copies of
+            # other files aren't part of the site
+            if file.is_file()
+            and file.suffix not in (".gz", ".part")
+            and not any(
+                part.startswith(".") for part in file.relative_to(site_dir).parts
+            )
+        )
+        blob = bytearray()
+        for name in names:
+            blob += name.encode()
+        data_offset = cls.HEADER.size + len(names) * cls.ENTRY.size + len(blob)
+
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as fp:
+            fp.seek(data_offset)
+            entries = bytearray()
+            name_offset = 0
+            for name in names:
+                file = site_dir.joinpath(name)
+                data = file.read_bytes()
+                flags = 0
+                stored = data
+                if file.suffix in PRECOMPRESSED_SUFFIXES:
+                    gz_path = file.with_name(file.name + ".gz")
+                    try:
+                        # reuse the copy made by _precompress_site when current
+                        if gz_path.stat().st_mtime < file.stat().st_mtime:
+                            raise FileNotFoundError
+                        stored = gz_path.read_bytes()
+                    except FileNotFoundError:
+                        compressor = zlib.compressobj(9, zlib.DEFLATED, 31)
+                        stored = compressor.compress(data) + compressor.flush()
+                    flags |= cls.GZIP
+                end = name_offset + len(name.encode())
+                entries += cls.ENTRY.pack(
+                    name_offset,
+                    end,
+                    fp.tell(),
+                    len(stored),
+                    len(data),
+                    zlib.crc32(data),
+                    flags,
+                )
+                name_offset = end
+                fp.write(stored)
+            fp.seek(0)
+            fp.write(cls.HEADER.pack(cls.MAGIC, len(names)))
+            fp.write(entries)
+            fp.write(blob)
+        os.replace(tmp_path, path)
+        return len(names)
+
+
+def _site_archive_path(pepper_dir: pathlib.Path) -> pathlib.Path:
+    return pepper_dir.joinpath("peps", "peps-html.pack")
+
+
+def _pack_site(pepper_dir: pathlib.Path) -> None:
+    site_dir = pepper_dir.joinpath("peps", "peps-html")
+    sys.stderr.write(f"Packing '{site_dir}'...\n")
+    count = SiteArchive.build(_site_archive_path(pepper_dir), site_dir)
+    sys.stderr.write(f"Packed {count} files.\n")
+
+
+def _pep_server_adapter():
+    """
+    Build a bottle server adapter for the local PEP server.
+
+    It is wsgiref based like bottle's default, but handles every request on
+    its own thread, and sends static files with `socket.sendfile` (zero-copy
+    where the platform supports it) instead of copying them through Python.
+    """
+    import bottle
+    from socketserver import ThreadingMixIn
+    from wsgiref.simple_server import (
+        ServerHandler,
+        WSGIRequestHandler,
+        WSGIServer,
+        make_server,
+    )
+
+    class SendfileServerHandler(ServerHandler):
+        def sendfile(self):
+            filelike = self.result.filelike
+            if not hasattr(filelike, "fileno"):
+                return False
+            if not self.headers_sent:
+                self.send_headers()
+            self._flush()
+            self.bytes_sent += self.request_handler.connection.sendfile(filelike)
+            return True
+
+    class RequestHandler(WSGIRequestHandler):
+        def handle(self):
+            self.raw_requestline = self.rfile.readline(65537)
+            if len(self.raw_requestline) > 65536:
+                self.send_error(414)
+                return
+            if not self.parse_request():
+                return
+            handler = SendfileServerHandler(
+                self.rfile,
+                self.wfile,
+                self.get_stderr(),
+                self.get_environ(),
+                multithread=True,
+            )
+            handler.request_handler = self
+            handler.run(self.server.get_app())
+
+        def log_message(self, *args):
+            pass
+
+    class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+        daemon_threads = True
+        allow_reuse_address = True
+
+    class PepServerAdapter(bottle.ServerAdapter):
+        def run(self, handler):
+            server = make_server(
+                self.host,
+                self.port,
+                handler,
+                server_class=ThreadingWSGIServer,
+                handler_class=RequestHandler,
+            )
+            server.serve_forever()
+
+    return PepServerAdapter
 
 
 def _new_proc_spawn(pepper_dir: pathlib.Path):
+    import mimetypes
+    import bottle
+
+    root = pepper_dir.joinpath("peps", "peps-html")
+    archive_path = _site_archive_path(pepper_dir)
+    archives = {}  # (inode, mtime) -> SiteArchive, so a repacked archive is picked up
+
+    def current_archive():
+        with suppress(FileNotFoundError):
+            stat_result = archive_path.stat()
+            key = (stat_result.st_ino, stat_result.st_mtime_ns)
+            if key not in archives:
+                for archive in archives.values():
+                    archive.close()
+                archives.clear()
+                archives[key] = SiteArchive(archive_path)
+            return archives[key]
+        return None
+
+    @bottle.route("/_pepper/health")
+    def health():
+        return {"server": "pepper", "pid": os.getpid(), "root": root.as_posix()}
+
+    def serve_archived(archive: SiteArchive, filepath: str, headers: dict):
+        entry = archive.find(filepath)
+        if entry is None:
+            return bottle.HTTPError(404, "File does not exist.")
+        headers["ETag"] = SiteArchive.etag(entry)
+        if bottle.request.get_header("If-None-Match") == headers["ETag"]:
+            return bottle.HTTPResponse(status=304, **headers)
+        mimetype = mimetypes.guess_type(filepath)[0] or "application/octet-stream"
+        if mimetype.startswith("text/") or mimetype == "application/javascript":
+            mimetype += "; charset=UTF-8"
+        headers["Content-Type"] = mimetype
+        if SiteArchive.is_gzipped(entry) and "gzip" in bottle.request.get_header(
+            "Accept-Encoding", ""
+        ):
+            headers["Content-Encoding"] = "gzip"
+            body = archive.raw(entry)
+        else:
+            body = archive.read(entry)
+        headers["Content-Length"] = str(len(body))
+        return bottle.HTTPResponse(body, **headers)
+
     @bottle.route("/<filepath:path>")
     def serve_pep(filepath):
-        return bottle.static_file(
-            filepath, root=pepper_dir.joinpath("peps", "peps-html").as_posix()
+        if ".." in pathlib.PurePosixPath(filepath).parts:
+            return bottle.HTTPError(403, "Access denied.")
+        path = root.joinpath(filepath)
+        gz_path = path.with_name(path.name + ".gz")
+        mimetype = mimetypes.guess_type(path.name)[0] or "auto"
+        headers = {
+            "Vary": "Accept-Encoding",
+            # pages are revalidated (cheaply, with their ETag) on every
+            # visit, while the theme's assets rarely ever change
+            "Cache-Control": (
+                "public, max-age=86400" if "_static" in path.parts else "no-cache"
+            ),
+        }
+        # a packed archive, when there is one, is served instead of the files
+        archive = current_archive()
+        if archive is not None:
+            return serve_archived(archive, filepath, headers)
+
+        if (
+            "gzip" in bottle.request.get_header("Accept-Encoding", "")
+            and gz_path.is_file()
+        ):
+            path = gz_path
+            headers["Content-Encoding"] = "gzip"
+
+        with suppress(OSError):
+            stat_result = path.stat()
+            etag = f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+            headers["ETag"] = etag
+            if bottle.request.get_header("If-None-Match") == etag:
+                return bottle.HTTPResponse(status=304, **headers)
+
+        response = bottle.static_file(
+            path.relative_to(root).as_posix(), root=root.as_posix(), mimetype=mimetype
         )
+        for name, value in headers.items():
+            response.set_header(name, value)
+        return response
+
+    bottle.run(
+        host=BOTTLE_HOST, port=BOTTLE_PORT, server=_pep_server_adapter(), quiet=True
+    )
+
 
-    bottle.run(host=BOTTLE_HOST, port=BOTTLE_PORT, quiet=True)
+def _pep_server_is_alive(pid=None) -> bool:
+    """Check that a pepper server (optionally with the given pid) is serving."""
+    import json
+    from urllib.request import urlopen
+
+    with suppress(OSError, ValueError):
+        res = urlopen(f"http://{BOTTLE_HOST}:{BOTTLE_PORT}/_pepper/health", timeout=1)
+        health = json.loads(res.read())
+        return health.get("server") == "pepper" and pid in (None, health.get("pid"))
+    return False
 
 
 def _spawn_pep_server(pepper_dir: pathlib.Path):
+    import multiprocessing
+
     ensure_module("bottle")
     pidfile = pepper_dir.joinpath("bottle.pid")
     if pidfile.exists():
-        return
+        with suppress(ValueError):
+            if _pep_server_is_alive(int(pidfile.read_text())):
+                return
+        # the server recorded in the pidfile is gone (or was never started)
+        pidfile.unlink()
 
     proc = multiprocessing.Process(
         target=_new_proc_spawn, daemon=False, args=(pepper_dir,)
     )
     proc.start()
-    pidfile.touch()
+    for _ in range(100):
+        if _pep_server_is_alive(proc.pid):
+            break
+        if not proc.is_alive():
+            fatal_error(
+                f"Unable to start the local PEP server (is port {BOTTLE_PORT} in use?)"
+            )
+        time.sleep(0.05)
+    else:
+        proc.terminate()
+        fatal_error("Timed out waiting for the local PEP server to start...")
+
     pidfile.write_text(str(proc.pid))
     print(
         f"Started new bottle server process ({proc.pid}). Run `pepper kill_server` to stop process."
     )
 
 
+def _terminal_columns() -> int:
+    # the same lookup as shutil.get_terminal_size, without importing shutil
+    # (and the compression modules it pulls in) for every command
+    with suppress(KeyError, ValueError):
+        columns = int(os.environ["COLUMNS"])
+        if columns > 0:
+            return columns
+    with suppress(AttributeError, ValueError, OSError):
+        return os.get_terminal_size(sys.__stdout__.fileno()).columns or 80
+    return 80
+
+
 class KeyTextWrapper(TextWrapper):
     def __init__(self, offset_size: int = 0, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
-        self.width = shutil.get_terminal_size().columns - offset_size
+        self.width = _terminal_columns() - offset_size
         self.subsequent_indent = " " * offset_size
         self.break_long_words = False
         self.break_on_hyphens = False
         self.max_lines = 4
 
 
+class Tracer:
+    """
+    Per-phase timing of a pepper command, written to stderr.
+
+    Enabled with `pepper --trace[=json] COMMAND`, or by setting
+    PEPPER_TRACE to `text` (or `1`) or `json`. Every timed phase (dns,
+    connect, tls, ttfb, body, parse, render) and every cache lookup is
+    written as it happens, either as a line of text or as a JSON object,
+    followed by a summary once the command has finished. When tracing is
+    disabled, recording anything is a no-op.
+    """
+
+    MODES = ("text", "json")
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.json = False
+        self._lock = None
+        self._start = 0.0
+        self._phases = {}  # phase -> [count, seconds, bytes]
+        self._cache = {}  # cache name -> Counter of results
+
+    def enable(self, mode: str) -> None:
+        import threading
+
+        if mode == "1":
+            mode = "text"
+        if mode not in self.MODES:
+            fatal_error(f"Invalid trace mode '{mode}' (expected text or json)")
+        self.enabled = True
+        self.json = mode == "json"
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+
+    def _emit(self, record: dict) -> None:
+        if self.json:
+            import json
+
+            line = json.dumps(record)
+        else:
+            elapsed = record.pop("t")
+            name = record.pop("phase", None) or record.pop("event")
+            duration = f"{record.pop('ms'):9.2f}ms" if "ms" in record else " " * 11
+            fields = " ".join(f"{key}={value}" for key, value in record.items())
+            line = f"[trace +{elapsed:.1f}ms] {name:<8}{duration} {fields}".rstrip()
+        sys.stderr.write(line + "\n")
+
+    def record(self, phase: str, seconds: float, **fields) -> None:
+        """Record that `phase` took `seconds`, along with any extra fields."""
+        if not self.enabled:
+            return
+        with self._lock:
+            totals = self._phases.setdefault(phase, [0, 0.0, 0])
+            totals[0] += 1
+            totals[1] += seconds
+            totals[2] += fields.get("bytes", 0)
+            self._emit(
+                {
+                    "t": round((time.perf_counter() - self._start) * 1000, 3),
+                    "phase": phase,
+                    "ms": round(seconds * 1000, 3),
+                    **fields,
+                }
+            )
+
+    @contextmanager
+    def phase(self, phase: str, **fields):
+        """
+        Time the body of a `with` block as `phase`.
+
+        The fields dict is yielded, so fields only known at the end (i.e. a
+        response status) can be added to it inside the block.
+        """
+        start = time.perf_counter()
+        try:
+            yield fields
+        finally:
+            self.record(phase, time.perf_counter() - start, **fields)
+
+    def cache(self, name: str, result: str, **fields) -> None:
+        """Record a lookup in the cache `name` (a hit, a miss, ...)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._cache.setdefault(name, Counter())[result] += 1
+            self._emit(
+                {
+                    "t": round((time.perf_counter() - self._start) * 1000, 3),
+                    "event": "cache",
+                    "cache": name,
+                    "result": result,
+                    **fields,
+                }
+            )
+
+    def summary(self) -> None:
+        if not self.enabled:
+            return
+        total = (time.perf_counter() - self._start) * 1000
+        if self.json:
+            import json
+
+            summary = {
+                "total_ms": round(total, 3),
+                "phases": {
+                    phase: {
+                        "count": count,
+                        "ms": round(seconds * 1000, 3),
+                        "bytes": size,
+                    }
+                    for phase, (count, seconds, size) in self._phases.items()
+                },
+                "cache": {name: dict(results) for name, results in self._cache.items()},
+            }
+            sys.stderr.write(json.dumps({"summary": summary}) + "\n")
+            return
+        lines = [f"[trace] total {total:.2f}ms"]
+        for phase, (count, seconds, size) in self._phases.items():
+            line = f"[trace]   {phase:<8}{count:>4} x {seconds * 1000:9.2f}ms"
+            lines.append(line + (f" {size:>10} bytes" if size else ""))
+        for name, results in self._cache.items():
+            counts = ", ".join(f"{count} {result}" for result, count in results.items())
+            lines.append(f"[trace]   cache {name}: {counts}")
+        sys.stderr.write("\n".join(lines) + "\n")
+
+
+TRACE = Tracer()
+
+
+def _feed_stream(parser: HTMLParser, stream, chunk_size: int = 16384):
+    """
+    Feed a binary file-like `stream` to `parser`, one chunk at a time.
+
+    This is a generator, which yields after every feed so the caller can
+    collect what has been parsed so far. Feeding stops (and the stream is
+    closed, leaving the rest unread) once the parser sets `finished`.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    pending = ""
+    # time spent waiting on the stream vs. parsing, for `--trace`
+    read_time = parse_time = 0.0
+    received = 0
+    try:
+        while not parser.finished:
+            start = time.perf_counter()
+            chunk = stream.read(chunk_size)
+            read_time += time.perf_counter() - start
+            received += len(chunk)
+            pending += decoder.decode(chunk, final=not chunk)
+            start = time.perf_counter()
+            if chunk:
+                # only feed complete runs of text, so the text inside an
+                # element is never split between two feeds
+                cut = pending.rfind("<")
+                if cut <= 0:
+                    continue
+                parser.feed(pending[:cut])
+                pending = pending[cut:]
+            else:
+                parser.feed(pending)
+                parser.close()
+            parse_time += time.perf_counter() - start
+            yield
+            if not chunk:
+                break
+    finally:
+        stream.close()
+        name = type(parser).__name__
+        # streams that make requests as they go (RangeReader) have already
+        # traced those separately
+        read_time -= getattr(stream, "request_time", 0.0)
+        TRACE.record("body", read_time, parser=name, bytes=received)
+        TRACE.record("parse", parse_time, parser=name)
+
+
 class PepZeroParser(HTMLParser):
     def __init__(self) -> None:
         super().__init__()
@@ -140,6 +693,7 @@ class PepZeroParser(HTMLParser):
         self._current_tag = None
         self._current_attrs = None
         self._read_head = False
+        self.finished = False
         self.parsed_data = []
         self._current_pep = {}
         self._current_pep_col = 0
@@ -187,12 +741,25 @@ class PepZeroParser(HTMLParser):
     def handle_endtag(self, tag) -> None:
         if tag == "section" and self._read_head:
             self._read_head = False
+            self.finished = True
 
     @classmethod
-    def parse(cls, data: bytes) -> dict:
+    def iter_parse(cls, stream, chunk_size: int = 16384):
+        """
+        Parse PEP 0 incrementally from a binary file-like `stream`.
+
+        PEPs are yielded as soon as their table row has been read, and the
+        stream is closed (without reading the rest of the page) once the
+        numerical index has ended.
+        """
         parser = cls()
-        parser.feed(data.decode(errors="xmlcharrefreplace"))
-        return parser.parsed_data
+        for _ in _feed_stream(parser, stream, chunk_size):
+            yield from parser.parsed_data
+            parser.parsed_data.clear()
+
+    @classmethod
+    def parse(cls, data: bytes) -> list:
+        return list(cls.iter_parse(io.BytesIO(data)))
 
 
 class PepFileHeaderParser(HTMLParser):
@@ -204,12 +771,16 @@ class PepFileHeaderParser(HTMLParser):
         self._last_key = None
         self._list_head = False
         self._title_read = False
+        self._in_header = False
+        self.finished = False
         self.parsed_data = {}
 
     def handle_starttag(self, tag, attrs) -> None:
         self._last_tag = self._current_tag
         self._current_tag = tag
         self._current_attrs = attrs
+        if tag == "dl" and self._title_read:
+            self._in_header = True
 
     def handle_data(self, data) -> None:
         if self._current_tag == "h1" and not self._title_read:
@@ -253,15 +824,25 @@ class PepFileHeaderParser(HTMLParser):
     def handle_endtag(self, tag) -> None:
         if tag == "dd":
             self._list_head = False
+        if tag == "dl" and self._in_header:
+            # the header is the first definition list after the title, and
+            # nothing after it is needed
+            self.finished = True
 
     @classmethod
-    def parse(cls, data: bytes) -> dict:
+    def parse_stream(cls, stream, chunk_size: int = 4096) -> dict:
+        """
+        Parse the PEP header from a binary file-like `stream`.
+
+        Only the top of the page is read: the stream is closed as soon as
+        the header's definition list has ended.
+        """
         full_parsed_data = {}
-        decoded_data = data.decode(errors="xmlcharrefreplace")
 
         # parse PEP header information
         head_parser = cls()
-        head_parser.feed(decoded_data)
+        for _ in _feed_stream(head_parser, stream, chunk_size):
+            pass
         head_parser.parsed_data["Author"] = head_parser.parsed_data["Author"].split(
             ", "
         )
@@ -271,153 +852,4001 @@ class PepFileHeaderParser(HTMLParser):
         full_parsed_data["header"] = head_parser.parsed_data
         return full_parsed_data
 
+    @classmethod
+    def parse(cls, data: bytes) -> dict:
+        return cls.parse_stream(io.BytesIO(data))
 
-def fatal_error(message: str) -> None:
-    sys.stderr.write("pepper: " + message + "\n")
-    raise SystemExit(1)
 
+class PepSourceHeaderParser:
+    """
+    Parse the RFC 822 style header block at the top of a PEP source file.
 
-def format_searched_pep(pep_obj: dict) -> str:
-    _string = ""
+    The result has the same shape as `PepFileHeaderParser.parse`, so
+    headers read from a local checkout can be used in place of ones
+    scraped from peps.python.org.
+    """
 
-    _string += pep_obj["type"][0]
-    _string += pep_obj["status"][0]
-    _string += " | "
-    _string += str(pep_obj["number"])
-    _string += " | "
-    _string += pep_obj["title"]
-    _string += " | "
-    _string += ", ".join(pep_obj["authors"])
+    HIDDEN_FIELDS = ("PEP", "Title", "Content-Type", "Version", "Last-Modified")
+    LIST_FIELDS = ("Post-History", "Requires", "Replaces", "Superseded-By", "Topic")
+    LINK_RE = re.compile(r"`([^`<]*?)\s*<([^>]*)>`_{1,2}")
 
-    return _string
+    FIELD_RE = re.compile(rb"[A-Za-z][A-Za-z0-9-]*:")
 
+    @classmethod
+    def _header_lines(cls, lines):
+        """
+        Yield the lines of the header block: its fields and their continuation
+        lines, after any blank lines or RST comments before it, up to the first
+        line that belongs to neither (normally a blank one).
+        """
+        started = comment = False
+        for line in lines:
+            if not started:
+                if not line.strip():
+                    comment = False
+                    continue
+                if line.startswith(b"..") or comment and line[:1].isspace():
+                    comment = True
+                    continue
+            if started and line[:1].isspace() and line.strip():
+                yield line
+                continue
+            if not cls.FIELD_RE.match(line):
+                return
+            started = True
+            yield line
 
-def _view_helper(pep_id, url):
-    webview.create_window(f"PEP {pep_id}", url, height=800, frameless=True)
-    webview.start()
+    @classmethod
+    def read_header(cls, path: pathlib.Path) -> bytes:
+        """Read only the header block of `path`."""
+        with open(path, "rb") as fp:
+            return b"".join(cls._header_lines(fp))
 
+    @classmethod
+    def parse(cls, data: bytes) -> dict:
+        fields = {}
+        last_key = None
+        header_lines = cls._header_lines(data.splitlines(keepends=True))
+        for line in b"".join(header_lines).decode(errors="replace").splitlines():
+            if line[0].isspace():
+                fields[last_key] += " " + line.strip()
+                continue
+            key, _, value = line.partition(":")
+            last_key = key.strip()
+            fields[last_key] = value.strip()
+
+        header = {}
+        for key, value in fields.items():
+            if key in cls.HIDDEN_FIELDS:
+                continue
+            if key == "Author":
+                # match the obfuscated addresses shown on peps.python.org
+                header[key] = [x.replace("@", " at ") for x in value.split(", ")]
+            elif key in cls.LIST_FIELDS:
+                header[key] = [
+                    cls.LINK_RE.sub(r"\1", x).strip()
+                    for x in value.split(",")
+                    if x.strip()
+                ]
+            else:
+                header[key] = cls.LINK_RE.sub(
+                    lambda match: match.group(2) or match.group(1), value
+                )
+
+        number = str(int(fields.get("PEP", "0")))
+        title = fields.get("Title", "")
+        return {
+            "raw_title": f"PEP {number} – {title}",
+            "title": title,
+            "number": number,
+            "header": header,
+        }
+
+
+def _local_pep_path(pepper_dir: pathlib.Path, pep_id: str):
+    """
+    Find the local copy of a single PEP, or None if there isn't one.
+
+    PEP sources in the `peps/git-ds` checkout are preferred over the built
+    HTML, as only their (short) header block needs to be read.
+    """
+    storage_dir = pepper_dir.joinpath("peps")
+    name = f"pep-{pep_id.zfill(4)}"
+    for candidate in (
+        storage_dir.joinpath("git-ds", "peps", name + ".rst"),
+        storage_dir.joinpath("git-ds", "peps", name + ".txt"),
+        storage_dir.joinpath("git-ds", name + ".rst"),
+        storage_dir.joinpath("git-ds", name + ".txt"),
+        storage_dir.joinpath("peps-html", name + ".html"),
+    ):
+        if candidate.exists():
+            return candidate
+    return None
+
+
+def _read_local_pep_info(path: pathlib.Path) -> dict:
+    if path.suffix == ".html":
+        return PepFileHeaderParser.parse_stream(open(path, "rb"))
+    with TRACE.phase("parse", parser=PepSourceHeaderParser.__name__):
+        return PepSourceHeaderParser.parse(PepSourceHeaderParser.read_header(path))
+
+
+class PepTextRenderer(HTMLParser):
+    """
+    Render the article of a PEP page as plain text, wrapped to the terminal.
+
+    It can be fed a piece of the page at a time (i.e. a section), and the
+    lines rendered so far are taken with `take_lines`. Headings are
+    underlined, paragraphs are wrapped like `KeyTextWrapper` does, lists,
+    quotes and definitions are indented, and code is kept as it is.
+    """
+
+    HEADINGS = {"h1": "=", "h2": "=", "h3": "-", "h4": "-", "h5": "~", "h6": "~"}
+    BLOCKS = frozenset(
+        ("p", "div", "section", "article", "figure", "figcaption")
+        + ("table", "ul", "ol", "dl")
+    )
+    SKIPPED = frozenset(("script", "style", "nav", "img"))
 
-class Commands:
     def __init__(self) -> None:
-        self.pepper_dir = pathlib.Path.home().joinpath(".pepper")
-        self.config = {}
-        if not self.pepper_dir.exists():
-            self.pepper_dir.mkdir()
+        super().__init__()
+        self.lines = []
+        self._text = []
+        self._indent = 0
+        self._bullet = None  # for the first line of a list item's first block
+        self._lists = []  # [next number (None for bullets), indent added]
+        self._dls = []  # whether each open definition list is a field list
+        self._skip = 0  # depth of the skipped elements we're in
+        self._headerlink = False
+        self._tables = 0
+        self._cells = 0
+        self._blank = True
+        self._wrappers = {}
+
+    def _wrapper(self, initial: str, subsequent: str) -> TextWrapper:
+        wrapper = self._wrappers.get((initial, subsequent))
+        if wrapper is None:
+            wrapper = KeyTextWrapper()
+            wrapper.max_lines = None
+            wrapper.initial_indent = initial
+            wrapper.subsequent_indent = subsequent
+            self._wrappers[initial, subsequent] = wrapper
+        return wrapper
+
+    def _separate(self) -> None:
+        if not self._blank:
+            self.lines.append("")
+            self._blank = True
+
+    def _emit(self, lines) -> None:
+        self.lines.extend(lines)
+        self._blank = False
+
+    def _flush(self, underline: str = None, hanging: int = 0) -> None:
+        text = " ".join("".join(self._text).split())
+        self._text = []
+        if not text:
             return
-        config_file = self.pepper_dir.joinpath("pepper.conf")
-        if config_file.exists():
-            self.config = dict(
-                [
-                    tuple(line.split("="))
-                    for line in config_file.read_text().split("\n")
-                ][:-1]
-            )
+        indent = " " * self._indent
+        initial = indent
+        if self._bullet is not None:
+            initial = indent[: -len(self._bullet)] + self._bullet
+            self._bullet = None
+        elif not (self._tables or self._dls and self._dls[-1]):
+            # (but not between the rows of a table, or the fields of a list)
+            self._separate()
+        if underline:
+            self._emit([initial + text, indent + underline * len(text)])
+            return
+        self._emit(self._wrapper(initial, indent + " " * hanging).wrap(text))
 
-    def help(_):
-        sys.stderr.write(
-            f"pepper, version {__version__}\n"
-            "Get information about any PEP (Python Enhancement Proposal)\n"
-            "\n"
-            "usage: pepper [COMMAND] [ARGS]\n"
-            "\n"
-            "[ PEP commands ]\n"
-            "    info [PEP_NUMBER]: get basic info about the specified PEP\n"
-            "    search [ATTR] [QUERY]: search for a PEP (searches for QUERY in ATTR)\n"
-            "    view [PEP_NUMBER]: view PEP in webview window (requires webview extra)\n"
-            "    open [PEP_NUMBER]: open PEP in your default web browser\n"
-            "\n"
-            "[ pepper meta commands ]\n"
-            "    keys: print the PEP Types and PEP Status keys, taken from PEP 0\n"
-            "    generate_offline_docs: download and build an offline copy of all PEPs\n"
-            "    update_offline_docs: search for, and build, any new PEPs not saved\n"
-            "    help: print this help message\n"
-        )
-        return 0
+    def handle_starttag(self, tag, attrs) -> None:
+        if tag in self.SKIPPED:
+            self._skip += tag != "img"  # the only one without an end tag
+            return
+        if self._skip:
+            return
+        if tag == "a" and ("class", "headerlink") in attrs:
+            self._headerlink = True
+        elif tag in self.BLOCKS or tag in self.HEADINGS or tag == "br":
+            self._flush()
+            if tag == "dl":
+                classes = dict(attrs).get("class") or ""
+                self._dls.append("field-list" in classes.split())
+                self._separate()
+            elif tag == "table":
+                self._separate()
+                self._tables += 1
+            elif tag in ("ul", "ol"):
+                if not self._lists:
+                    self._separate()
+                self._lists.append([1 if tag == "ol" else None, 0])
+        elif tag == "li":
+            self._flush()
+            if self._lists:
+                number = self._lists[-1][0]
+                bullet = "- " if number is None else f"{number}. "
+                if number is not None:
+                    self._lists[-1][0] += 1
+                self._lists[-1][1] = len(bullet)
+                self._indent += len(bullet)
+                self._bullet = bullet
+        elif tag == "dt":
+            self._flush()
+        elif tag == "dd":
+            if self._dls and self._dls[-1]:
+                return  # field lists keep the value on the name's line
+            self._flush()
+            self._indent += 4
+        elif tag in ("blockquote", "pre"):
+            self._flush()
+            self._indent += 4
+        elif tag in ("td", "th"):
+            if self._cells:
+                self._text.append(" | ")
+            self._cells += 1
+        elif tag == "tr":
+            self._flush()
+            self._cells = 0
 
-    @staticmethod
-    def _get_pep_url(pep_id: str):
-        url = PEP_URL_BASE + pep_id.zfill(4)
+    def handle_endtag(self, tag) -> None:
+        if tag in self.SKIPPED or self._skip:
+            self._skip -= tag in self.SKIPPED and tag != "img"
+            return
+        if tag == "a":
+            self._headerlink = False
+        elif tag in self.HEADINGS:
+            self._separate()
+            self._flush(underline=self.HEADINGS[tag])
+        elif tag in self.BLOCKS:
+            self._flush()
+            if tag == "dl" and self._dls:
+                self._dls.pop()
+            elif tag == "table" and self._tables:
+                self._tables -= 1
+                self._separate()
+            elif tag in ("ul", "ol") and self._lists:
+                self._lists.pop()
+                self._separate()
+        elif tag == "li":
+            self._flush()
+            if self._lists:
+                self._indent -= self._lists[-1][1]
+            self._bullet = None
+        elif tag == "dt":
+            if self._dls and self._dls[-1]:
+                self._text.append(" ")
+            else:
+                self._flush()
+        elif tag == "dd":
+            if self._dls and self._dls[-1]:
+                self._flush(hanging=4)
+            else:
+                self._flush()
+                self._indent -= 4
+        elif tag == "pre":
+            code = "".join(self._text).strip("\n").expandtabs()
+            self._text = []
+            indent = " " * self._indent
+            self._separate()
+            self._emit(indent + line if line else "" for line in code.split("\n"))
+            self._indent -= 4
+        elif tag == "blockquote":
+            self._flush()
+            self._indent -= 4
+        elif tag == "tr":
+            self._flush(hanging=4)
 
-        # assert PEP is valid and site works
-        try:
-            urlopen(url)
-        except HTTPError as exc:
-            if exc.status == 404:
-                fatal_error(f"PEP {pep_id} not found...")
-            fatal_error(
-                f"Recieved error status code '{exc.status}' from peps.python.org"
+    def handle_data(self, data) -> None:
+        if not self._skip and not self._headerlink:
+            self._text.append(data)
+
+    def take_lines(self) -> list:
+        lines, self.lines = self.lines, []
+        return lines
+
+
+class PepDocument:
+    """
+    A rendered PEP page, to be read as text a section at a time.
+
+    `sections` is an offset index of the page's article: the (id, heading
+    level, title, offset) of every section, found with a single scan of the
+    HTML, without parsing it. Rendering can start from any section, and
+    produces the text one section at a time, so the first screen of a long
+    PEP is ready long before the rest of it has been parsed.
+    """
+
+    SECTION_RE = re.compile(
+        r'<section id="([^"]*)"[^>]*>\s*<h([1-6])[^>]*>(.*?)</h\2>', re.S
+    )
+    TAG_RE = re.compile(r"<[^>]*>")
+
+    def __init__(self, html: str) -> None:
+        self.html = html
+        start = html.find("<article")
+        self.start = start if start >= 0 else 0
+        end = html.find("</article>", self.start)
+        self.end = end if end >= 0 else len(html)
+        self.sections = [
+            (
+                match.group(1),
+                int(match.group(2)),
+                self._heading_text(match.group(3)),
+                match.start(),
             )
-        except URLError:
-            return None
+            for match in self.SECTION_RE.finditer(html, self.start, self.end)
+        ]
 
-        return url
+    @classmethod
+    def _heading_text(cls, html: str) -> str:
+        text = cls.TAG_RE.sub("", html).replace("¶", "")
+        if "&" in text:
+            # `html` (and the big table of entities it loads) only when needed
+            from html import unescape
 
-    @staticmethod
-    def _get_offline_url(pepper_dir: pathlib.Path, pep_id: str):
-        pep_path = pepper_dir.joinpath(
-            "peps", "peps-html", f"pep-{pep_id.zfill(4)}.html"
-        )
-        if not pep_path.exists():
-            fatal_error(f"PEP {pep_id} not found locally...")
-        _spawn_pep_server(pepper_dir)
-        return f"http://{BOTTLE_HOST}:{BOTTLE_PORT}/pep-{pep_id.zfill(4)}.html"
+            text = unescape(text)
+        return " ".join(text.split())
 
-    def view(self, pep_id: str):
-        ensure_module("webview")
+    def find(self, name: str):
+        """
+        Return the position in `sections` of the section called `name` (an
+        id, or a title, or the start of one, in any case), or None.
+        """
+        lowered = name.lower()
+        for matches in (
+            lambda section_id, title: section_id == name,
+            lambda section_id, title: title.lower() == lowered,
+            lambda section_id, title: title.lower().startswith(lowered),
+        ):
+            for position, (section_id, _, title, _) in enumerate(self.sections):
+                if matches(section_id, title):
+                    return position
+        return None
 
-        if self.config.get("USE_OFFLINE") == "true":
-            pep_url = self._get_offline_url(self.pepper_dir, pep_id)
+    def render(self, section: int = None):
+        """
+        Yield the lines of text of the article (or of everything from the
+        section at position `section` on), one list per section.
+        """
+        renderer = PepTextRenderer()
+        if section is None:
+            offsets = [self.start]
+            following = self.sections
         else:
-            pep_url = self._get_pep_url(pep_id)
+            offsets = []
+            following = self.sections[section:]
+        offsets += [offset for _, _, _, offset in following]
+        offsets.append(self.end)
+        for start, end in zip(offsets, offsets[1:]):
+            renderer.feed(self.html[start:end])
+            yield renderer.take_lines()
+        renderer.close()
+        yield renderer.take_lines()
 
-            if pep_url is None:
-                print("No internet connection detected. Checking for local copy.")
-                pep_url = self._get_offline_url(self.pepper_dir, pep_id)
 
-        print(f"Pulling up PEP {pep_id} in a new window...")
-        proc = multiprocessing.Process(
-            target=_view_helper, args=(pep_id, pep_url), daemon=False
-        )
-        proc.start()
-        print(f"PEP {pep_id} loaded ({proc.pid}), Bye!")
-        os._exit(
-            0
-        )  # we call os._exit here to ensure the webview stays alive as an orphan, instead of dying along with the parent
+class ConnectionPool:
+    """
+    Persistent keep-alive HTTP(S) connections, one set per thread.
 
-    def open(self, pep_id: str):
-        if self.config.get("USE_OFFLINE") == "true":
-            MAKE_ORPHAN = True
-            pep_url = self._get_offline_url(self.pepper_dir, pep_id)
-        else:
-            MAKE_ORPHAN = False
-            pep_url = self._get_pep_url(pep_id)
+    Every thread keeps a single connection per host open between requests,
+    so fetching many pages from the same host only pays for one TCP/TLS
+    handshake per thread. Errors are raised as `HTTPError`/`URLError`, like
+    `urlopen` does, and proxies are used like `urlopen` would (from
+    `HTTP_PROXY`, `HTTPS_PROXY` and `NO_PROXY`): HTTPS through a tunnel
+    opened with CONNECT, which is kept alive the same way.
+    """
 
-            if pep_url is None:
-                print("No internet connection detected. Checking for local copy.")
-                pep_url = self._get_offline_url(self.pepper_dir, pep_id)
-                MAKE_ORPHAN = True
+    MAX_REDIRECTS = 5
 
-        print(f"Pulling up PEP {pep_id} in your default browser...")
-        webbrowser.open(pep_url, 2)
-        print(f"PEP {pep_id} loaded, Bye!")
-        if MAKE_ORPHAN:
-            os._exit(0)
-        return 0
+    def __init__(self, timeout: float = 30) -> None:
+        import threading
+
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._open = set()  # every thread's connections, for `close`
+        self._proxies = None
+
+    def _proxy(self, scheme: str, host: str):
+        """Return the proxy to reach `host` through (split), or None."""
+        from urllib.parse import urlsplit
+        from urllib.request import getproxies, proxy_bypass
+
+        if self._proxies is None:
+            self._proxies = getproxies()
+        proxy = self._proxies.get(scheme)
+        if not proxy or proxy_bypass(host):
+            return None
+        return urlsplit(proxy if "://" in proxy else "http://" + proxy)
+
+    @staticmethod
+    def _proxy_headers(proxy) -> dict:
+        import base64
+        from urllib.parse import unquote
+
+        if proxy.username is None:
+            return {}
+        credentials = f"{unquote(proxy.username)}:{unquote(proxy.password or '')}"
+        return {
+            "Proxy-Authorization": "Basic "
+            + base64.b64encode(credentials.encode()).decode("ascii")
+        }
+
+    def _connection(self, scheme: str, netloc: str, fresh: bool = False):
+        import http.client
+        from urllib.parse import urlsplit
+
+        connections = self._local.__dict__.setdefault("connections", {})
+        connection = connections.get((scheme, netloc))
+        with self._lock:
+            if connection is not None and connection not in self._open:
+                fresh = True  # closed by `close` since
+        if connection is None or fresh:
+            if connection is not None:
+                self._forget(connection)
+            connection_class = (
+                http.client.HTTPSConnection
+                if scheme == "https"
+                else http.client.HTTPConnection
+            )
+            proxy = self._proxy(scheme, urlsplit(f"//{netloc}").hostname)
+            address = netloc if proxy is None else proxy.netloc.rpartition("@")[2]
+            connection = connection_class(address, timeout=self.timeout)
+            if proxy is not None and scheme == "https":
+                connection.set_tunnel(netloc, headers=self._proxy_headers(proxy))
+            elif proxy is not None:
+                # plain HTTP is sent to the proxy as is, with absolute URLs
+                connection.proxy_headers = self._proxy_headers(proxy)
+            connections[(scheme, netloc)] = connection
+            with self._lock:
+                self._open.add(connection)
+        return connection
+
+    def _forget(self, connection) -> None:
+        with self._lock:
+            self._open.discard(connection)
+        connection.close()
+
+    @staticmethod
+    def _traced_connect(connection) -> None:
+        """
+        Open `connection` like http.client would, timing the DNS lookup, the
+        TCP connect, and the TLS handshake separately.
+        """
+        import http.client
+        import socket
+
+        host, port = connection.host, connection.port
+        if connection._tunnel_host is not None:
+            with TRACE.phase("connect", host=host, tunnel=connection._tunnel_host):
+                connection.connect()
+            return
+        with TRACE.phase("dns", host=host):
+            addresses = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+        with TRACE.phase("connect", host=host):
+            for attempt, (*_, address) in enumerate(addresses, 1):
+                try:
+                    sock = socket.create_connection(address[:2], connection.timeout)
+                    break
+                except OSError:
+                    if attempt == len(addresses):
+                        raise
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if isinstance(connection, http.client.HTTPSConnection):
+            with TRACE.phase("tls", host=host):
+                sock = connection._context.wrap_socket(sock, server_hostname=host)
+        connection.sock = sock
+
+    def _send(self, method: str, url: str, headers: dict) -> HTTPResponse:
+        import http.client
+        from urllib.error import URLError
+        from urllib.parse import urlsplit
+
+        parts = urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        for attempt in range(2):
+            connection = self._connection(parts.scheme, parts.netloc, fresh=attempt > 0)
+            proxy_headers = getattr(connection, "proxy_headers", None)
+            try:
+                if TRACE.enabled and connection.sock is None:
+                    self._traced_connect(connection)
+                with TRACE.phase("ttfb", method=method, url=url) as fields:
+                    if proxy_headers is None:
+                        connection.request(method, path, headers=headers)
+                    else:
+                        connection.request(
+                            method,
+                            parts._replace(fragment="").geturl(),
+                            headers={**proxy_headers, **headers},
+                        )
+                    res = connection.getresponse()
+                    fields["status"] = res.status
+                return res
+            except (
+                http.client.RemoteDisconnected,
+                ConnectionResetError,
+                BrokenPipeError,
+            ):
+                # the server dropped our idle keep-alive connection; retry once
+                # on a fresh connection
+                if attempt > 0:
+                    raise
+            except (OSError, http.client.HTTPException) as exc:
+                connection.close()
+                raise URLError(exc) from exc
+
+    def request(
+        self, url: str, method: str = "GET", headers: dict = None
+    ) -> HTTPResponse:
+        """
+        Send a request, following redirects, and return the response.
+
+        The response must be read (or closed) before the calling thread
+        makes another request to the same host.
+        """
+        import http.client
+        from urllib.error import HTTPError, URLError
+        from urllib.parse import urljoin
+
+        headers = dict(headers or {})
+        for _ in range(self.MAX_REDIRECTS + 1):
+            try:
+                res = self._send(method, url, headers)
+            except (
+                http.client.RemoteDisconnected,
+                ConnectionResetError,
+                BrokenPipeError,
+            ) as exc:
+                raise URLError(exc) from exc
+            if res.status in (301, 302, 303, 307, 308) and res.getheader("Location"):
+                res.read()
+                url = urljoin(url, res.getheader("Location"))
+                continue
+            if res.status >= 400:
+                res.read()
+                raise HTTPError(url, res.status, res.reason, res.headers, None)
+            return res
+        raise URLError(f"Too many redirects while fetching {url}")
+
+    def discard(self, url: str) -> None:
+        """
+        Close this thread's connection to the host of `url`.
+
+        This must be used when a response is abandoned before its body has
+        been read, as the connection can't be reused after that.
+        """
+        from urllib.parse import urlsplit
+
+        parts = urlsplit(url)
+        connections = self._local.__dict__.get("connections", {})
+        connection = connections.pop((parts.scheme, parts.netloc), None)
+        if connection is not None:
+            self._forget(connection)
+
+    def close(self) -> None:
+        """Close every thread's connections."""
+        with self._lock:
+            connections, self._open = self._open, set()
+        for connection in connections:
+            connection.close()
+
+
+class RangeReader:
+    """
+    Binary file-like reader that downloads a URL in fixed-size pieces.
+
+    Each piece is fetched with an HTTP Range request only once the previous
+    one has been read, so a reader that stops early never downloads much
+    more than it needed. When the server ignores Range requests, the full
+    response is streamed instead, and dropped (along with its connection)
+    when the reader is closed early.
+
+    Every piece after the first is requested with `If-Range` (`etag`, or
+    the first response's ETag), so if the body has changed in between, the
+    server sends all of the new one instead: the reader then starts over
+    from the start of the body, and sets `restarted`.
+    """
+
+    def __init__(
+        self,
+        pool: ConnectionPool,
+        url: str,
+        range_size: int,
+        start: int = 0,
+        etag: str = None,
+    ) -> None:
+        self.pool = pool
+        self.url = url
+        self.range_size = range_size
+        self.etag = etag
+        self._offset = start
+        self._res = None
+        self._done = False
+        self.headers = None  # of the first response (or the last restart)
+        self.restarted = False
+        self.request_time = 0.0  # spent waiting for responses, not reading them
+
+    def _request_next(self) -> None:
+        from urllib.error import HTTPError
+
+        end = self._offset + self.range_size - 1
+        headers = {"Range": f"bytes={self._offset}-{end}"}
+        # a weak ETag can't be used for this, so such bodies aren't checked
+        if self._offset and self.etag and not self.etag.startswith("W/"):
+            headers["If-Range"] = self.etag
+        start = time.perf_counter()
+        try:
+            self._res = self.pool.request(self.url, headers=headers)
+        except HTTPError as exc:
+            if exc.code != 416 or not self._offset:
+                raise
+            self._done = True  # the previous piece ended exactly at the end
+            return
+        finally:
+            self.request_time += time.perf_counter() - start
+        if self._offset and self._res.status != 206:
+            # a different body (or the server ignoring Range): all of it
+            self._offset = 0
+            self.restarted = True
+            self.headers = self.etag = None
+        if self.headers is None:
+            self.headers = self._res.headers
+            self.etag = self.etag or self._res.getheader("ETag")
+        total = (self._res.getheader("Content-Range") or "").rpartition("/")[2]
+        if self._res.status != 206 or not total.isdigit() or end + 1 >= int(total):
+            self._done = True  # this is the last (or only) response needed
+
+    def read(self, size: int = -1) -> bytes:
+        while True:
+            if self._res is None:
+                if self._done:
+                    return b""
+                self._request_next()
+                continue
+            data = self._res.read(size) if size >= 0 else self._res.read()
+            if data:
+                self._offset += len(data)
+                return data
+            self._res.close()
+            self._res = None
+
+    def close(self) -> None:
+        if self._res is not None:
+            if not self._res.isclosed():
+                self.pool.discard(self.url)
+            self._res.close()
+            self._res = None
+        self._done = True
+
+
+class CachedReader:
+    """
+    Binary file-like reader over a response held by an `HttpCache`.
+
+    The cached part of the body (if any) is read first, and the rest is
+    downloaded with a `RangeReader` only if the reader goes past its end.
+    When closed, everything that has been read is stored back in the cache,
+    so the next reader of the same URL doesn't have to touch the network.
+    The rest is only appended to the cached part while the body still has
+    `etag`; otherwise that part is dropped, and the new body is stored.
+    """
+
+    def __init__(
+        self,
+        cache: HttpCache,
+        url: str,
+        body: bytes,
+        range_size: int,
+        etag: str = None,
+    ):
+        self.cache = cache
+        self.url = url
+        self.range_size = range_size
+        self.etag = etag
+        self._data = bytearray(body)
+        self._cached = len(body)
+        self._offset = 0
+        self._remote = None
+
+    @property
+    def request_time(self) -> float:
+        return self._remote.request_time if self._remote is not None else 0.0
+
+    def read(self, size: int = -1) -> bytes:
+        from urllib.error import HTTPError
+
+        if self._offset < len(self._data):
+            end = len(self._data) if size < 0 else self._offset + size
+            data = bytes(self._data[self._offset : end])
+            self._offset += len(data)
+            return data
+        if self._remote is None:
+            self._remote = RangeReader(
+                self.cache.pool,
+                self.url,
+                self.range_size,
+                start=len(self._data),
+                etag=self.etag,
+            )
+        try:
+            data = self._remote.read(size)
+            if self._remote.restarted:
+                # what came before belongs to another body: replace it, up
+                # to where this reader had got to
+                self._remote.restarted = False
+                self._data = bytearray(data)
+                self._cached = 0
+                while data and len(self._data) < self._offset:
+                    data = self._remote.read(self._offset - len(self._data))
+                    self._data += data
+                return self.read(size)
+        except HTTPError as exc:
+            if exc.code == 404:
+                self.cache.store_missing(self.url)
+            raise
+        self._data += data
+        self._offset += len(data)
+        return data
+
+    def close(self) -> None:
+        if self._remote is None:
+            return
+        self._remote.close()
+        if len(self._data) > self._cached:
+            self.cache.store(self.url, bytes(self._data), self._remote.headers)
+        self._remote = None
+
+
+class HttpCache:
+    """
+    Content-addressed on-disk cache of HTTP responses, shared by all commands.
+
+    Bodies are stored once per distinct content in `http-cache/objects`,
+    named after their SHA-256, and `http-cache/index.json` maps every URL to
+    its body, status and validators. An entry is used as-is while it is
+    younger than its TTL (`HTTP_CACHE_TTL`, or an hour for a 404). For
+    `HTTP_CACHE_STALE` seconds after that, it is still used, but revalidated
+    in the background with a conditional HEAD request. Once the cached
+    bodies add up to more than `HTTP_CACHE_SIZE` MiB, the least recently
+    used entries are evicted, and once a day, bodies no entry refers to
+    (left by a process that stopped before saving its entries) are deleted.
+
+    Existence checks are answered from any cached response (a cached 404
+    included), and otherwise with a HEAD request, so checking that a PEP
+    exists never downloads it.
+    """
+
+    MISSING_TTL = 3600  # seconds a 404 is remembered for
+    ENTRY_SIZE = 256  # rough size of an entry in the index, counted against the cap
+    SWEEP_INTERVAL = 86400  # seconds between looking for unreferenced bodies
+    # seconds before an unreferenced body is deleted, so that one another
+    # process has stored, but not saved the entry for yet, is kept
+    ORPHAN_AGE = 3600
+
+    def __init__(
+        self, pepper_dir: pathlib.Path, config: dict, pool: ConnectionPool = None
+    ) -> None:
+        import threading
+
+        self.dir = pepper_dir.joinpath("http-cache")
+        self.index_path = self.dir.joinpath("index.json")
+        self.ttl = int(config.get("HTTP_CACHE_TTL", HTTP_CACHE_TTL))
+        self.stale = int(config.get("HTTP_CACHE_STALE", HTTP_CACHE_STALE))
+        self.max_size = int(config.get("HTTP_CACHE_SIZE", HTTP_CACHE_SIZE)) << 20
+        self.offline = config.get("USE_OFFLINE") == "true"
+        self.pool = pool or ConnectionPool()
+        self._lock = threading.Lock()
+        self._entries = None
+        self._changed = set()  # URLs whose entries have to be written back
+        self._written = set()  # bodies stored by this process
+        self._revalidating = []
+
+    def _read_index(self) -> dict:
+        import json
+
+        with suppress(OSError, ValueError):
+            return json.loads(self.index_path.read_text())
+        return {}
+
+    @property
+    def entries(self) -> dict:
+        if self._entries is None:
+            self._entries = self._read_index()
+        return self._entries
+
+    def _blob_path(self, digest: str) -> pathlib.Path:
+        return self.dir.joinpath("objects", digest[:2], digest[2:])
+
+    def _lookup(self, url: str):
+        """Return the entry for `url`, and whether it is fresh, stale or expired."""
+        with self._lock:
+            entry = self.entries.get(url)
+            if entry is None:
+                return None, None
+            entry["accessed"] = time.time()
+            self._changed.add(url)
+        ttl = self.MISSING_TTL if entry["status"] == 404 else self.ttl
+        age = time.time() - entry["fetched"]
+        if age < ttl or self.offline:
+            return entry, "fresh"
+        if age < ttl + self.stale:
+            return entry, "stale"
+        return entry, "expired"
+
+    def _put(self, url: str, entry) -> None:
+        with self._lock:
+            if entry is None:
+                self.entries.pop(url, None)
+            else:
+                entry["accessed"] = time.time()
+                self.entries[url] = entry
+            self._changed.add(url)
+
+    @staticmethod
+    def _validators(entry) -> dict:
+        headers = {}
+        if entry is not None and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry is not None and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, url: str, body: bytes, headers=None) -> None:
+        """Store (the start of) the body of a response to `url`."""
+        import hashlib
+
+        digest = hashlib.sha256(body).hexdigest()
+        path = self._blob_path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            tmp_path.write_bytes(body)
+            os.replace(tmp_path, path)
+        with self._lock:
+            self._written.add(digest)
+        self._put(
+            url,
+            {
+                "status": 200,
+                "blob": digest,
+                "size": len(body),
+                "etag": headers.get("ETag") if headers else None,
+                "last_modified": headers.get("Last-Modified") if headers else None,
+                "fetched": time.time(),
+            },
+        )
+
+    def store_missing(self, url: str) -> None:
+        self._put(url, {"status": 404, "blob": None, "size": 0, "fetched": time.time()})
+
+    def _revalidate(self, url: str, entry: dict) -> None:
+        from urllib.error import HTTPError, URLError
+
+        try:
+            with TRACE.phase("revalidate", url=url) as fields:
+                res = self.pool.request(url, "HEAD", self._validators(entry))
+                res.read()
+                fields["status"] = res.status
+        except HTTPError as exc:
+            if exc.code == 404:
+                self.store_missing(url)
+            return
+        except URLError:
+            return  # keep serving the stale entry until it expires
+        etag = res.headers.get("ETag")
+        if res.status == 304 or (etag and etag == entry.get("etag")):
+            self._put(url, dict(entry, fetched=time.time()))
+        else:
+            self._put(url, None)  # changed: fetched again on next use
+
+    def _revalidate_later(self, url: str, entry: dict) -> None:
+        import threading
+
+        thread = threading.Thread(target=self._revalidate, args=(url, entry))
+        thread.start()
+        self._revalidating.append(thread)
+
+    def exists(self, url: str) -> bool:
+        """
+        Return whether `url` exists, using a HEAD request if it isn't cached.
+
+        Raises `HTTPError` for error statuses other than 404, and `URLError`
+        when the server can't be reached.
+        """
+        from urllib.error import HTTPError
+
+        entry, state = self._lookup(url)
+        if state in ("fresh", "stale"):
+            TRACE.cache("http", "hit" if state == "fresh" else "stale", url=url)
+            if state == "stale":
+                self._revalidate_later(url, entry)
+            return entry["status"] != 404
+        TRACE.cache("http", "miss" if entry is None else "expired", url=url)
+
+        try:
+            res = self.pool.request(url, "HEAD", self._validators(entry))
+            res.read()
+        except HTTPError as exc:
+            if exc.code == 404:
+                self.store_missing(url)
+                return False
+            if exc.code not in (405, 501):
+                raise
+            # no HEAD support: fall back to a GET, abandoned unread
+            self.pool.request(url).close()
+            self.pool.discard(url)
+            return True
+
+        etag = res.headers.get("ETag")
+        if entry is not None and (
+            res.status == 304 or (etag and etag == entry.get("etag"))
+        ):
+            self._put(url, dict(entry, fetched=time.time()))
+        else:
+            self._put(
+                url,
+                {
+                    "status": 200,
+                    "blob": None,
+                    "size": 0,
+                    "etag": etag,
+                    "last_modified": res.headers.get("Last-Modified"),
+                    "fetched": time.time(),
+                },
+            )
+        return True
+
+    def open(self, url: str, range_size: int) -> CachedReader:
+        """
+        Return a binary reader of the body of `url`.
+
+        Only the part of the body that isn't cached yet is downloaded (in
+        `range_size` byte pieces), and only once it is read. Raises
+        `HTTPError` and `URLError` like `ConnectionPool.request`.
+        """
+        from urllib.error import HTTPError
+
+        entry, state = self._lookup(url)
+        body = None
+        if state in ("fresh", "stale"):
+            if entry["status"] == 404:
+                TRACE.cache("http", "hit", url=url)
+                raise HTTPError(url, 404, "Not Found", None, None)
+            if entry["blob"] is not None:
+                with suppress(OSError):
+                    body = self._blob_path(entry["blob"]).read_bytes()
+        if body is None:
+            TRACE.cache("http", "expired" if state == "expired" else "miss", url=url)
+            return CachedReader(self, url, b"", range_size)
+        TRACE.cache("http", "hit" if state == "fresh" else "stale", url=url)
+        if state == "stale":
+            self._revalidate_later(url, entry)
+        return CachedReader(self, url, body, range_size, entry.get("etag"))
+
+    def _evict(self, entries: dict) -> None:
+        sizes = {
+            entry["blob"]: entry["size"] for entry in entries.values() if entry["blob"]
+        }
+        total = sum(sizes.values()) + self.ENTRY_SIZE * len(entries)
+        if total <= self.max_size:
+            return
+        references = Counter(entry["blob"] for entry in entries.values())
+        by_age = sorted(entries, key=lambda url: entries[url].get("accessed", 0))
+        for url in by_age:
+            if total <= self.max_size:
+                break
+            entry = entries.pop(url)
+            total -= self.ENTRY_SIZE
+            references[entry["blob"]] -= 1
+            if entry["blob"] and not references[entry["blob"]]:
+                total -= entry["size"]
+
+    def _sweep(self, entries: dict) -> None:
+        """Delete the bodies, and partly written ones, no entry refers to."""
+        marker = self.dir.joinpath("swept")
+        with suppress(OSError):
+            if time.time() - marker.stat().st_mtime < self.SWEEP_INTERVAL:
+                return
+        referenced = {entry["blob"] for entry in entries.values()}
+        cutoff = time.time() - self.ORPHAN_AGE
+        for path in self.dir.joinpath("objects").glob("*/*"):
+            with suppress(OSError):
+                if (
+                    path.parent.name + path.name not in referenced
+                    and path.stat().st_mtime < cutoff
+                ):
+                    path.unlink()
+        marker.touch()
+
+    @contextmanager
+    def _index_lock(self):
+        try:
+            import fcntl
+        except ImportError:  # no locking on Windows; the last writer wins
+            yield
+            return
+        with open(self.dir.joinpath("index.lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def save(self) -> None:
+        """
+        Wait for any background revalidation, then write the index back.
+
+        The index is merged with the one on disk, so entries written by
+        other pepper processes in the meantime aren't lost.
+        """
+        import json
+
+        for thread in self._revalidating:
+            thread.join()
+        self._revalidating = []
+        if not self._changed:
+            return
+        self.dir.mkdir(exist_ok=True)
+        with self._index_lock():
+            entries = self._read_index()
+            blobs = {entry["blob"] for entry in entries.values()} | self._written
+            for url in self._changed:
+                if url in self.entries:
+                    entries[url] = self.entries[url]
+                else:
+                    entries.pop(url, None)
+            self._evict(entries)
+            self._sweep(entries)
+            tmp_path = self.index_path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(entries))
+            os.replace(tmp_path, self.index_path)
+            # drop the bodies nothing refers to anymore
+            for digest in blobs - {entry["blob"] for entry in entries.values()}:
+                if digest is not None:
+                    with suppress(OSError):
+                        self._blob_path(digest).unlink()
+        with self._lock:
+            self._entries = entries
+            self._changed.clear()
+            self._written.clear()
+
+    def close(self) -> None:
+        self.save()
+        self.pool.close()
+
+
+class PepTextParser(HTMLParser):
+    """Extract the readable text (and page title) from a rendered PEP."""
+
+    SKIPPED_TAGS = ("script", "style", "nav", "header", "footer")
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._skip_depth = 0
+        self._article_depth = 0
+        self._in_title = False
+        self._in_headerlink = False
+        self.title = ""
+        self.article_text = []
+        self.body_text = []
+
+    def handle_starttag(self, tag, attrs) -> None:
+        if tag in self.SKIPPED_TAGS:
+            self._skip_depth += 1
+        elif tag == "article":
+            self._article_depth += 1
+        elif tag == "h1" and ("class", "page-title") in attrs:
+            self._in_title = True
+        elif tag == "a" and ("class", "headerlink") in attrs:
+            self._in_headerlink = True
+
+    def handle_endtag(self, tag) -> None:
+        if tag in self.SKIPPED_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+        elif tag == "article" and self._article_depth:
+            self._article_depth -= 1
+        elif tag == "h1":
+            self._in_title = False
+        elif tag == "a":
+            self._in_headerlink = False
+
+    def handle_data(self, data) -> None:
+        if self._in_title:
+            self.title += data
+        if self._skip_depth or self._in_headerlink:
+            return
+        self.body_text.append(data)
+        if self._article_depth:
+            self.article_text.append(data)
+
+    @classmethod
+    def parse(cls, data: bytes) -> tuple:
+        parser = cls()
+        parser.feed(data.decode(errors="replace"))
+        text = "".join(parser.article_text or parser.body_text)
+        title = parser.title.split(" – ", 1)[-1]
+        return title, text
+
+
+class PepRecord:
+    """
+    Lightweight view of a single PEP stored in a `PepIndex`.
+
+    Fields are decoded from the memory-mapped index on access. Records can
+    also be subscripted like the dicts produced by `PepZeroParser`.
+    """
+
+    __slots__ = ("_index", "_offset")
+
+    def __init__(self, index: "PepIndex", offset: int) -> None:
+        self._index = index
+        self._offset = offset
+
+    def _unpack(self):
+        return PepIndex.RECORD.unpack_from(self._index._map, self._offset)
+
+    @property
+    def number(self) -> int:
+        return self._unpack()[0]
+
+    @property
+    def type(self) -> str:
+        return self._index.types[self._unpack()[1]]
+
+    @property
+    def status(self) -> str:
+        return self._index.statuses[self._unpack()[2]]
+
+    @property
+    def title(self) -> str:
+        return self._index.string(self._unpack()[4])
+
+    @property
+    def authors(self) -> list:
+        _, _, _, count, _, start = self._unpack()
+        return [
+            self._index.string(sid)
+            for sid in struct.unpack_from(
+                f"<{count}I", self._index._map, self._index._authors_offset + start * 4
+            )
+        ]
+
+    def __getitem__(self, key: str):
+        if key not in self._index.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default=None):
+        if key not in self._index.FIELDS:
+            return default
+        return getattr(self, key)
+
+    def to_dict(self) -> dict:
+        index = self._index
+        number, type_code, status_code, count, title, start = self._unpack()
+        authors = struct.unpack_from(
+            f"<{count}I", index._map, index._authors_offset + start * 4
+        )
+        return {
+            "number": number,
+            "type": index.types[type_code],
+            "status": index.statuses[status_code],
+            "title": index.string(title),
+            "authors": [index.string(sid) for sid in authors],
+        }
+
+    def __repr__(self) -> str:
+        return f"<PepRecord {self.number}: {self.title!r}>"
+
+
+class PepIndex:
+    """
+    Compact, memory-mapped binary index of the parsed PEP 0 data.
+
+    Layout (all integers little-endian):
+        header:      magic, then counts of records, strings, author refs,
+                     types and statuses
+        types:       string ids of the type names, in code order
+        statuses:    string ids of the status names, in code order
+        records:     fixed-size (number, type code, status code, author count,
+                     title string id, first author ref) entries
+        author refs: string ids of every author, grouped per record
+        strings:     offset table followed by a deduplicated UTF-8 blob
+
+    Type and status codes are seeded from `PEP_TYPES` and `PEP_STATUSES`, so
+    they stay stable between index files.
+    """
+
+    MAGIC = b"PEPIDX01"
+    HEADER = struct.Struct("<8s5I")
+    RECORD = struct.Struct("<IBBHII")
+    FIELDS = ("number", "type", "status", "title", "authors")
+
+    def __init__(self, path: pathlib.Path) -> None:
+        import mmap
+
+        with open(path, "rb") as fp:
+            self._map = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, records, strings, author_refs, types, statuses = self.HEADER.unpack_from(
+            self._map, 0
+        )
+        if magic != self.MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a pepper index file")
+
+        self._count = records
+        offset = self.HEADER.size
+        type_ids = struct.unpack_from(f"<{types}I", self._map, offset)
+        offset += types * 4
+        status_ids = struct.unpack_from(f"<{statuses}I", self._map, offset)
+        offset += statuses * 4
+        self._records_offset = offset
+        offset += records * self.RECORD.size
+        self._authors_offset = offset
+        offset += author_refs * 4
+        self._strings_offset = offset
+        self._blob_offset = offset + (strings + 1) * 4
+
+        self.types = [self.string(sid) for sid in type_ids]
+        self.statuses = [self.string(sid) for sid in status_ids]
+
+    def string(self, sid: int) -> str:
+        start, end = struct.unpack_from(
+            "<2I", self._map, self._strings_offset + sid * 4
+        )
+        return str(
+            self._map[self._blob_offset + start : self._blob_offset + end], "utf-8"
+        )
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, position: int) -> PepRecord:
+        if position < 0:
+            position += self._count
+        if not 0 <= position < self._count:
+            raise IndexError("PEP index out of range")
+        return PepRecord(self, self._records_offset + position * self.RECORD.size)
+
+    def __iter__(self):
+        for offset in range(
+            self._records_offset,
+            self._records_offset + self._count * self.RECORD.size,
+            self.RECORD.size,
+        ):
+            yield PepRecord(self, offset)
+
+    def close(self) -> None:
+        self._map.close()
+
+    @classmethod
+    def write(cls, path: pathlib.Path, peps: list) -> None:
+        strings = {}
+        types = {name: code for code, name in enumerate(PEP_TYPES)}
+        statuses = {name: code for code, name in enumerate(PEP_STATUSES)}
+
+        def intern(value: str) -> int:
+            return strings.setdefault(value, len(strings))
+
+        records = bytearray()
+        author_refs = []
+        for pep in peps:
+            type_code = types.setdefault(pep["type"], len(types))
+            status_code = statuses.setdefault(pep["status"], len(statuses))
+            records += cls.RECORD.pack(
+                pep["number"],
+                type_code,
+                status_code,
+                len(pep["authors"]),
+                intern(pep["title"]),
+                len(author_refs),
+            )
+            author_refs.extend(intern(author) for author in pep["authors"])
+        type_ids = [intern(name) for name in types]
+        status_ids = [intern(name) for name in statuses]
+
+        blob = bytearray()
+        string_offsets = [0]
+        for value in strings:
+            blob += value.encode()
+            string_offsets.append(len(blob))
+
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as fp:
+            fp.write(
+                cls.HEADER.pack(
+                    cls.MAGIC,
+                    len(records) // cls.RECORD.size,
+                    len(strings),
+                    len(author_refs),
+                    len(type_ids),
+                    len(status_ids),
+                )
+            )
+            for table in (type_ids, status_ids):
+                fp.write(struct.pack(f"<{len(table)}I", *table))
+            fp.write(records)
+            fp.write(struct.pack(f"<{len(author_refs)}I", *author_refs))
+            fp.write(struct.pack(f"<{len(string_offsets)}I", *string_offsets))
+            fp.write(blob)
+        os.replace(tmp_path, path)
+
+
+class PepIndexCache:
+    """
+    On-disk cache of the parsed PEP 0 index, stored in the pepper directory.
+
+    The cached index is used as-is while it is younger than `INDEX_TTL`
+    (from pepper.conf), after which it is revalidated with a conditional
+    request. When `USE_OFFLINE` is set, the network is never touched, and
+    the index is built from the local offline docs if no cache exists yet.
+
+    `opened`, if given, is a dict that keeps the stored index open between
+    uses (by the daemon, across requests): it is only mapped again once
+    the file has been replaced.
+    """
+
+    def __init__(
+        self,
+        pepper_dir: pathlib.Path,
+        config: dict,
+        pool: ConnectionPool = None,
+        opened: dict = None,
+    ) -> None:
+        self.pepper_dir = pepper_dir
+        self.pool = pool or ConnectionPool()
+        self.path = pepper_dir.joinpath("pep0-index.bin")
+        self.meta_path = pepper_dir.joinpath("pep0-index.json")
+        self.ttl = int(config.get("INDEX_TTL", PEP_INDEX_TTL))
+        self.offline = config.get("USE_OFFLINE") == "true"
+        self.opened = opened
+
+    def _open(self) -> PepIndex:
+        if self.opened is None:
+            return PepIndex(self.path)
+        stat_result = self.path.stat()
+        key = (stat_result.st_ino, stat_result.st_mtime_ns)
+        cached = self.opened.get(self.path)
+        if cached is None or cached[0] != key:
+            if cached is not None:
+                cached[1].close()
+            cached = self.opened[self.path] = (key, PepIndex(self.path))
+        return cached[1]
+
+    def _read_meta(self):
+        import json
+
+        if not self.path.exists():
+            return None
+        with suppress(OSError, ValueError):
+            return json.loads(self.meta_path.read_text())
+        return None
+
+    def _write_meta(self, meta: dict) -> None:
+        import json
+
+        tmp_path = self.meta_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(meta))
+        os.replace(tmp_path, self.meta_path)
+
+    def _store(self, peps: list, etag=None, last_modified=None) -> None:
+        PepIndex.write(self.path, peps)
+        # the change feed is a nice-to-have; never fail a search over it
+        with suppress(OSError):
+            PepIndexHistory(self.pepper_dir.joinpath("pep0-history.jsonl")).record(peps)
+        self._write_meta(
+            {"fetched": time.time(), "etag": etag, "last_modified": last_modified}
+        )
+
+    def _stream(self, stream, etag=None, last_modified=None):
+        peps = []
+        for pep in PepZeroParser.iter_parse(stream):
+            peps.append(pep)
+            yield pep
+        self._store(peps, etag=etag, last_modified=last_modified)
+
+    def _load_offline(self):
+        pep_zero = self.pepper_dir.joinpath("peps", "peps-html", "pep-0000.html")
+        if not pep_zero.exists():
+            fatal_error(
+                "No cached PEP index found, and no offline copy of PEP 0 exists...\n"
+                "Run `pepper generate_offline_docs`, or disable `USE_OFFLINE`."
+            )
+        return self._stream(open(pep_zero, "rb"))
+
+    def records(self):
+        """
+        Return the PEP 0 index as an iterable of PEPs.
+
+        This is the cached `PepIndex` when it is still fresh. Otherwise, it is
+        a generator that yields PEPs while PEP 0 is being downloaded (and
+        parsed), and stores the new index once it has been exhausted.
+        """
+        from urllib.error import HTTPError, URLError
+
+        meta = self._read_meta()
+        if meta is not None:
+            if self.offline or time.time() - meta["fetched"] < self.ttl:
+                TRACE.cache("pep0-index", "hit")
+                return self._open()
+        elif self.offline:
+            TRACE.cache("pep0-index", "miss")
+            return self._load_offline()
+
+        headers = {}
+        if meta is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        try:
+            res = self.pool.request(PEP_0_URL, headers=headers)
+        except HTTPError as exc:
+            fatal_error(f"Recieved error status code '{exc.code}' from python.org")
+        except URLError:
+            if meta is None:
+                fatal_error(
+                    "Unable to reach python.org, and no cached PEP index exists..."
+                )
+            TRACE.cache("pep0-index", "stale")
+            sys.stderr.write(
+                "No internet connection detected. Using cached PEP index.\n"
+            )
+            return self._open()
+
+        if res.status == 304 and meta is not None:
+            res.close()
+            TRACE.cache("pep0-index", "revalidated")
+            meta["fetched"] = time.time()
+            self._write_meta(meta)
+            return self._open()
+
+        TRACE.cache("pep0-index", "miss" if meta is None else "expired")
+        return self._stream(
+            res,
+            etag=res.headers.get("ETag"),
+            last_modified=res.headers.get("Last-Modified"),
+        )
+
+    def load(self) -> PepIndex:
+        """Return the (refreshed, if needed) PEP 0 index as a `PepIndex`."""
+        records = self.records()
+        if isinstance(records, PepIndex):
+            return records
+        for _ in records:
+            pass
+        return self._open()
+
+
+class PepIndexHistory:
+    """
+    Append-only log of the changes to the PEP 0 index, one line per refresh.
+
+    Each line is a JSON object with the time of the refresh, and only what
+    changed since the one before: the PEPs that were added (every field, in
+    `FIELDS` order), the fields of existing PEPs that changed, and the PEPs
+    that were removed. Refreshes that change nothing aren't logged, so the
+    log stays small even with daily refreshes over years. Snapshots are
+    numbered by their line in the log, from 1 (which adds every PEP).
+    """
+
+    FIELDS = ("type", "status", "title", "authors")
+
+    def __init__(self, path: pathlib.Path) -> None:
+        self.path = path
+
+    def snapshots(self):
+        """Yield (snapshot id, time, delta) for every snapshot, oldest first."""
+        import json
+
+        try:
+            log = open(self.path, encoding="utf-8")
+        except FileNotFoundError:
+            return
+        with log:
+            for snapshot_id, line in enumerate(log, 1):
+                # skip a line left incomplete by an interrupted write; it is
+                # logged again on the next refresh
+                with suppress(ValueError, KeyError):
+                    delta = json.loads(line)
+                    yield snapshot_id, delta["time"], delta
+
+    @classmethod
+    def apply(cls, state: dict, delta: dict) -> None:
+        """Apply a delta to `state` ({number: {field: value}}), in place."""
+        for number, values in delta.get("added", {}).items():
+            state[int(number)] = dict(zip(cls.FIELDS, values))
+        for number, fields in delta.get("changed", {}).items():
+            state.setdefault(int(number), {}).update(fields)
+        for number in delta.get("removed", ()):
+            state.pop(number, None)
+
+    @classmethod
+    def diff(cls, old: dict, new: dict) -> dict:
+        """Return the delta turning the state `old` into `new` (empty if equal)."""
+        delta = {}
+        added, changed = {}, {}
+        for number, pep in new.items():
+            previous = old.get(number)
+            if previous is None:
+                added[str(number)] = [pep[field] for field in cls.FIELDS]
+                continue
+            fields = {
+                field: pep[field]
+                for field in cls.FIELDS
+                if previous.get(field) != pep[field]
+            }
+            if fields:
+                changed[str(number)] = fields
+        removed = sorted(number for number in old if number not in new)
+        if added:
+            delta["added"] = added
+        if changed:
+            delta["changed"] = changed
+        if removed:
+            delta["removed"] = removed
+        return delta
+
+    def state(self) -> dict:
+        state = {}
+        for _, _, delta in self.snapshots():
+            self.apply(state, delta)
+        return state
+
+    def record(self, peps) -> bool:
+        """
+        Log a snapshot of `peps`, if anything changed since the last one.
+
+        The delta is taken against the state replayed from the log itself
+        (not the previous cached index), so the two can never drift apart.
+        """
+        import json
+
+        new = {
+            pep["number"]: {field: pep[field] for field in self.FIELDS} for pep in peps
+        }
+        delta = self.diff(self.state(), new)
+        if not delta:
+            return False
+        line = json.dumps(
+            {"time": int(time.time()), **delta},
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        # after a line an interrupted write left incomplete, start a new one
+        with suppress(OSError), open(self.path, "rb") as log:
+            log.seek(-1, os.SEEK_END)
+            if log.read(1) != b"\n":
+                line = "\n" + line
+        # a single write to a file opened for appending, so that concurrent
+        # refreshes can't interleave their lines
+        with open(self.path, "a", encoding="utf-8") as log:
+            log.write(line + "\n")
+        return True
+
+
+class FullTextIndex:
+    """
+    Persistent inverted index over the text of every local PEP.
+
+    Layout (all integers little-endian):
+        header:   magic, then counts of documents and terms, and the
+                  average document length
+        docs:     (number, token count, title start/end, text start/end)
+                  entries, where titles and zlib-compressed texts live in
+                  the blob at the end of the file
+        terms:    offset table into the sorted term blob
+        postings: offset table into the postings region, in which every
+                  term has a run of (doc, term frequency) pairs
+        blobs:    the term blob, the postings region, then the text blob
+
+    Queries are ranked with BM25, and only the texts of the returned
+    documents are decompressed (to build snippets).
+    """
+
+    MAGIC = b"PEPFTS01"
+    HEADER = struct.Struct("<8s2Id")
+    DOC = struct.Struct("<6I")
+    POSTING = struct.Struct("<2I")
+    TOKEN_RE = re.compile(r"\w+")
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, path: pathlib.Path) -> None:
+        import mmap
+
+        with open(path, "rb") as fp:
+            self._map = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._doc_count, self._term_count, self._avgdl = self.HEADER.unpack_from(
+            self._map, 0
+        )
+        if magic != self.MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a pepper full-text index file")
+
+        self._docs_offset = self.HEADER.size
+        self._terms_offset = self._docs_offset + self._doc_count * self.DOC.size
+        self._postings_offset = self._terms_offset + (self._term_count + 1) * 4
+        self._term_blob_offset = self._postings_offset + (self._term_count + 1) * 4
+        term_blob_size = self._table_entry(self._terms_offset, self._term_count)
+        self._postings_blob_offset = self._term_blob_offset + term_blob_size
+        postings_size = self._table_entry(self._postings_offset, self._term_count)
+        self._text_blob_offset = self._postings_blob_offset + postings_size
+
+    def _table_entry(self, table_offset: int, position: int) -> int:
+        return struct.unpack_from("<I", self._map, table_offset + position * 4)[0]
+
+    def term(self, position: int) -> str:
+        start, end = struct.unpack_from(
+            "<2I", self._map, self._terms_offset + position * 4
+        )
+        return str(
+            self._map[self._term_blob_offset + start : self._term_blob_offset + end],
+            "utf-8",
+        )
+
+    def _find_term(self, term: str) -> int:
+        # binary search over the sorted term table, decoding only the
+        # terms we actually compare against
+        low, high = 0, self._term_count
+        while low < high:
+            middle = (low + high) // 2
+            if self.term(middle) < term:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def expand(self, term: str) -> list:
+        """Return the positions of all indexed terms matching `term`."""
+        if not term.endswith("*"):
+            position = self._find_term(term)
+            if position < self._term_count and self.term(position) == term:
+                return [position]
+        # fall back to a prefix match (i.e. `pyobject_gc` -> `pyobject_gc_track`)
+        prefix = term.rstrip("*")
+        position = self._find_term(prefix)
+        matches = []
+        while position < self._term_count and self.term(position).startswith(prefix):
+            matches.append(position)
+            position += 1
+        return matches
+
+    def postings(self, position: int) -> list:
+        start, end = struct.unpack_from(
+            "<2I", self._map, self._postings_offset + position * 4
+        )
+        return list(
+            self.POSTING.iter_unpack(
+                self._map[
+                    self._postings_blob_offset
+                    + start : self._postings_blob_offset
+                    + end
+                ]
+            )
+        )
+
+    def document(self, doc: int) -> tuple:
+        number, length, title_start, title_end, text_start, text_end = (
+            self.DOC.unpack_from(self._map, self._docs_offset + doc * self.DOC.size)
+        )
+        blob = self._text_blob_offset
+        title = str(self._map[blob + title_start : blob + title_end], "utf-8")
+        return number, length, title, (blob + text_start, blob + text_end)
+
+    def text(self, doc: int) -> str:
+        import zlib
+
+        start, end = self.document(doc)[3]
+        return zlib.decompress(self._map[start:end]).decode()
+
+    def search(self, query: str, limit: int = FULLTEXT_RESULTS) -> list:
+        """
+        Rank documents against `query` with BM25.
+
+        Returns a list of (score, number, title, snippet) tuples, best first.
+        A trailing `*` on a query term matches every term with that prefix.
+        """
+        import heapq
+        import math
+
+        scores = Counter()
+        for term in query.lower().split():
+            for token in self.TOKEN_RE.findall(term) if "*" not in term else [term]:
+                for position in self.expand(token):
+                    postings = self.postings(position)
+                    idf = math.log(
+                        (self._doc_count - len(postings) + 0.5) / (len(postings) + 0.5)
+                        + 1
+                    )
+                    for doc, frequency in postings:
+                        length = self.document(doc)[1]
+                        scores[doc] += (
+                            idf
+                            * frequency
+                            * (self.K1 + 1)
+                            / (
+                                frequency
+                                + self.K1 * (1 - self.B + self.B * length / self._avgdl)
+                            )
+                        )
+
+        results = []
+        for doc, score in heapq.nlargest(limit, scores.items(), key=lambda x: x[1]):
+            number, _, title, _ = self.document(doc)
+            results.append((score, number, title, self.snippet(doc, query)))
+        return results
+
+    def snippet(self, doc: int, query: str, width: int = 160) -> str:
+        text = self.text(doc)
+        pattern = "|".join(
+            re.escape(term.rstrip("*")) for term in query.split() if term.rstrip("*")
+        )
+        match = re.search(pattern, text, re.IGNORECASE) if pattern else None
+        start = max(0, match.start() - width // 2) if match is not None else 0
+        snippet = " ".join(text[start : start + width].split())
+        if start > 0:
+            snippet = "..." + snippet
+        if start + width < len(text):
+            snippet += "..."
+        return snippet
+
+    def close(self) -> None:
+        self._map.close()
+
+    @classmethod
+    def build(cls, path: pathlib.Path, sources: list) -> None:
+        """Build the index for `sources`, a list of (number, path) pairs."""
+        import zlib
+
+        postings = {}
+        docs = bytearray()
+        text_blob = bytearray()
+        total_length = 0
+        for doc, (number, source) in enumerate(sources):
+            if source.suffix == ".html":
+                title, text = PepTextParser.parse(source.read_bytes())
+            else:
+                text = source.read_text(errors="replace")
+                title_match = re.search(r"^Title:\s*(.+)$", text, re.MULTILINE)
+                title = title_match.group(1).strip() if title_match else ""
+
+            frequencies = Counter(cls.TOKEN_RE.findall(text.lower()))
+            for token, frequency in frequencies.items():
+                postings.setdefault(token, []).append((doc, frequency))
+            length = sum(frequencies.values())
+            total_length += length
+
+            title_start = len(text_blob)
+            text_blob += title.encode()
+            text_start = len(text_blob)
+            text_blob += zlib.compress(text.encode())
+            docs += cls.DOC.pack(
+                number, length, title_start, text_start, text_start, len(text_blob)
+            )
+
+        terms = sorted(postings)
+        term_blob = bytearray()
+        term_offsets = [0]
+        postings_blob = bytearray()
+        postings_offsets = [0]
+        for term in terms:
+            term_blob += term.encode()
+            term_offsets.append(len(term_blob))
+            for entry in postings[term]:
+                postings_blob += cls.POSTING.pack(*entry)
+            postings_offsets.append(len(postings_blob))
+
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as fp:
+            fp.write(
+                cls.HEADER.pack(
+                    cls.MAGIC,
+                    len(sources),
+                    len(terms),
+                    total_length / len(sources) if sources else 0.0,
+                )
+            )
+            fp.write(docs)
+            fp.write(struct.pack(f"<{len(term_offsets)}I", *term_offsets))
+            fp.write(struct.pack(f"<{len(postings_offsets)}I", *postings_offsets))
+            fp.write(term_blob)
+            fp.write(postings_blob)
+            fp.write(text_blob)
+        os.replace(tmp_path, path)
+
+
+def _load_fulltext_index(pepper_dir: pathlib.Path, rebuild: bool = False):
+    """Open the full-text index, building it from the local PEPs if needed."""
+    index_path = pepper_dir.joinpath("fulltext-index.bin")
+    if rebuild or not index_path.exists():
+        sources = _local_pep_paths(pepper_dir, prefer="html")
+        if not sources:
+            fatal_error(
+                "No local PEPs found to index...\n"
+                "Run `pepper generate_offline_docs` first."
+            )
+        sys.stderr.write(f"Indexing {len(sources)} PEPs for full-text search...\n")
+        FullTextIndex.build(index_path, sources)
+    return FullTextIndex(index_path)
+
+
+class TrigramIndex:
+    """
+    Persistent trigram index over the words of every PEP title and author,
+    for typo-tolerant (fuzzy) search.
+
+    Layout (all integers little-endian):
+        header:    magic, then counts of PEPs, words and trigrams
+        peps:      (number, then start/end offsets of the title, authors,
+                   type and status in the string blob) entries
+        words:     offset table into the sorted word blob
+        peps/word: offset table into the occurrences region, in which every
+                   word has a run of PEP positions
+        trigrams:  sorted trigram keys (three code points packed into one
+                   64-bit integer), then an offset table into the postings
+                   region, in which every trigram has a run of word positions
+        blobs:     the word blob, the occurrences region, the postings region,
+                   then the string blob
+
+    A query word is only compared against the indexed words it shares a
+    trigram with, so looking one up costs a few binary searches and a
+    handful of string comparisons, whatever the size of the index.
+    """
+
+    MAGIC = b"PEPTRI01"
+    HEADER = struct.Struct("<8s3I")
+    PEP = struct.Struct("<9I")
+    TOKEN_RE = re.compile(r"\w+")
+    MAX_CANDIDATES = 64  # words compared against each query word
+
+    def __init__(self, path: pathlib.Path) -> None:
+        import mmap
+
+        with open(path, "rb") as fp:
+            self._map = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._pep_count, self._word_count, self._trigram_count = (
+            self.HEADER.unpack_from(self._map, 0)
+        )
+        if magic != self.MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a pepper trigram index file")
+
+        self._peps_offset = self.HEADER.size
+        self._words_offset = self._peps_offset + self._pep_count * self.PEP.size
+        self._occurrences_offset = self._words_offset + (self._word_count + 1) * 4
+        self._keys_offset = self._occurrences_offset + (self._word_count + 1) * 4
+        self._postings_offset = self._keys_offset + self._trigram_count * 8
+        self._word_blob_offset = self._postings_offset + (self._trigram_count + 1) * 4
+        self._occurrences_blob_offset = self._word_blob_offset + self._table_entry(
+            self._words_offset, self._word_count
+        )
+        self._postings_blob_offset = self._occurrences_blob_offset + self._table_entry(
+            self._occurrences_offset, self._word_count
+        )
+        self._string_blob_offset = self._postings_blob_offset + self._table_entry(
+            self._postings_offset, self._trigram_count
+        )
+
+    def _table_entry(self, table_offset: int, position: int) -> int:
+        return struct.unpack_from("<I", self._map, table_offset + position * 4)[0]
+
+    def _run(self, table_offset: int, blob_offset: int, position: int) -> tuple:
+        start, end = struct.unpack_from("<2I", self._map, table_offset + position * 4)
+        count = (end - start) // 4
+        return struct.unpack_from(f"<{count}I", self._map, blob_offset + start)
+
+    @staticmethod
+    def trigrams(word: str) -> set:
+        """The trigrams of `word`, padded like pg_trgm does (`  w`, ` wo`, ...)."""
+        padded = f"  {word} "
+        return {
+            ord(padded[i]) << 42 | ord(padded[i + 1]) << 21 | ord(padded[i + 2])
+            for i in range(len(padded) - 2)
+        }
+
+    def word(self, position: int) -> str:
+        start, end = struct.unpack_from(
+            "<2I", self._map, self._words_offset + position * 4
+        )
+        return str(
+            self._map[self._word_blob_offset + start : self._word_blob_offset + end],
+            "utf-8",
+        )
+
+    def _find_trigram(self, key: int):
+        low, high = 0, self._trigram_count
+        while low < high:
+            middle = (low + high) // 2
+            if (
+                struct.unpack_from("<Q", self._map, self._keys_offset + middle * 8)[0]
+                < key
+            ):
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._trigram_count:
+            if (
+                struct.unpack_from("<Q", self._map, self._keys_offset + low * 8)[0]
+                == key
+            ):
+                return low
+        return None
+
+    def pep(self, position: int) -> dict:
+        number, *offsets = self.PEP.unpack_from(
+            self._map, self._peps_offset + position * self.PEP.size
+        )
+        blob = self._string_blob_offset
+        title, authors, pep_type, status = (
+            str(self._map[blob + start : blob + end], "utf-8")
+            for start, end in zip(offsets[::2], offsets[1::2])
+        )
+        return {
+            "number": number,
+            "title": title,
+            "authors": authors.split(", ") if authors else [],
+            "type": pep_type,
+            "status": status,
+        }
+
+    @staticmethod
+    def similarity(query: str, word: str) -> float:
+        """How close `word` is to the query word `query`, from 0 to 1."""
+        from difflib import SequenceMatcher
+
+        if word == query:
+            return 1.0
+        if len(query) >= 2 and word.startswith(query):
+            return 0.9  # a word that is still being typed
+        return SequenceMatcher(None, query, word).ratio()
+
+    def search(self, query: str, cutoff: float, limit: int) -> list:
+        """
+        Rank PEPs by how well their title and author words match `query`.
+
+        Every query word is scored against its closest word in each PEP,
+        and a PEP's score is the average over the query words. Returns a
+        list of (score, PEP as a dict) pairs scoring at least `cutoff`,
+        best first.
+        """
+        import heapq
+
+        query_words = self.TOKEN_RE.findall(query.lower())
+        totals = Counter()
+        for query_word in query_words:
+            candidates = Counter()
+            for key in self.trigrams(query_word):
+                position = self._find_trigram(key)
+                if position is not None:
+                    candidates.update(
+                        self._run(
+                            self._postings_offset, self._postings_blob_offset, position
+                        )
+                    )
+            best = {}
+            for word, _ in candidates.most_common(self.MAX_CANDIDATES):
+                score = self.similarity(query_word, self.word(word))
+                for pep in self._run(
+                    self._occurrences_offset, self._occurrences_blob_offset, word
+                ):
+                    if score > best.get(pep, 0.0):
+                        best[pep] = score
+            totals.update(best)
+
+        results = [
+            (score / len(query_words), pep)
+            for pep, score in totals.items()
+            if score / len(query_words) >= cutoff
+        ]
+        return [
+            (score, self.pep(pep))
+            for score, pep in heapq.nlargest(
+                limit, results, key=lambda x: (x[0], -self._number(x[1]))
+            )
+        ]
+
+    def _number(self, position: int) -> int:
+        return struct.unpack_from(
+            "<I", self._map, self._peps_offset + position * self.PEP.size
+        )[0]
+
+    def close(self) -> None:
+        self._map.close()
+
+    @classmethod
+    def build(cls, path: pathlib.Path, peps, full_names: dict) -> None:
+        """
+        Build the index for `peps` (the PEP 0 index). PEP 0 only lists the
+        authors' surnames, so their full names (number -> list of names)
+        are indexed too, when known.
+        """
+        pep_entries = bytearray()
+        string_blob = bytearray()
+        occurrences = {}
+        for position, pep in enumerate(peps):
+            if isinstance(pep, PepRecord):
+                pep = pep.to_dict()
+            offsets = []
+            for text in (
+                pep["title"],
+                ", ".join(pep["authors"]),
+                pep["type"],
+                pep["status"],
+            ):
+                offsets.append(len(string_blob))
+                string_blob += text.encode()
+                offsets.append(len(string_blob))
+            pep_entries += cls.PEP.pack(pep["number"], *offsets)
+
+            text = " ".join(
+                [pep["title"], *pep["authors"], *full_names.get(pep["number"], [])]
+            )
+            for word in set(cls.TOKEN_RE.findall(text.lower())):
+                occurrences.setdefault(word, []).append(position)
+
+        words = sorted(occurrences)
+        postings = {}
+        word_blob = bytearray()
+        word_offsets = [0]
+        occurrences_blob = bytearray()
+        occurrences_offsets = [0]
+        for word_position, word in enumerate(words):
+            word_blob += word.encode()
+            word_offsets.append(len(word_blob))
+            occurrences_blob += struct.pack(
+                f"<{len(occurrences[word])}I", *occurrences[word]
+            )
+            occurrences_offsets.append(len(occurrences_blob))
+            for key in cls.trigrams(word):
+                postings.setdefault(key, []).append(word_position)
+
+        keys = sorted(postings)
+        postings_blob = bytearray()
+        postings_offsets = [0]
+        for key in keys:
+            postings_blob += struct.pack(f"<{len(postings[key])}I", *postings[key])
+            postings_offsets.append(len(postings_blob))
+
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as fp:
+            fp.write(
+                cls.HEADER.pack(
+                    cls.MAGIC, len(pep_entries) // cls.PEP.size, len(words), len(keys)
+                )
+            )
+            fp.write(pep_entries)
+            fp.write(struct.pack(f"<{len(word_offsets)}I", *word_offsets))
+            fp.write(struct.pack(f"<{len(occurrences_offsets)}I", *occurrences_offsets))
+            fp.write(struct.pack(f"<{len(keys)}Q", *keys))
+            fp.write(struct.pack(f"<{len(postings_offsets)}I", *postings_offsets))
+            fp.write(word_blob)
+            fp.write(occurrences_blob)
+            fp.write(postings_blob)
+            fp.write(string_blob)
+        os.replace(tmp_path, path)
+
+
+def _load_fuzzy_index(pepper_dir: pathlib.Path, config: dict) -> TrigramIndex:
+    """
+    Open the trigram index, (re)building it whenever the PEP 0 index or the
+    metadata store it was built from have changed.
+    """
+    index_path = pepper_dir.joinpath("fuzzy-index.bin")
+    cache = PepIndexCache(pepper_dir, config)
+    peps = cache.load()
+    store = MetadataStore(pepper_dir)
+
+    built = index_path.stat().st_mtime if index_path.exists() else None
+    sources = [path for path in (cache.path, store.path) if path.exists()]
+    if built is not None and all(path.stat().st_mtime <= built for path in sources):
+        TRACE.cache("fuzzy-index", "hit")
+        peps.close()
+        return TrigramIndex(index_path)
+
+    TRACE.cache("fuzzy-index", "miss" if built is None else "expired")
+    with TRACE.phase("index", name="fuzzy-index"):
+        TrigramIndex.build(index_path, peps, store.author_names())
+    peps.close()
+    return TrigramIndex(index_path)
+
+
+class RefGraph:
+    """
+    Persistent graph of the references between PEPs.
+
+    Every PEP's `Requires`, `Replaces` and `Superseded-By` headers are
+    edges of that kind, and every other PEP it links to from its text is a
+    `link` edge. Edges are stored both ways, so PEPs can be followed
+    forward (what a PEP refers to) and in reverse (what refers to it).
+
+    Layout (all integers little-endian):
+        header: magic, then counts of nodes and edges
+        nodes:  (number, first forward edge, first reverse edge, title
+                start/end offsets in the title blob) entries, sorted by
+                number, followed by a sentinel entry holding the ends
+        edges:  forward edges, then reverse edges, as (node position,
+                kind) pairs
+        blob:   the titles
+    """
+
+    MAGIC = b"PEPREF01"
+    HEADER = struct.Struct("<8s2I")
+    NODE = struct.Struct("<5I")
+    EDGE = struct.Struct("<2I")
+    KINDS = ("link", "requires", "replaces", "superseded-by")
+    HEADER_KINDS = {"Requires": 1, "Replaces": 2, "Superseded-By": 3}
+    # `:pep:` roles, "PEP 484" (linked by the PEP builds), and links to pages
+    TEXT_LINK_RE = re.compile(r":pep:`(?:[^`<]*<)?(\d+)|\bPEP\s+(\d+)\b|pep-(\d{4})\b")
+    HTML_LINK_RE = re.compile(rb'href="[^"]*pep-(\d{4})[/."#]')
+
+    def __init__(self, path: pathlib.Path) -> None:
+        import mmap
+
+        with open(path, "rb") as fp:
+            self._map = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._node_count, self._edge_count = self.HEADER.unpack_from(
+            self._map, 0
+        )
+        if magic != self.MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a pepper reference graph file")
+        self._edges_offset = self.HEADER.size + (self._node_count + 1) * self.NODE.size
+        self._blob_offset = self._edges_offset + 2 * self._edge_count * self.EDGE.size
+
+    def _node(self, position: int) -> tuple:
+        return self.NODE.unpack_from(
+            self._map, self.HEADER.size + position * self.NODE.size
+        )
+
+    def find(self, number: int):
+        """Return the position of PEP `number`, or None if it isn't in the graph."""
+        low, high = 0, self._node_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._node(middle)[0] < number:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._node_count and self._node(low)[0] == number:
+            return low
+        return None
+
+    def title(self, position: int) -> str:
+        _, _, _, start, end = self._node(position)
+        return str(
+            self._map[self._blob_offset + start : self._blob_offset + end], "utf-8"
+        )
+
+    def number(self, position: int) -> int:
+        return self._node(position)[0]
+
+    def edges(self, position: int, reverse: bool = False) -> list:
+        """Return the (node position, kind) edges leaving (or reaching) a node."""
+        field = 2 if reverse else 1
+        start = self._node(position)[field]
+        end = self._node(position + 1)[field]
+        if reverse:
+            start += self._edge_count
+            end += self._edge_count
+        return list(
+            self.EDGE.iter_unpack(
+                self._map[
+                    self._edges_offset
+                    + start * self.EDGE.size : self._edges_offset
+                    + end * self.EDGE.size
+                ]
+            )
+        )
+
+    def traverse(self, number: int, reverse=False, transitive=False, kinds=None):
+        """
+        Return the PEPs reachable from PEP `number` (or reaching it, when
+        `reverse`), as (depth, number, kind, title, via) tuples in
+        breadth-first order, where `via` is the number of the PEP it was
+        reached from. Only edges of `kinds` (names from `KINDS`) are followed.
+        """
+        start = self.find(number)
+        if start is None:
+            return []
+        kinds = {self.KINDS.index(kind) for kind in kinds or self.KINDS}
+        seen = {start}
+        frontier = [start]
+        results = []
+        depth = 0
+        while frontier and (transitive or depth == 0):
+            depth += 1
+            next_frontier = []
+            for position in frontier:
+                for target, kind in self.edges(position, reverse):
+                    if kind not in kinds or target in seen:
+                        continue
+                    seen.add(target)
+                    next_frontier.append(target)
+                    results.append(
+                        (
+                            depth,
+                            self.number(target),
+                            self.KINDS[kind],
+                            self.title(target),
+                            self.number(position),
+                        )
+                    )
+            frontier = next_frontier
+        return results
+
+    def close(self) -> None:
+        self._map.close()
+
+    @classmethod
+    def references(cls, path: pathlib.Path) -> tuple:
+        """Read the title of a local PEP, and its (number, kind) references."""
+        parsed = _read_local_pep_info(path)
+        number = int(parsed["number"])
+        refs = {}
+        for field, kind in cls.HEADER_KINDS.items():
+            value = parsed["header"].get(field, "")
+            for target in re.findall(
+                r"\d+", " ".join(value) if isinstance(value, list) else value
+            ):
+                refs.setdefault(int(target), kind)
+
+        if path.suffix == ".html":
+            data = path.read_bytes()
+            start, end = data.find(b"<article"), data.rfind(b"</article>")
+            if start != -1 and end != -1:
+                data = data[start:end]
+            links = cls.HTML_LINK_RE.findall(data)
+        else:
+            text = path.read_text(errors="replace")
+            body = text.split("\n\n", 1)[-1]  # everything after the header
+            links = ["".join(groups) for groups in cls.TEXT_LINK_RE.findall(body)]
+        for target in links:
+            refs.setdefault(int(target), 0)
+        refs.pop(number, None)
+        return parsed["title"], sorted(refs.items())
+
+    @classmethod
+    def build(cls, path: pathlib.Path, peps: dict) -> None:
+        """Build the graph from `peps`, a {number: (title, references)} dict."""
+        numbers = sorted(
+            set(peps) | {target for _, refs in peps.values() for target, _ in refs}
+        )
+        positions = {number: position for position, number in enumerate(numbers)}
+        forward = [[] for _ in numbers]
+        reverse = [[] for _ in numbers]
+        for number, (_, refs) in peps.items():
+            for target, kind in refs:
+                forward[positions[number]].append((positions[target], kind))
+                reverse[positions[target]].append((positions[number], kind))
+
+        nodes = bytearray()
+        edges = bytearray()
+        reverse_edges = bytearray()
+        blob = bytearray()
+        forward_count = reverse_count = 0
+        for position, number in enumerate(numbers):
+            title_start = len(blob)
+            blob += peps.get(number, ("", []))[0].encode()
+            nodes += cls.NODE.pack(
+                number, forward_count, reverse_count, title_start, len(blob)
+            )
+            for edge in sorted(forward[position]):
+                edges += cls.EDGE.pack(*edge)
+            for edge in sorted(reverse[position]):
+                reverse_edges += cls.EDGE.pack(*edge)
+            forward_count += len(forward[position])
+            reverse_count += len(reverse[position])
+        nodes += cls.NODE.pack(0, forward_count, reverse_count, len(blob), len(blob))
+
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as fp:
+            fp.write(cls.HEADER.pack(cls.MAGIC, len(numbers), forward_count))
+            fp.write(nodes)
+            fp.write(edges)
+            fp.write(reverse_edges)
+            fp.write(blob)
+        os.replace(tmp_path, path)
+
+
+def _update_ref_graph(pepper_dir: pathlib.Path) -> bool:
+    """
+    Bring the reference graph up to date with the local PEPs.
+
+    The references found in every source are kept (in `refs-graph.json`)
+    along with its size and mtime, so only sources that changed since the
+    last update are read again. Returns whether the graph was rewritten.
+    """
+    import json
+
+    graph_path = pepper_dir.joinpath("refs-graph.bin")
+    meta_path = pepper_dir.joinpath("refs-graph.json")
+    known = {}
+    with suppress(OSError, ValueError):
+        known = json.loads(meta_path.read_text())
+    if not graph_path.exists():
+        known = {}
+
+    peps = {}
+    changed = False
+    for number, path in _local_pep_paths(pepper_dir):
+        stat_result = path.stat()
+        signature = [str(path), stat_result.st_mtime_ns, stat_result.st_size]
+        entry = known.get(str(number))
+        if entry is None or entry["source"] != signature:
+            try:
+                title, refs = RefGraph.references(path)
+            except Exception as exc:
+                # kept (without references), so it isn't read again until it changes
+                sys.stderr.write(
+                    f"pepper: Unable to read PEP {number} ({type(exc).__name__}: {exc})\n"
+                )
+                title, refs = "", []
+            entry = {"source": signature, "title": title, "refs": refs}
+            changed = True
+        peps[str(number)] = entry
+    changed = changed or set(peps) != set(known)
+    if not changed:
+        return False
+
+    RefGraph.build(
+        graph_path,
+        {
+            int(number): (entry["title"], [tuple(ref) for ref in entry["refs"]])
+            for number, entry in peps.items()
+        },
+    )
+    tmp_path = meta_path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(peps))
+    os.replace(tmp_path, meta_path)
+    return True
+
+
+class QuerySyntaxError(ValueError):
+    pass
+
+
+class PepQuery:
+    """
+    A search query over the PEP 0 index, compiled once into matchers.
+
+    Queries are made of `field:value` terms, where `value` may be quoted
+    and may contain `*`/`?` wildcards, i.e.
+
+        status:Final type:S title:"typing*" author:Guido
+
+    Terms are combined with `AND` (also implied by whitespace), `OR` and
+    `NOT` (or a leading `-`), and can be grouped with parentheses. A
+    `field:value` term matches anywhere in the field, while `field=value`
+    requires an exact (case-insensitive) match. `type` and `status` also
+    accept their one letter keys, `number` accepts ranges (`number:400-499`),
+    and a bare value matches either the title or the authors.
+    """
+
+    FIELDS = {
+        "number": "number",
+        "title": "title",
+        "author": "authors",
+        "authors": "authors",
+        "type": "type",
+        "status": "status",
+    }
+    TOKEN_RE = re.compile(
+        r'\s*(?:(?P<paren>[()])|(?P<term>-?(?:(?P<field>[A-Za-z]+)(?P<op>[:=]))?(?:"(?P<quoted>[^"]*)"|(?P<value>[^\s()"]+))))'
+    )
+
+    def __init__(self, query: str) -> None:
+        self.query = query
+        self._tokens = self._tokenize(query)
+        self._position = 0
+        if not self._tokens:
+            raise QuerySyntaxError("Empty query")
+        self.matches = self._parse_or()
+        if self._position != len(self._tokens):
+            raise QuerySyntaxError(f"Unexpected '{self._tokens[self._position][1]}'")
+
+    def __call__(self, pep) -> bool:
+        return self.matches(self.normalize(pep))
+
+    @classmethod
+    def from_term(cls, field: str, op: str, value: str) -> "PepQuery":
+        """Build a query from a single term, without parsing a query string."""
+        query = cls.__new__(cls)
+        query.query = f"{field}{op}{value}"
+        query.matches = cls.compile_term(field, op, value)
+        return query
+
+    @staticmethod
+    def normalize(pep) -> dict:
+        """Decode `pep` once into the lower-cased form the matchers work on."""
+        return {
+            "number": pep["number"],
+            "title": pep["title"].lower(),
+            "authors": [x.lower() for x in pep["authors"]],
+            "type": pep["type"],
+            "status": pep["status"],
+        }
+
+    def __repr__(self) -> str:
+        return f"PepQuery({self.query!r})"
+
+    @classmethod
+    def _tokenize(cls, query: str) -> list:
+        tokens = []
+        position = 0
+        query = query.rstrip()
+        while position < len(query):
+            match = cls.TOKEN_RE.match(query, position)
+            if match is None or match.end() == position:
+                raise QuerySyntaxError(f"Invalid query near '{query[position:]}'")
+            position = match.end()
+            if match.group("paren"):
+                tokens.append(("paren", match.group("paren")))
+            elif match.group("field") is None and match.group("value") in (
+                "AND",
+                "OR",
+                "NOT",
+            ):
+                tokens.append(("keyword", match.group("value")))
+            else:
+                tokens.append(("term", match))
+        return tokens
+
+    def _peek(self):
+        if self._position < len(self._tokens):
+            return self._tokens[self._position]
+        return (None, None)
+
+    def _parse_or(self):
+        matchers = [self._parse_and()]
+        while self._peek() == ("keyword", "OR"):
+            self._position += 1
+            matchers.append(self._parse_and())
+        return matchers[0] if len(matchers) == 1 else self._any(matchers)
+
+    def _parse_and(self):
+        matchers = [self._parse_not()]
+        while self._peek()[0] is not None and self._peek() not in (
+            ("keyword", "OR"),
+            ("paren", ")"),
+        ):
+            if self._peek() == ("keyword", "AND"):
+                self._position += 1
+            matchers.append(self._parse_not())
+        return matchers[0] if len(matchers) == 1 else self._all(matchers)
+
+    def _parse_not(self):
+        if self._peek() == ("keyword", "NOT"):
+            self._position += 1
+            return self._not(self._parse_not())
+        return self._parse_atom()
+
+    def _parse_atom(self):
+        kind, token = self._peek()
+        self._position += 1
+        if kind == "paren" and token == "(":
+            matcher = self._parse_or()
+            if self._peek() != ("paren", ")"):
+                raise QuerySyntaxError("Missing closing parenthesis")
+            self._position += 1
+            return matcher
+        if kind != "term":
+            raise QuerySyntaxError(f"Unexpected '{token or 'end of query'}'")
+
+        value = token.group("quoted")
+        if value is None:
+            value = token.group("value")
+        matcher = self.compile_term(token.group("field"), token.group("op"), value)
+        if token.group("term").startswith("-"):
+            return self._not(matcher)
+        return matcher
+
+    # how matchers are combined; subclasses that compile queries into
+    # something else than functions override these (and `compile_term`)
+
+    @staticmethod
+    def _any(matchers: list):
+        return lambda pep: any(matcher(pep) for matcher in matchers)
+
+    @staticmethod
+    def _all(matchers: list):
+        return lambda pep: all(matcher(pep) for matcher in matchers)
+
+    @staticmethod
+    def _not(matcher):
+        return lambda pep: not matcher(pep)
+
+    @classmethod
+    def compile_term(cls, field, op: str, value: str):
+        """Compile a single `field:value` (or `field=value`) term into a matcher."""
+        if field is not None and field.lower() not in cls.FIELDS:
+            raise QuerySyntaxError(
+                f"Unknown field '{field}'\n"
+                f"Valid fields are: {', '.join(repr(x) for x in cls.FIELDS)}"
+            )
+        key = cls.FIELDS[field.lower()] if field is not None else None
+        value = value.lower()
+
+        if key == "number":
+            low, _, high = value.partition("-")
+            try:
+                low, high = int(low), int(high or low)
+            except ValueError:
+                raise QuerySyntaxError(f"Invalid PEP number '{value}'") from None
+            return lambda pep: low <= pep["number"] <= high
+
+        if op == "=" and key not in ("type", "status"):
+            if key == "authors":
+                return lambda pep: value in pep["authors"]
+            if key == "title":
+                return lambda pep: pep["title"] == value
+            return lambda pep: pep["title"] == value or value in pep["authors"]
+
+        if key in ("type", "status"):
+            # resolve the matching names up front, so matching a PEP is a
+            # single set lookup
+            table = PEP_TYPES if key == "type" else PEP_STATUSES
+            names = {name for name, info in table.items() if info[0].lower() == value}
+            if not names:
+                pattern = cls._glob(value, exact=op == "=")
+                names = {name for name in table if pattern.search(name)}
+                return lambda pep: pep[key] in names or pattern.search(pep[key])
+            return lambda pep: pep[key] in names
+
+        value = value.strip("*")  # matches are substring matches anyway
+        if "*" in value or "?" in value:
+            pattern = cls._glob(value)
+            search = lambda field: pattern.search(field) is not None
+        else:
+            search = lambda field: value in field
+        if key == "title":
+            return lambda pep: search(pep["title"])
+        if key == "authors":
+            return lambda pep: any(search(x) for x in pep["authors"])
+        return lambda pep: search(pep["title"]) or any(
+            search(x) for x in pep["authors"]
+        )
+
+    @staticmethod
+    def _glob(value: str, exact: bool = False):
+        pattern = re.escape(value).replace(r"\*", ".*").replace(r"\?", ".")
+        if exact:
+            pattern = f"^{pattern}$"
+        return re.compile(pattern, re.IGNORECASE)
+
+
+def compile_query(query: str) -> PepQuery:
+    """Compile a query string (see `PepQuery`) into a reusable matcher."""
+    return PepQuery(query)
+
+
+def iter_filter_peps(peps, queries: list):
+    """
+    Match every PEP in `peps` against all `queries` in a single pass.
+
+    `queries` may hold query strings or compiled `PepQuery` objects. Yields
+    a (query position, PEP as a dict) pair for every match, as soon as it is
+    found, so `peps` may be a stream.
+    """
+    matchers = [
+        (query if isinstance(query, PepQuery) else compile_query(query)).matches
+        for query in queries
+    ]
+    for pep in peps:
+        if isinstance(pep, PepRecord):
+            pep = pep.to_dict()
+        normalized = PepQuery.normalize(pep)  # decode each PEP only once
+        for position, matcher in enumerate(matchers):
+            if matcher(normalized):
+                yield position, pep
+
+
+def filter_peps(peps, queries: list) -> list:
+    """
+    Like `iter_filter_peps`, but returns one list of matching PEPs (as
+    dicts) per query, in order.
+    """
+    results = [[] for _ in queries]
+    for position, pep in iter_filter_peps(peps, queries):
+        results[position].append(pep)
+    return results
+
+
+class MetadataQuery(PepQuery):
+    """
+    A query over the metadata store (see `MetadataStore`), compiled into
+    an SQL condition.
+
+    The syntax is the same as `PepQuery`'s, but every header field can be
+    queried (i.e. `discussions-to:discuss.python.org`, or `resolution:*`
+    for every PEP that has one), and `number`, `created` and
+    `python-version` also take range predicates:
+
+        status=Final type:S python-version>=3.10 created>2021
+
+    Dates can be given as `2021`, `2021-06`, `2021-06-30` or `30-Jun-2021`,
+    and stand for the whole period they name, so `created>2021` starts at
+    2022, and `created:2021-06` is all of June 2021. Versions work the same
+    way (`python-version:3` is any 3.x).
+    """
+
+    TOKEN_RE = re.compile(
+        r'\s*(?:(?P<paren>[()])|(?P<term>-?(?:(?P<field>[A-Za-z][A-Za-z-]*)(?P<op>>=|<=|[:=<>]))?(?:"(?P<quoted>[^"]*)"|(?P<value>[^\s()"]+))))'
+    )
+    RANGE_FIELDS = ("number", "created", "python-version")
+
+    @property
+    def where(self) -> str:
+        return self.matches[0]
+
+    @property
+    def params(self) -> list:
+        return self.matches[1]
+
+    @staticmethod
+    def _any(matchers: list):
+        return (
+            "(" + " OR ".join(sql for sql, _ in matchers) + ")",
+            [param for _, params in matchers for param in params],
+        )
+
+    @staticmethod
+    def _all(matchers: list):
+        return (
+            "(" + " AND ".join(sql for sql, _ in matchers) + ")",
+            [param for _, params in matchers for param in params],
+        )
+
+    @staticmethod
+    def _not(matcher):
+        return f"NOT {matcher[0]}", matcher[1]
+
+    @staticmethod
+    def _like(value: str, exact: bool = False) -> str:
+        """Turn a value with `*`/`?` wildcards into a LIKE pattern."""
+        for char in "\\%_":
+            value = value.replace(char, "\\" + char)
+        value = value.replace("*", "%").replace("?", "_")
+        return value if exact else f"%{value.strip('%')}%"
+
+    @staticmethod
+    def _range(column: str, op: str, low, high):
+        """Compare `column` with the half-open range [low, high)."""
+        if op == ">":
+            return f"{column} >= ?", [high]
+        if op == ">=":
+            return f"{column} >= ?", [low]
+        if op == "<":
+            return f"{column} < ?", [low]
+        if op == "<=":
+            return f"{column} < ?", [high]
+        return f"({column} >= ? AND {column} < ?)", [low, high]
+
+    @classmethod
+    def compile_term(cls, field, op: str, value: str):
+        field = field.lower() if field is not None else None
+        if op in ("<", "<=", ">", ">=") and field not in cls.RANGE_FIELDS:
+            raise QuerySyntaxError(
+                f"'{op}' can't be used with '{field}'\n"
+                f"Range predicates work on: {', '.join(cls.RANGE_FIELDS)}"
+            )
+        exact = op == "="
+
+        if field == "number":
+            low, _, high = value.partition("-")
+            try:
+                low, high = int(low), int(high or low)
+            except ValueError:
+                raise QuerySyntaxError(f"Invalid PEP number '{value}'") from None
+            return cls._range("number", op, low, high + 1)
+        if field == "created":
+            return cls._range("created", op, *_date_range(value))
+        if field == "python-version":
+            low, high = _version_range(value)
+            sql, params = cls._range("version", op, low, high)
+            return (
+                f"number IN (SELECT number FROM python_versions WHERE {sql})",
+                params,
+            )
+
+        if field in ("type", "status"):
+            table = PEP_TYPES if field == "type" else PEP_STATUSES
+            names = [x for x, info in table.items() if info[0].lower() == value.lower()]
+            if not names:
+                pattern = cls._glob(value, exact=exact)
+                names = [x for x in table if pattern.search(x)]
+            if not names:
+                raise QuerySyntaxError(f"No PEP {field} matches '{value}'")
+            return f"{field} IN ({', '.join('?' * len(names))})", names
+
+        if field in ("author", "authors"):
+            if exact and "*" not in value and "?" not in value:
+                condition, params = "name = ? COLLATE NOCASE", [value]
+            else:
+                condition, params = "name LIKE ? ESCAPE '\\'", [cls._like(value, exact)]
+            return f"number IN (SELECT number FROM authors WHERE {condition})", params
+
+        if field == "title":
+            return "title LIKE ? ESCAPE '\\'", [cls._like(value, exact)]
+
+        if field is None:
+            pattern = cls._like(value, exact)
+            return (
+                "(title LIKE ? ESCAPE '\\' OR number IN "
+                "(SELECT number FROM authors WHERE name LIKE ? ESCAPE '\\'))",
+                [pattern, pattern],
+            )
+
+        # any other header field, i.e. Discussions-To, Resolution, Requires
+        if exact and "*" not in value and "?" not in value:
+            condition, params = "value = ? COLLATE NOCASE", [value]
+        else:
+            condition, params = "value LIKE ? ESCAPE '\\'", [cls._like(value, exact)]
+        return (
+            f"number IN (SELECT number FROM fields WHERE key = ? AND {condition})",
+            [field, *params],
+        )
+
+
+def _date_range(value: str) -> tuple:
+    """Turn a (partial) date into the half-open range of ISO dates it covers."""
+    import datetime
+
+    parts = value.split("-")
+    with suppress(ValueError):
+        if len(parts) == 3 and not parts[1].isdigit():
+            day = datetime.datetime.strptime(value, "%d-%b-%Y").date()
+            return day.isoformat(), (day + datetime.timedelta(days=1)).isoformat()
+        numbers = [int(x) for x in parts]
+        if len(numbers) == 1:
+            return f"{numbers[0]:04}-01-01", f"{numbers[0] + 1:04}-01-01"
+        if len(numbers) == 2:
+            year, month = numbers
+            datetime.date(year, month, 1)  # validate
+            end = (year + 1, 1) if month == 12 else (year, month + 1)
+            return f"{year:04}-{month:02}-01", f"{end[0]:04}-{end[1]:02}-01"
+        if len(numbers) == 3:
+            day = datetime.date(*numbers)
+            return day.isoformat(), (day + datetime.timedelta(days=1)).isoformat()
+    raise QuerySyntaxError(
+        f"Invalid date '{value}' (expected i.e. 2021, 2021-06, 2021-06-30 or 30-Jun-2021)"
+    )
+
+
+def _version_key(major: int, minor: int) -> int:
+    return major * 1000 + minor
+
+
+def _version_range(value: str) -> tuple:
+    """Turn a (partial) Python version into the half-open range of keys it covers."""
+    match = re.fullmatch(r"(\d+)(?:\.(\d+))?", value)
+    if match is None:
+        raise QuerySyntaxError(f"Invalid Python version '{value}' (expected i.e. 3.10)")
+    major = int(match.group(1))
+    if match.group(2) is None:
+        return _version_key(major, 0), _version_key(major + 1, 0)
+    minor = int(match.group(2))
+    return _version_key(major, minor), _version_key(major, minor + 1)
+
+
+class MetadataStore:
+    """
+    SQLite store of every PEP's full header, for `pepper query`.
+
+    Besides the header itself, the fields that are queried the most get
+    indexes: status, type and Created (as an ISO date) are columns of
+    `peps`, authors and Python versions (a PEP can list several) have
+    tables of their own, and every other field value is in `fields`.
+    """
+
+    SCHEMA = """
+        CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE peps (
+            number INTEGER PRIMARY KEY,
+            title TEXT NOT NULL,
+            status TEXT,
+            type TEXT,
+            created TEXT,
+            header TEXT NOT NULL
+        );
+        CREATE TABLE authors (
+            number INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            name TEXT NOT NULL
+        );
+        CREATE TABLE python_versions (
+            number INTEGER NOT NULL,
+            version INTEGER NOT NULL
+        );
+        CREATE TABLE fields (
+            number INTEGER NOT NULL,
+            key TEXT NOT NULL,
+            value TEXT NOT NULL
+        );
+    """
+    # created once the data is in, which is quicker than keeping them
+    # up to date row by row
+    INDEXES = """
+        CREATE INDEX peps_status ON peps (status);
+        CREATE INDEX peps_type ON peps (type);
+        CREATE INDEX peps_created ON peps (created);
+        CREATE INDEX authors_name ON authors (name COLLATE NOCASE);
+        CREATE INDEX python_versions_version ON python_versions (version, number);
+        CREATE INDEX fields_key_value ON fields (key, value COLLATE NOCASE);
+        ANALYZE;
+    """
+    BATCH_SIZE = 100
+
+    def __init__(self, pepper_dir: pathlib.Path) -> None:
+        self.path = pepper_dir.joinpath("metadata.db")
+
+    def _connect(self, readonly: bool = True):
+        import sqlite3
+
+        if readonly:
+            return sqlite3.connect(f"{self.path.as_uri()}?mode=ro", uri=True)
+        return sqlite3.connect(self.path.with_suffix(".tmp"))
+
+    def info(self):
+        """Return the store's metadata (when and from what it was built)."""
+        import sqlite3
+
+        if not self.path.exists():
+            return None
+        with suppress(sqlite3.Error):
+            db = self._connect()
+            try:
+                return dict(db.execute("SELECT key, value FROM meta"))
+            finally:
+                db.close()
+        return None
+
+    @staticmethod
+    def _rows(record: dict) -> tuple:
+        import datetime
+        import json
+
+        number = record["number"]
+        header = {k: v for k, v in record.items() if k not in ("number", "title")}
+        created = None
+        with suppress(ValueError, TypeError):
+            created = (
+                datetime.datetime.strptime(header.get("Created"), "%d-%b-%Y")
+                .date()
+                .isoformat()
+            )
+        pep = (
+            number,
+            record["title"],
+            header.get("Status"),
+            header.get("Type"),
+            created,
+            json.dumps(header, ensure_ascii=False),
+        )
+        authors = [
+            (number, position, _author_name(author))
+            for position, author in enumerate(header.get("Author", []))
+        ]
+        versions = {
+            (number, _version_key(int(major), int(minor or 0)))
+            for major, minor in re.findall(
+                r"(\d+)(?:\.(\d+))?", header.get("Python-Version", "")
+            )
+        }
+        fields = []
+        for name, value in header.items():
+            for entry in value if isinstance(value, list) else [value]:
+                fields.append((number, name.lower(), entry))
+        return pep, authors, versions, fields
+
+    def build(self, records, source: str) -> int:
+        """
+        Build a new store from an iterable of exported records (see
+        `_export_record`), replacing the current one once it is complete.
+        """
+        tmp_path = self.path.with_suffix(".tmp")
+        with suppress(FileNotFoundError):
+            tmp_path.unlink()
+        db = self._connect(readonly=False)
+        try:
+            db.executescript(self.SCHEMA)
+            count = 0
+            batch = ([], [], [], [])
+            for record in records:
+                for rows, new_rows in zip(batch, self._rows(record)):
+                    if isinstance(new_rows, tuple):
+                        rows.append(new_rows)
+                    else:
+                        rows.extend(new_rows)
+                count += 1
+                if count % self.BATCH_SIZE == 0:
+                    self._insert(db, batch)
+            self._insert(db, batch)
+            db.executescript(self.INDEXES)
+            db.executemany(
+                "INSERT INTO meta VALUES (?, ?)",
+                [("built", str(time.time())), ("source", source)],
+            )
+            db.commit()
+        except BaseException:
+            db.close()
+            tmp_path.unlink()
+            raise
+        db.close()
+        os.replace(tmp_path, self.path)
+        return count
+
+    @staticmethod
+    def _insert(db, batch: tuple) -> None:
+        peps, authors, versions, fields = batch
+        db.executemany("INSERT OR REPLACE INTO peps VALUES (?, ?, ?, ?, ?, ?)", peps)
+        db.executemany("INSERT INTO authors VALUES (?, ?, ?)", authors)
+        db.executemany("INSERT INTO python_versions VALUES (?, ?)", versions)
+        db.executemany("INSERT INTO fields VALUES (?, ?, ?)", fields)
+        for rows in batch:
+            rows.clear()
+
+    def author_names(self) -> dict:
+        """Return the full names of every PEP's authors, by PEP number."""
+        import sqlite3
+
+        names = {}
+        if not self.path.exists():
+            return names
+        with suppress(sqlite3.Error):
+            db = self._connect()
+            try:
+                for number, name in db.execute(
+                    "SELECT number, name FROM authors ORDER BY number, position"
+                ):
+                    names.setdefault(number, []).append(name)
+            finally:
+                db.close()
+        return names
+
+    def query(self, query: MetadataQuery) -> list:
+        """Return every PEP matching `query`, as dicts, in numerical order."""
+        import json
+
+        db = self._connect()
+        try:
+            rows = db.execute(
+                "SELECT number, title, status, type, header FROM peps "
+                f"WHERE {query.where} ORDER BY number",
+                query.params,
+            ).fetchall()
+        finally:
+            db.close()
+        return [
+            {
+                "number": number,
+                "title": title,
+                "status": status or "",
+                "type": pep_type or "",
+                "header": json.loads(header),
+            }
+            for number, title, status, pep_type, header in rows
+        ]
+
+
+def _author_name(author: str) -> str:
+    """Strip the (obfuscated) e-mail address from an Author entry."""
+    return author.partition(" <")[0].partition(" (")[0].strip()
+
+
+def _run_or_exit(args: list, name: str) -> bytes:
+    """Run a build step, exiting with its output if it fails."""
+    import subprocess
+
+    proc = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    if proc.returncode != 0:
+        sys.stderr.write(f"**ERROR** {name} failed with the following output:\n\n")
+        sys.stderr.write(proc.stdout.decode())
+        raise SystemExit(1)
+    return proc.stdout
+
+
+class BuildManifest:
+    """
+    Hashes of the PEP sources as of the last successful build.
+
+    Sources queued for a rebuild are recorded as pending before the build
+    starts, so an interrupted build is resumed (rather than restarted, or
+    forgotten) on the next run.
+    """
+
+    SOURCE_PATTERNS = ("pep-*.rst", "pep-*.txt")
+    # pages listing every PEP, which change along with any of them; their
+    # sources are generated while the build reads the PEPs, so they are
+    # found by the pages the last build wrote
+    INDEX_PAGES = ("pep-0000.html", "numerical.html", "topic/*.html")
+
+    def __init__(self, storage_dir: pathlib.Path) -> None:
+        import json
+
+        self.path = storage_dir.joinpath("build-manifest.json")
+        self.repo_dir = storage_dir.joinpath("git-ds")
+        self.build_dir = self.repo_dir.joinpath("build")
+        self.source_dir = self.repo_dir.joinpath("peps")
+        if not self.source_dir.joinpath("conf.py").exists():
+            self.source_dir = self.repo_dir  # pre-2023 repository layout
+        self.sources = {}
+        self.pending = []
+        with suppress(OSError, ValueError):
+            data = json.loads(self.path.read_text())
+            self.sources = data["sources"]
+            self.pending = data["pending"]
+
+    def save(self) -> None:
+        import json
+
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(
+            json.dumps({"sources": self.sources, "pending": self.pending})
+        )
+        os.replace(tmp_path, self.path)
+
+    def is_source(self, name: str) -> bool:
+        path = self.repo_dir.joinpath(name)
+        return path.parent == self.source_dir and any(
+            path.match(pattern) for pattern in self.SOURCE_PATTERNS
+        )
+
+    def source_name(self, path: pathlib.Path) -> str:
+        return path.relative_to(self.repo_dir).as_posix()
+
+    def all_sources(self) -> list:
+        return sorted(
+            self.source_name(path)
+            for pattern in self.SOURCE_PATTERNS
+            for path in self.source_dir.glob(pattern)
+        )
+
+    def file_hash(self, name: str):
+        import hashlib
+
+        with suppress(FileNotFoundError):
+            return hashlib.sha256(self.repo_dir.joinpath(name).read_bytes()).hexdigest()
+        return None
+
+    def outdated(self, names) -> list:
+        """Filter `names` down to sources that differ from the last build."""
+        return sorted(
+            name
+            for name in set(names)
+            if self.file_hash(name) != self.sources.get(name)
+        )
+
+    def index_pages(self) -> list:
+        """The generated sources of the index pages, as left by the last build."""
+        pages = (
+            self.source_dir.joinpath(
+                path.relative_to(self.build_dir).with_suffix(".rst")
+            )
+            for pattern in self.INDEX_PAGES
+            for path in self.build_dir.glob(pattern)
+        )
+        return sorted(self.source_name(path) for path in pages if path.exists())
+
+    def remove_outputs(self, names) -> None:
+        """Delete the pages (and their doctrees) built from removed sources."""
+        for name in names:
+            stem = pathlib.PurePosixPath(name).stem
+            for path in (
+                self.build_dir.joinpath(stem + ".html"),
+                self.build_dir.joinpath(stem + ".html.gz"),
+                self.build_dir.joinpath(".doctrees", stem + ".doctree"),
+                self.build_dir.joinpath("doctrees", stem + ".doctree"),
+            ):
+                with suppress(FileNotFoundError):
+                    path.unlink()
+
+    def mark_built(self, names) -> None:
+        for name in names:
+            file_hash = self.file_hash(name)
+            if file_hash is None:
+                self.sources.pop(name, None)
+            else:
+                self.sources[name] = file_hash
+        self.pending = []
+        self.save()
+
+
+def _build_env_fingerprint() -> str:
+    """Identify the build environment by its requirements and interpreter."""
+    import hashlib
+    import json
+
+    return hashlib.sha256(
+        json.dumps(
+            {
+                "requirements": BUILD_REQUIREMENTS,
+                "python": sys.version,
+                "executable": sys.executable,
+            }
+        ).encode()
+    ).hexdigest()
+
+
+def _build_env_is_current(env_dir: pathlib.Path) -> bool:
+    """Check that an existing build environment matches, and still works."""
+    import subprocess
+
+    fingerprint_file = env_dir.joinpath("pepper-fingerprint")
+    with suppress(OSError):
+        if fingerprint_file.read_text() != _build_env_fingerprint():
+            return False
+        health_proc = subprocess.run(
+            [
+                env_dir.joinpath("bin", "python3"),
+                "-c",
+                "import sphinx, pygments, docutils",
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        return health_proc.returncode == 0
+    return False
+
+
+def _create_build_env(env_dir: pathlib.Path, config: dict) -> None:
+    """
+    Create the build environment, unless an identical one already exists.
+
+    With `WHEEL_CACHE` set, the requirements are installed from wheels kept
+    in that directory, which is filled first (unless `USE_OFFLINE` is set,
+    in which case the network is never used).
+    """
+    import venv
+
+    if _build_env_is_current(env_dir):
+        sys.stdout.write("Reusing existing build environment...\n")
+        return
+
+    sys.stdout.write("Generating build environment...\n")
+    builder = venv.EnvBuilder(clear=True, with_pip=True, symlinks=False)
+    builder.ensure_directories(env_dir)
+    builder.create(env_dir)
+
+    pip = env_dir.joinpath("bin", "pip")
+    wheel_cache = config.get("WHEEL_CACHE")
+    if wheel_cache:
+        if config.get("USE_OFFLINE") != "true":
+            _run_or_exit(
+                [pip, "wheel", "--wheel-dir", wheel_cache, "--find-links", wheel_cache]
+                + list(BUILD_REQUIREMENTS),
+                "pip",
+            )
+        _run_or_exit(
+            [pip, "install", "--no-index", "--find-links", wheel_cache]
+            + list(BUILD_REQUIREMENTS),
+            "pip",
+        )
+    else:
+        _run_or_exit([pip, "install", "-U"] + list(BUILD_REQUIREMENTS), "pip")
+    env_dir.joinpath("pepper-fingerprint").write_text(_build_env_fingerprint())
+
+
+def _build_peps(storage_dir: pathlib.Path, manifest: BuildManifest, names=None):
+    """
+    Build the PEPs with Sphinx, using every available core.
+
+    With `names`, only those sources (and the index pages listing them) are
+    rewritten, reusing the doctrees kept from the previous build; otherwise
+    everything is rebuilt with the repository's own `build.py`.
+    """
+    python = storage_dir.joinpath(".venv", "bin", "python3")
+    jobs = str(os.cpu_count() or 1)
+    build_dir = manifest.build_dir
+    doctree_dirs = [
+        path
+        for path in (build_dir.joinpath(".doctrees"), build_dir.joinpath("doctrees"))
+        if path.exists()
+    ]
+
+    os.chdir(manifest.repo_dir)
+    if names is None or not doctree_dirs:
+        manifest.pending = manifest.all_sources()
+        manifest.save()
+        _run_or_exit([python, "build.py", "-j", jobs], "python")
+        manifest.mark_built(manifest.pending)
+        return
+
+    manifest.pending = sorted(set(manifest.pending) | set(names))
+    manifest.save()
+    existing = [
+        name for name in manifest.pending if manifest.repo_dir.joinpath(name).exists()
+    ]
+    manifest.remove_outputs(sorted(set(manifest.pending) - set(existing)))
+    # even with only removals, the index pages still list the removed PEPs
+    if manifest.pending:
+        _run_or_exit(
+            [
+                python,
+                "-m",
+                "sphinx",
+                "-b",
+                "html",
+                "-j",
+                jobs,
+                "-d",
+                doctree_dirs[0],
+                manifest.source_dir,
+                build_dir,
+                *existing,
+                *manifest.index_pages(),
+            ],
+            "sphinx",
+        )
+    manifest.mark_built(manifest.pending)
+
+
+class MirrorManifest:
+    """
+    Validators and hashes of every file mirrored from peps.python.org.
+
+    Saved as files are downloaded, so an interrupted mirror is resumed on
+    the next run: files that are already there (and still match their
+    recorded hash) are only revalidated with a conditional request.
+    """
+
+    def __init__(self, storage_dir: pathlib.Path) -> None:
+        import json
+
+        self.path = storage_dir.joinpath("mirror-manifest.json")
+        self.files = {}
+        with suppress(OSError, ValueError):
+            self.files = json.loads(self.path.read_text())["files"]
+
+    def save(self) -> None:
+        import json
+
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({"files": self.files}))
+        os.replace(tmp_path, self.path)
+
+
+# relative links to the site's theme assets, i.e. `href="../_static/style.css"`
+MIRROR_ASSET_RE = re.compile(rb'="((?:\.\./)*_(?:static|images)/[^"#?]+)"')
+# relative links between pages, i.e. `href="../pep-0008/#introduction"`, which
+# upstream serves as directories, but the mirror saves as `pep-0008.html`
+MIRROR_PAGE_LINK_RE = re.compile(rb'="(?:\.\./)?(pep-\d{4})/')
+
+
+def _mirror_assets(url: str, data: bytes) -> dict:
+    """Find the theme assets a mirrored page links to, as {name: url}."""
+    from urllib.parse import urljoin, urlsplit
+
+    assets = {}
+    for link in set(MIRROR_ASSET_RE.findall(data)):
+        asset_url = urljoin(url, link.decode("ascii", "replace"))
+        assets[urlsplit(asset_url).path.lstrip("/")] = asset_url
+    return assets
+
+
+def _mirror_file(pool: ConnectionPool, site_dir: pathlib.Path, name, url, known):
+    """
+    Download `url` to `name` in `site_dir`, unless the copy there is current.
+
+    Returns (name, record, changed, error), where `record` is the manifest
+    entry for the file. A file is only replaced once all of it has been
+    received and checked, so an interrupted download never leaves a
+    truncated file behind. Links between pages are rewritten to the names
+    the pages are saved under.
+    """
+    import hashlib
+    from urllib.error import HTTPError, URLError
+
+    path = site_dir.joinpath(name)
+    headers = {}
+    if known is not None:
+        with suppress(OSError):
+            data = path.read_bytes()
+            current = hashlib.sha256(data).hexdigest() == known["sha256"]
+            # pages saved before their links were rewritten are fetched again
+            if current and not MIRROR_PAGE_LINK_RE.search(data):
+                if known.get("etag"):
+                    headers["If-None-Match"] = known["etag"]
+                if known.get("last_modified"):
+                    headers["If-Modified-Since"] = known["last_modified"]
+
+    try:
+        res = pool.request(url, headers=headers)
+        data = res.read()
+    except HTTPError as exc:
+        return name, known, False, f"HTTP error {exc.code}"
+    except URLError:
+        raise
+    except Exception as exc:
+        return name, known, False, f"{type(exc).__name__}: {exc}"
+    if res.status == 304:
+        return name, known, False, None
+
+    if name.endswith(".html"):
+        if b"</html>" not in data[-1024:].lower():
+            return name, known, False, "incomplete page"
+        data = MIRROR_PAGE_LINK_RE.sub(rb'="\1.html', data)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".part")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+    record = {
+        "url": url,
+        "sha256": hashlib.sha256(data).hexdigest(),
+        "size": len(data),
+        "etag": res.getheader("ETag"),
+        "last_modified": res.getheader("Last-Modified"),
+    }
+    return name, record, True, None
+
+
+def _local_pep_paths(pepper_dir: pathlib.Path, prefer: str = "source") -> list:
+    """
+    Find the local copy of every PEP, as a sorted list of (number, path).
+
+    When a PEP has both, `prefer` picks its source in the `peps/git-ds`
+    checkout ("source", of which only the header block has to be read, like
+    `_local_pep_path` does) or its built HTML ("html"). PEP 0 is left out, as
+    it is the generated index of all the others.
+    """
+    storage_dir = pepper_dir.joinpath("peps")
+    sources = [
+        (storage_dir.joinpath("git-ds", "peps"), ("*.rst", "*.txt")),
+        (storage_dir.joinpath("git-ds"), ("*.rst", "*.txt")),
+    ]
+    html = [(storage_dir.joinpath("peps-html"), ("*.html",))]
+    paths = {}
+    for directory, patterns in sources + html if prefer == "source" else html + sources:
+        for pattern in patterns:
+            for path in directory.glob("pep-" + pattern):
+                with suppress(ValueError):
+                    number = int(path.stem[4:])
+                    if number:
+                        paths.setdefault(number, path)
+    return sorted(paths.items())
+
+
+def _export_record(parsed_pep: dict) -> dict:
+    """Flatten a parsed PEP header into a single exported record."""
+    return {
+        "number": int(parsed_pep["number"]),
+        "title": parsed_pep["title"],
+        **parsed_pep["header"],
+    }
+
+
+def _export_local_peps(paths: list) -> list:
+    """
+    Read the header of every PEP in `paths`, in a worker process.
+
+    Returns a list of (number, record, error) tuples, where exactly one of
+    `record` and `error` is None.
+    """
+    results = []
+    for number, path in paths:
+        try:
+            results.append((number, _export_record(_read_local_pep_info(path)), None))
+        except Exception as exc:  # a malformed PEP shouldn't stop the export
+            results.append((number, None, f"{type(exc).__name__}: {exc}"))
+    return results
+
+
+def _bounded_map(executor, func, items, window: int):
+    """
+    Like `executor.map`, but with no more than `window` items submitted at
+    once, so results are produced (in order) without queueing up all of
+    `items` in memory first.
+    """
+    from collections import deque
+
+    pending = deque()
+    for item in items:
+        if len(pending) >= window:
+            yield pending.popleft().result()
+        pending.append(executor.submit(func, item))
+    while pending:
+        yield pending.popleft().result()
+
+
+class JsonLinesExporter:
+    """Write exported records as JSON Lines, to a file or stdout (`-`)."""
+
+    def __init__(self, output: str) -> None:
+        self.output = output
+        if output == "-":
+            self._fp = sys.stdout
+        else:
+            self._fp = open(output + ".tmp", "w", encoding="utf-8")
+
+    def write(self, record: dict) -> None:
+        import json
+
+        self._fp.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def close(self) -> None:
+        self._fp.flush()
+        if self.output != "-":
+            self._fp.close()
+            os.replace(self.output + ".tmp", self.output)
+
+    def abort(self) -> None:
+        if self.output != "-":
+            self._fp.close()
+            os.remove(self.output + ".tmp")
+
+
+class SqliteExporter:
+    """
+    Write exported records to a new SQLite database.
+
+    `peps` holds one row per PEP, with the most used fields as columns and
+    the full header as a JSON object. `fields` holds one row per value of
+    every header field (list fields, like Author, have a row per entry).
+    """
+
+    SCHEMA = """
+        CREATE TABLE peps (
+            number INTEGER PRIMARY KEY,
+            title TEXT NOT NULL,
+            status TEXT,
+            type TEXT,
+            created TEXT,
+            python_version TEXT,
+            header TEXT NOT NULL
+        );
+        CREATE TABLE fields (
+            number INTEGER NOT NULL REFERENCES peps (number),
+            name TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            value TEXT NOT NULL
+        );
+    """
+    BATCH_SIZE = 100
+
+    def __init__(self, output: str) -> None:
+        import sqlite3
+
+        if output == "-":
+            fatal_error("An output file is needed for SQLite exports...")
+        self.output = output
+        with suppress(FileNotFoundError):
+            os.remove(output + ".tmp")
+        self._db = sqlite3.connect(output + ".tmp")
+        self._db.executescript(self.SCHEMA)
+        self._peps = []
+        self._fields = []
+
+    def write(self, record: dict) -> None:
+        import json
+
+        header = {k: v for k, v in record.items() if k not in ("number", "title")}
+        self._peps.append(
+            (
+                record["number"],
+                record["title"],
+                header.get("Status"),
+                header.get("Type"),
+                header.get("Created"),
+                header.get("Python-Version"),
+                json.dumps(header, ensure_ascii=False),
+            )
+        )
+        for name, value in header.items():
+            values = value if isinstance(value, list) else [value]
+            self._fields.extend(
+                (record["number"], name, position, entry)
+                for position, entry in enumerate(values)
+            )
+        if len(self._peps) >= self.BATCH_SIZE:
+            self._flush()
+
+    def _flush(self) -> None:
+        self._db.executemany(
+            "INSERT OR REPLACE INTO peps VALUES (?, ?, ?, ?, ?, ?, ?)", self._peps
+        )
+        self._db.executemany("INSERT INTO fields VALUES (?, ?, ?, ?)", self._fields)
+        self._peps.clear()
+        self._fields.clear()
+
+    def close(self) -> None:
+        self._flush()
+        self._db.commit()
+        self._db.close()
+        os.replace(self.output + ".tmp", self.output)
+
+    def abort(self) -> None:
+        self._db.close()
+        os.remove(self.output + ".tmp")
+
+
+EXPORTERS = {"jsonl": JsonLinesExporter, "sqlite": SqliteExporter}
+
+
+class RecordWriter:
+    """
+    Stream records to stdout as JSON Lines, CSV or TSV (for `--format`).
+
+    JSON Lines records are written whole; CSV and TSV start with a header of
+    `columns`, have one row per record (with list values joined by ", "),
+    and TSV fields have any tabs or newlines replaced by spaces. Nothing is
+    flushed per record, so when stdout is a pipe, large result sets go out
+    in a few big writes.
+    """
+
+    FORMATS = ("jsonl", "csv", "tsv")
+    # columns of the CSV/TSV output of `search` and `info`
+    SEARCH_COLUMNS = ("number", "type", "status", "title", "authors")
+    INFO_COLUMNS = (
+        "number",
+        "title",
+        "Author",
+        "Status",
+        "Type",
+        "Created",
+        "Python-Version",
+        "Requires",
+        "Replaces",
+        "Superseded-By",
+        "Resolution",
+        "url",
+    )
+    TSV_ESCAPES = str.maketrans("\t\r\n", "   ")
+
+    def __init__(self, fmt: str, columns: tuple) -> None:
+        self.columns = columns
+        self._fp = sys.stdout
+        if fmt == "jsonl":
+            import json
+
+            self._encode = json.JSONEncoder(ensure_ascii=False).encode
+            self.write = self._write_json
+        elif fmt == "csv":
+            import csv
+
+            self._writer = csv.writer(self._fp, lineterminator="\n")
+            self._writer.writerow(columns)
+            self.write = self._write_csv
+        else:
+            self._fp.write("\t".join(columns) + "\n")
+            self.write = self._write_tsv
+
+    def _row(self, record: dict) -> list:
+        row = []
+        for column in self.columns:
+            value = record.get(column)
+            if value is None:
+                value = ""
+            elif isinstance(value, list):
+                value = ", ".join(value)
+            elif not isinstance(value, str):
+                value = str(value)
+            row.append(value)
+        return row
+
+    def _write_json(self, record: dict) -> None:
+        self._fp.write(self._encode(record) + "\n")
+
+    def _write_csv(self, record: dict) -> None:
+        self._writer.writerow(self._row(record))
+
+    def _write_tsv(self, record: dict) -> None:
+        row = self._row(record)
+        line = "\t".join(row)
+        # values hardly ever hold tabs or newlines, so only escape them then
+        if line.count("\t") >= len(row) or "\n" in line or "\r" in line:
+            line = "\t".join(value.translate(self.TSV_ESCAPES) for value in row)
+        self._fp.write(line + "\n")
+
+
+def fatal_error(message: str) -> None:
+    sys.stderr.write("pepper: " + message + "\n")
+    raise SystemExit(1)
+
+
+def format_searched_pep(pep_obj: dict) -> str:
+    _string = ""
+
+    _string += pep_obj["type"][0]
+    _string += pep_obj["status"][0]
+    _string += " | "
+    _string += str(pep_obj["number"])
+    _string += " | "
+    _string += pep_obj["title"]
+    _string += " | "
+    _string += ", ".join(pep_obj["authors"])
+
+    return _string
+
+
+def _view_helper(pep_id, url):
+    import webview
+
+    webview.create_window(f"PEP {pep_id}", url, height=800, frameless=True)
+    webview.start()
+
+
+class Commands:
+    # command name -> number of required arguments. kept by hand so that
+    # dispatching a command doesn't need to import `inspect`
+    COMMANDS = {
+        "help": 0,
+        "info": 1,
+        "search": 1,
+        "fulltext": 1,
+        "fuzzy": 1,
+        "refs": 1,
+        "changes": 0,
+        "export": 1,
+        "query": 1,
+        "read": 1,
+        "view": 1,
+        "open": 1,
+        "kill_server": 0,
+        "daemon": 1,
+        "keys": 0,
+        "generate_offline_docs": 0,
+        "update_offline_docs": 0,
+        "mirror": 0,
+        "pack": 0,
+    }
+
+    # parsed headers of local PEPs, by (path, mtime), and the open PEP 0
+    # index (see PepIndexCache). only the daemon keeps them, as it answers
+    # many requests from the same process
+    local_headers = None
+    pep_indexes = None
+
+    # neither of these are touched by `help` or `keys`, so those commands
+    # never have to stat/read anything in the pepper directory
+    @cached_property
+    def pepper_dir(self) -> pathlib.Path:
+        pepper_dir = pathlib.Path.home().joinpath(".pepper")
+        if not pepper_dir.exists():
+            pepper_dir.mkdir()
+        return pepper_dir
+
+    @cached_property
+    def config(self) -> dict:
+        config_file = self.pepper_dir.joinpath("pepper.conf")
+        if not config_file.exists():
+            return {}
+        return dict(
+            [tuple(line.split("=")) for line in config_file.read_text().split("\n")][
+                :-1
+            ]
+        )
+
+    def help(_):
+        sys.stderr.write(
+            f"pepper, version {__version__}\n"
+            "Get information about any PEP (Python Enhancement Proposal)\n"
+            "\n"
+            "usage: pepper [--trace[=json]] [COMMAND] [ARGS]\n"
+            "\n"
+            "[ PEP commands ]\n"
+            "    info [PEP_NUMBER...]: get basic info about the specified PEPs (i.e. 484 600-620)\n"
+            "    search [ATTR] [QUERY]: search for a PEP (searches for QUERY in ATTR)\n"
+            "    search [QUERY]: search for a PEP with a query (i.e. status:Final type:S)\n"
+            "        (info and search also take --format=jsonl|csv|tsv, for output other programs can read)\n"
+            "    fulltext [QUERY]: search the full text of the local PEPs\n"
+            "    fuzzy [QUERY]: typo-tolerant search of PEP titles and authors\n"
+            "    refs [PEP_NUMBER] [-r] [-t] [--kind=KIND,...]: PEPs referred to by (-r: referring to) a PEP, -t transitively\n"
+            "    changes [DATE|SNAPSHOT]: new PEPs, and status/type/title changes, since then (no argument: list snapshots)\n"
+            "    query [QUERY]: query any PEP header field (i.e. status=Final python-version>=3.10 created>2021)\n"
+            "    export [jsonl|sqlite] [FILE]: export the header of every PEP (jsonl to stdout by default)\n"
+            "    read [PEP_NUMBER] [SECTION] [--toc]: read PEP as text in your terminal, from SECTION if given\n"
+            "    view [PEP_NUMBER]: view PEP in webview window (requires webview extra)\n"
+            "    open [PEP_NUMBER]: open PEP in your default web browser\n"
+            "\n"
+            "[ pepper meta commands ]\n"
+            "    keys: print the PEP Types and PEP Status keys, taken from PEP 0\n"
+            "    generate_offline_docs: download and build an offline copy of all PEPs\n"
+            "    update_offline_docs: search for, and build, any new PEPs not saved\n"
+            "    mirror: download (or update) an offline copy of the rendered PEPs, no build needed\n"
+            "    daemon [start|stop|status|run]: manage a background process that answers search/info faster\n"
+            "    pack: copy the offline docs into a single file, kept alongside (not instead of) them\n"
+            "    help: print this help message\n"
+        )
+        return 0
+
+    @cached_property
+    def http(self) -> HttpCache:
+        return HttpCache(self.pepper_dir, self.config)
+
+    def close(self) -> None:
+        if "http" in self.__dict__:
+            self.http.close()
+
+    def _get_pep_url(self, pep_id: str):
+        from urllib.error import HTTPError, URLError
+
+        url = PEP_URL_BASE + pep_id.zfill(4)
+
+        # assert PEP is valid and site works
+        try:
+            found = self.http.exists(url)
+        except HTTPError as exc:
+            fatal_error(
+                f"Recieved error status code '{exc.status}' from peps.python.org"
+            )
+        except URLError:
+            return None
+        if not found:
+            fatal_error(f"PEP {pep_id} not found...")
+
+        return url
+
+    @staticmethod
+    def _get_offline_url(pepper_dir: pathlib.Path, pep_id: str):
+        name = f"pep-{pep_id.zfill(4)}.html"
+        archive_path = _site_archive_path(pepper_dir)
+        if archive_path.exists():
+            archive = SiteArchive(archive_path)
+            found = archive.find(name) is not None
+            archive.close()
+        else:
+            found = pepper_dir.joinpath("peps", "peps-html", name).exists()
+        if not found:
+            fatal_error(f"PEP {pep_id} not found locally...")
+        _spawn_pep_server(pepper_dir)
+        return f"http://{BOTTLE_HOST}:{BOTTLE_PORT}/pep-{pep_id.zfill(4)}.html"
+
+    def view(self, pep_id: str):
+        import multiprocessing
+
+        ensure_module("webview")
+
+        if self.config.get("USE_OFFLINE") == "true":
+            pep_url = self._get_offline_url(self.pepper_dir, pep_id)
+        else:
+            pep_url = self._get_pep_url(pep_id)
+
+            if pep_url is None:
+                print("No internet connection detected. Checking for local copy.")
+                pep_url = self._get_offline_url(self.pepper_dir, pep_id)
+
+        print(f"Pulling up PEP {pep_id} in a new window...")
+        proc = multiprocessing.Process(
+            target=_view_helper, args=(pep_id, pep_url), daemon=False
+        )
+        proc.start()
+        print(f"PEP {pep_id} loaded ({proc.pid}), Bye!")
+        self.close()
+        os._exit(
+            0
+        )  # we call os._exit here to ensure the webview stays alive as an orphan, instead of dying along with the parent
+
+    def _read_pep_page(self, pep_id: str) -> str:
+        """Return the rendered page of a PEP, from the offline docs if possible."""
+        name = f"pep-{pep_id.zfill(4)}.html"
+        archive_path = _site_archive_path(self.pepper_dir)
+        if archive_path.exists():
+            archive = SiteArchive(archive_path)
+            entry = archive.find(name)
+            data = archive.read(entry) if entry is not None else None
+            archive.close()
+            if data is not None:
+                TRACE.cache("page", "archive", pep=pep_id)
+                return data.decode("utf-8", "replace")
+        with suppress(FileNotFoundError):
+            data = self.pepper_dir.joinpath("peps", "peps-html", name).read_bytes()
+            TRACE.cache("page", "local", pep=pep_id)
+            return data.decode("utf-8", "replace")
+        if self.config.get("USE_OFFLINE") == "true":
+            fatal_error(f"PEP {pep_id} not found locally...")
+
+        from urllib.error import HTTPError, URLError
+
+        TRACE.cache("page", "http", pep=pep_id)
+        reader = self.http.open(PEP_URL_BASE + pep_id.zfill(4), PAGE_RANGE_SIZE)
+        chunks = []
+        try:
+            # the cached part of the page comes first, and then the rest of it
+            # (if `info` only cached its header, say) from peps.python.org
+            for chunk in iter(lambda: reader.read(PAGE_RANGE_SIZE), b""):
+                chunks.append(chunk)
+        except HTTPError as exc:
+            if exc.code == 404:
+                fatal_error(f"PEP {pep_id} not found...")
+            fatal_error(f"Recieved error status code '{exc.code}' from peps.python.org")
+        except URLError as exc:
+            fatal_error(f"Unable to reach peps.python.org ({exc.reason})")
+        finally:
+            reader.close()
+        return b"".join(chunks).decode("utf-8", "replace")
+
+    def read(self, pep_id: str, *section):
+        import signal
+        import subprocess
+
+        toc = "--toc" in section
+        section = [arg for arg in section if arg != "--toc"]
+        if not pep_id.isdigit():
+            fatal_error(f"Invalid PEP number: '{pep_id}'")
+        pep_id = str(int(pep_id))
+        with TRACE.phase("load", pep=pep_id):
+            document = PepDocument(self._read_pep_page(pep_id))
+
+        if toc:
+            if not document.sections:
+                sys.stderr.write(f"No sections found in PEP {pep_id}\n")
+                return 1
+            for section_id, level, title, _ in document.sections:
+                print(f"{'  ' * max(level - 2, 0)}{title} ({section_id})")
+            return 0
+        start = None
+        if section:
+            start = document.find(" ".join(section))
+            if start is None:
+                fatal_error(
+                    f"No section '{' '.join(section)}' in PEP {pep_id} "
+                    f"(see `pepper read {pep_id} --toc`)"
+                )
+
+        pager = None
+        output = sys.stdout
+        if sys.stdout.isatty():
+            # like git: no pager for text that fits on one screen, and leave
+            # the text on the screen afterwards
+            env = dict(os.environ)
+            env.setdefault("LESS", "FRX")
+            pager = subprocess.Popen(
+                os.environ.get("PAGER") or "less",
+                shell=True,
+                stdin=subprocess.PIPE,
+                env=env,
+                encoding="utf-8",
+                errors="replace",
+            )
+            output = pager.stdin
+            # ^C is for the pager; it still stops us by closing the pipe
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+        # each section is rendered only once the pager has taken the ones
+        # before it (writes to a full pipe block), so long PEPs show up as
+        # quickly as short ones, and quitting early skips the rest
+        sections = document.render(start)
+        try:
+            while True:
+                begin = time.perf_counter()
+                lines = next(sections, None)
+                if lines is None:
+                    break
+                TRACE.record("render", time.perf_counter() - begin, lines=len(lines))
+                if lines:
+                    output.write("\n".join(lines) + "\n")
+                    output.flush()
+        except BrokenPipeError:
+            if pager is None:
+                raise
+        finally:
+            if pager is not None:
+                with suppress(BrokenPipeError):
+                    pager.stdin.close()
+                pager.wait()
+        return 0
+
+    def open(self, pep_id: str):
+        import webbrowser
+
+        if self.config.get("USE_OFFLINE") == "true":
+            MAKE_ORPHAN = True
+            pep_url = self._get_offline_url(self.pepper_dir, pep_id)
+        else:
+            MAKE_ORPHAN = False
+            pep_url = self._get_pep_url(pep_id)
+
+            if pep_url is None:
+                print("No internet connection detected. Checking for local copy.")
+                pep_url = self._get_offline_url(self.pepper_dir, pep_id)
+                MAKE_ORPHAN = True
+
+        print(f"Pulling up PEP {pep_id} in your default browser...")
+        webbrowser.open(pep_url, 2)
+        print(f"PEP {pep_id} loaded, Bye!")
+        if MAKE_ORPHAN:
+            self.close()
+            os._exit(0)
+        return 0
+
+    def kill_server(self):
+        import signal
 
-    def kill_server(self):
         pidfile = self.pepper_dir.joinpath("bottle.pid")
         if not pidfile.exists():
             fatal_error("No running instance of bottle detected...")
         pid = int(pidfile.read_text())
+        if not _pep_server_is_alive(pid):
+            pidfile.unlink()
+            fatal_error(
+                "No running instance of bottle detected (removed stale pidfile)..."
+            )
         os.kill(pid, signal.SIGTERM)
-        time.sleep(2)
-        with suppress(ProcessLookupError):
-            # if process still exists, use SIGKILL
-            os.kill(pid, signal.SIGKILL)
+        for _ in range(20):
+            if not _pep_server_is_alive(pid):
+                break
+            time.sleep(0.1)
+        else:
+            with suppress(ProcessLookupError):
+                # if process still exists, use SIGKILL
+                os.kill(pid, signal.SIGKILL)
         pidfile.unlink()
         print("Server successfully shut down.")
         return 0
 
+    def daemon(self, action: str):
+        import signal
+
+        daemon = PepperDaemon(self.pepper_dir)
+        idle_timeout = float(
+            self.config.get("DAEMON_IDLE_TIMEOUT", DAEMON_IDLE_TIMEOUT)
+        )
+        if action == "run":
+            daemon.serve(idle_timeout)
+            return 0
+
+        if action == "start":
+            if daemon.is_running():
+                fatal_error("A pepper daemon is already running...")
+            pid = os.fork()
+            if pid == 0:
+                # detach from the terminal, and from this process
+                os.setsid()
+                devnull = os.open(os.devnull, os.O_RDWR)
+                for fd in (0, 1, 2):
+                    os.dup2(devnull, fd)
+                try:
+                    daemon.serve(idle_timeout)
+                finally:
+                    os._exit(0)
+            for _ in range(100):
+                if _daemon_request(self.pepper_dir, {"command": "ping"}, 1):
+                    break
+                time.sleep(0.05)
+            else:
+                fatal_error("Timed out waiting for the pepper daemon to start...")
+            print(
+                f"Started pepper daemon ({pid}). Run `pepper daemon stop` to stop it."
+            )
+            return 0
+
+        if action == "stop":
+            if not daemon.is_running():
+                fatal_error("No running pepper daemon detected...")
+            if _daemon_request(self.pepper_dir, {"command": "shutdown"}, 5) is None:
+                # not answering: fall back to a signal, to the pid that holds
+                # the lock (so never to an unrelated process)
+                with suppress(ValueError, ProcessLookupError):
+                    os.kill(int(daemon.lock_path.read_text()), signal.SIGTERM)
+            for _ in range(50):
+                if not daemon.is_running():
+                    break
+                time.sleep(0.1)
+            else:
+                fatal_error("The pepper daemon didn't shut down...")
+            print("Daemon successfully shut down.")
+            return 0
+
+        if action == "status":
+            reply = _daemon_request(self.pepper_dir, {"command": "ping"}, 5)
+            if reply is not None:
+                print(
+                    f"pepper daemon running ({reply['pid']}), "
+                    f"up for {reply['uptime']:.0f}s"
+                )
+                return 0
+            if daemon.is_running():
+                print("pepper daemon running, but not answering")
+                return 1
+            print("pepper daemon not running")
+            return 1
+
+        fatal_error(
+            f"Unknown daemon action '{action}' (expected start, stop, status or run)"
+        )
+
     def keys(_):
         sys.stdout.write("\n")
         print("PEP Types Key")
@@ -433,81 +4862,563 @@ class Commands:
         sys.stdout.write("\n")
         return 0
 
-    def info(_, pep_id: str):
-        try:
-            res: HTTPResponse = urlopen(PEP_URL_BASE + pep_id.zfill(4))
-        except HTTPError as exc:
-            if exc.status == 404:
-                fatal_error(f"PEP {pep_id} not found...")
-            fatal_error(
-                f"Recieved error status code '{exc.status}' from peps.python.org"
-            )
+    @staticmethod
+    def _parse_pep_ids(args) -> list:
+        pep_ids = []
+        for arg in args:
+            start, _, end = arg.partition("-")
+            if not start.isdigit() or not (end.isdigit() or not end):
+                fatal_error(f"Invalid PEP number or range: '{arg}'")
+            if not end:
+                pep_ids.append(str(int(start)))
+                continue
+            if int(end) < int(start):
+                fatal_error(f"Invalid PEP range: '{arg}'")
+            pep_ids.extend(str(x) for x in range(int(start), int(end) + 1))
+        return pep_ids
+
+    def _fetch_pep_info(self, pep_id: str) -> dict:
+        from urllib.error import HTTPError
+
+        local_path = _local_pep_path(self.pepper_dir, pep_id)
+        if local_path is not None:
+            TRACE.cache("local-pep", "hit", pep=pep_id)
+            if self.local_headers is None:
+                return _read_local_pep_info(local_path)
+            key = (local_path, local_path.stat().st_mtime_ns)
+            if key not in self.local_headers:
+                self.local_headers[key] = _read_local_pep_info(local_path)
+            return self.local_headers[key]
+        TRACE.cache("local-pep", "miss", pep=pep_id)
+        if self.config.get("USE_OFFLINE") == "true":
+            raise HTTPError(PEP_URL_BASE + pep_id.zfill(4), 404, "", None, None)
+        return PepFileHeaderParser.parse_stream(
+            self.http.open(PEP_URL_BASE + pep_id.zfill(4), HEADER_RANGE_SIZE)
+        )
 
-        parsed_pep = PepFileHeaderParser.parse(res.read())
+    @staticmethod
+    def _print_pep_info(parsed_pep: dict, url: str) -> None:
         print(parsed_pep["raw_title"])
-        print(f"({PEP_URL_BASE + pep_id.zfill(4)})", end="\n\n")
+        print(f"({url})", end="\n\n")
         for item in parsed_pep["header"].items():
             print("\t", end="")
             if not isinstance(item[1], list):
                 print(": ".join(item))
             elif item[0] == "Author":
                 print(f"{item[0]}: {item[1][0]}")
-                item[1].pop(0)
-                for entry in item[1]:
+                for entry in item[1][1:]:
                     print(f"\t\t{entry}")
             else:
                 s = f"{item[0]}: {item[1][0]},"
-                item[1].pop(0)
-                for entry in item[1]:
+                for entry in item[1][1:]:
                     s += f" {entry},"
                 print(s.strip(","))
-        return 0
 
-    def search(_, attribute, *query_list):
-        try:
-            res: HTTPResponse = urlopen(PEP_0_URL)
-        except HTTPError as exc:
-            fatal_error(f"Recieved error status code '{exc.status}' from python.org")
+    @staticmethod
+    def _pop_format(args) -> tuple:
+        """Split a `--format=FORMAT` option out of `args`."""
+        fmt, rest = None, []
+        for arg in args:
+            if not arg.startswith("--format="):
+                rest.append(arg)
+                continue
+            fmt = arg.partition("=")[2]
+            if fmt not in RecordWriter.FORMATS:
+                fatal_error(
+                    f"Unknown output format '{fmt}' (expected jsonl, csv or tsv)"
+                )
+        return fmt, rest
 
-        parsed_list = PepZeroParser.parse(res.read())
-        if parsed_list[0].get(attribute.lower()) is None:
-            fatal_error(
-                f"Invalid attribute: '{attribute}'\n"
-                "Valid attributes are: 'title', 'authors', 'type', 'status'"
-            )
+    def info(self, *pep_ids):
+        from concurrent.futures import ThreadPoolExecutor
+        from urllib.error import HTTPError, URLError
+
+        fmt, pep_ids = self._pop_format(pep_ids)
+        if not pep_ids:
+            fatal_error("No PEP numbers given...")
+        pep_ids = self._parse_pep_ids(pep_ids)
+        writer = RecordWriter(fmt, RecordWriter.INFO_COLUMNS) if fmt else None
+        workers = min(int(self.config.get("INFO_WORKERS", INFO_WORKERS)), len(pep_ids))
+        status = 0
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            futures = [
+                executor.submit(self._fetch_pep_info, pep_id) for pep_id in pep_ids
+            ]
+            # results are printed in order, each as soon as it (and every
+            # PEP before it) has been fetched
+            for count, (pep_id, future) in enumerate(zip(pep_ids, futures)):
+                try:
+                    parsed_pep = future.result()
+                except HTTPError as exc:
+                    if exc.code == 404:
+                        sys.stderr.write(f"pepper: PEP {pep_id} not found...\n")
+                    else:
+                        sys.stderr.write(
+                            f"pepper: Recieved error status code '{exc.code}' from peps.python.org\n"
+                        )
+                    status = 1
+                    continue
+                except URLError as exc:
+                    for pending in futures:
+                        pending.cancel()
+                    fatal_error(f"Unable to reach peps.python.org ({exc.reason})")
+
+                with TRACE.phase("render", pep=pep_id):
+                    url = PEP_URL_BASE + pep_id.zfill(4)
+                    if writer is not None:
+                        writer.write({**_export_record(parsed_pep), "url": url})
+                    else:
+                        if count:
+                            print()
+                        self._print_pep_info(parsed_pep, url)
+                # only flush when the next PEP isn't ready yet, so output keeps
+                # up with slow fetches without a write for every PEP
+                if count + 1 == len(futures) or not futures[count + 1].done():
+                    sys.stdout.flush()
+        return status
+
+    def search(self, *query_list):
+        fmt, query_list = self._pop_format(query_list)
+        if not query_list:
+            fatal_error("No query given...")
+        if query_list[0].lower() in ("title", "authors", "type", "status", "number"):
+            # legacy form: `search ATTR QUERY [QUERY ...]`
+            attribute = query_list[0].lower()
+            op = "=" if attribute == "authors" else ":"
+            queries = query_list[1:]
+            if not queries:
+                fatal_error("No query given...")
+            headings = [f"'{attribute}' query: '{query}'" for query in queries]
+            matchers = [PepQuery.from_term(attribute, op, query) for query in queries]
+        else:
+            query = " ".join(query_list)
+            queries = [query]
+            headings = [f"query: '{query}'"]
+            try:
+                matchers = [compile_query(query)]
+            except QuerySyntaxError as exc:
+                fatal_error(f"Invalid query: {exc}")
+
+        def print_results(heading, peps):
+            print(f"\nResults for {heading}")
+            found = 0
+            render_time = 0.0
+            for pep in peps:
+                start = time.perf_counter()
+                if not found:
+                    print("---------------------------------------")
+                    print("| Type/Status | PEP | Title | Authors |")
+                    print("---------------------------------------\n")
+                found += 1
+                print(format_searched_pep(pep))
+                render_time += time.perf_counter() - start
+            TRACE.record("render", render_time, results=found)
+            if not found:
+                sys.stderr.write(f"No PEP found matching the following {heading}\n")
+            return bool(found)
+
+        # matches for the first query are printed as they are found (which,
+        # when PEP 0 is being refreshed, is while it is still downloading);
+        # the rest are held back so each query's results stay together
+        records = PepIndexCache(
+            self.pepper_dir, self.config, self.http.pool, self.pep_indexes
+        ).records()
+        if fmt is not None:
+            return self._write_search_results(fmt, records, matchers, queries)
+        held_back = [[] for _ in matchers[1:]]
 
-        for query in query_list:
-            print(f"\nResults for '{attribute}' query: '{query}'")
-            peps = []
-            for pep in parsed_list:
-                if attribute == "authors":
-                    if query.lower() in [x.lower() for x in pep[attribute]]:
-                        peps.append(format_searched_pep(pep))
+        def first_query_matches():
+            for position, pep in iter_filter_peps(records, matchers):
+                if position == 0:
+                    yield pep
                 else:
-                    processed_query = (
-                        query.lower().replace(".", "\.").replace("*", ".+")
-                    )
-                    if (
-                        re.search(processed_query, str(pep[attribute]).lower())
-                        is not None
-                    ):
-                        peps.append(format_searched_pep(pep))
-            if not peps:
+                    held_back[position - 1].append(pep)
+
+        status = 0
+        if not print_results(headings[0], first_query_matches()):
+            status = 1
+        for heading, peps in zip(headings[1:], held_back):
+            if not print_results(heading, peps):
+                status = 1
+
+        sys.stdout.write("\n")
+        return status
+
+    @staticmethod
+    def _write_search_results(fmt, records, matchers, queries) -> int:
+        # every match is written as soon as it is found, in index order (and
+        # so not grouped by query, which is added to each record instead)
+        columns = RecordWriter.SEARCH_COLUMNS
+        if len(queries) > 1:
+            columns = ("query", *columns)
+        writer = RecordWriter(fmt, columns)
+        found = [False] * len(matchers)
+        for position, pep in iter_filter_peps(records, matchers):
+            found[position] = True
+            if len(queries) > 1:
+                pep = {"query": queries[position], **pep}
+            writer.write(pep)
+        sys.stdout.flush()
+        for query, matched in zip(queries, found):
+            if not matched:
                 sys.stderr.write(
                     f"No PEP found matching the following query: '{query}'\n"
                 )
-                return 1
+        return 0 if all(found) else 1
+
+    def fulltext(self, *query_list):
+        if not query_list:
+            fatal_error("No query given...")
+        query = " ".join(query_list)
+        index = _load_fulltext_index(self.pepper_dir)
+        results = index.search(query)
+        if not results:
+            sys.stderr.write(f"No PEP found matching the following query: '{query}'\n")
+            return 1
+
+        print(f"\nResults for full-text query: '{query}'")
+        print("---------------------------------------")
+        for score, number, title, snippet in results:
+            print(f"\nPEP {number} – {title} ({score:.2f})")
+            print("    " + KeyTextWrapper(4).fill(snippet))
+        sys.stdout.write("\n")
+        return 0
+
+    def refs(self, pep_id: str, *options):
+        reverse = transitive = False
+        kinds = None
+        for option in options:
+            if option in ("-r", "--reverse"):
+                reverse = True
+            elif option in ("-t", "--transitive"):
+                transitive = True
+            elif option.startswith("--kind="):
+                kinds = option.partition("=")[2].split(",")
+                for kind in kinds:
+                    if kind not in RefGraph.KINDS:
+                        fatal_error(
+                            f"Unknown reference kind '{kind}' (expected one of {', '.join(RefGraph.KINDS)})"
+                        )
+            else:
+                fatal_error(f"Unknown option '{option}'")
+        if not pep_id.isdigit():
+            fatal_error(f"Invalid PEP number: '{pep_id}'")
+
+        graph_path = self.pepper_dir.joinpath("refs-graph.bin")
+        if not graph_path.exists():
+            TRACE.cache("refs-graph", "miss")
+            if not _local_pep_paths(self.pepper_dir):
+                fatal_error(
+                    "No local PEPs found to index...\n"
+                    "Run `pepper generate_offline_docs` or `pepper mirror` first."
+                )
+            sys.stderr.write("Indexing references between PEPs...\n")
+            _update_ref_graph(self.pepper_dir)
+        else:
+            TRACE.cache("refs-graph", "hit")
+        graph = RefGraph(graph_path)
+        with TRACE.phase("query"):
+            results = graph.traverse(int(pep_id), reverse, transitive, kinds)
+        graph.close()
+
+        heading = (
+            f"PEPs {'referring to' if reverse else 'referred to by'} PEP {int(pep_id)}"
+        )
+        if not results:
+            sys.stderr.write(f"No {heading}\n")
+            return 1
+        with TRACE.phase("render", results=len(results)):
+            print(f"\n{heading}{' (transitively)' if transitive else ''}")
+            print("---------------------------------------")
+            for depth, number, kind, title, via in results:
+                line = f"{kind:<14} PEP {number}"
+                if title:
+                    line += f" – {title}"
+                print(line + (f" (via PEP {via})" if depth > 1 else ""))
+            sys.stdout.write("\n")
+        return 0
+
+    def changes(self, since: str = None):
+        history = PepIndexHistory(self.pepper_dir.joinpath("pep0-history.jsonl"))
+        # refresh the index first (if it's due), which logs a new snapshot
+        # when anything changed
+        PepIndexCache(
+            self.pepper_dir, self.config, self.http.pool, self.pep_indexes
+        ).load()
+        snapshots = list(history.snapshots())
+        if not snapshots:
+            sys.stderr.write("No snapshots of the PEP index recorded yet\n")
+            return 1
+
+        def date(timestamp) -> str:
+            return time.strftime("%Y-%m-%d %H:%M", time.localtime(timestamp))
+
+        if since is None:
+            print("\nSnapshots of the PEP index")
+            print("---------------------------------------")
+            for snapshot_id, timestamp, delta in snapshots:
+                print(
+                    f"{snapshot_id:>5}  {date(timestamp)}  "
+                    f"+{len(delta.get('added', ()))} "
+                    f"~{len(delta.get('changed', ()))} "
+                    f"-{len(delta.get('removed', ()))}"
+                )
+            sys.stdout.write("\n")
+            return 0
+
+        if since.isdigit():
+            base = int(since)
+            if not 1 <= base <= snapshots[-1][0]:
+                fatal_error(f"No snapshot {base} (see `pepper changes`)")
+            heading = f"snapshot {base}"
+        else:
+            import datetime
+
+            try:
+                start = datetime.datetime.strptime(since, "%Y-%m-%d").timestamp()
+            except ValueError:
+                fatal_error(f"Expected a date (YYYY-MM-DD) or snapshot, got '{since}'")
+            base = max(
+                (
+                    snapshot_id
+                    for snapshot_id, timestamp, _ in snapshots
+                    if timestamp < start
+                ),
+                default=snapshots[0][0],
+            )
+            heading = since
+            if snapshots[0][1] >= start:
+                sys.stderr.write(f"History only starts on {date(snapshots[0][1])}\n")
+
+        with TRACE.phase("replay", snapshots=len(snapshots)):
+            state = {}
+            for snapshot_id, _, delta in snapshots:
+                if snapshot_id > base:
+                    break
+                history.apply(state, delta)
+            baseline = set(state)
+            # every value each field went through, with when it changed
+            trail = {}
+            for snapshot_id, timestamp, delta in snapshots:
+                if snapshot_id <= base:
+                    continue
+                for number, fields in delta.get("changed", {}).items():
+                    pep = state.get(int(number), {})
+                    for field, value in fields.items():
+                        if field != "authors" and pep.get(field) != value:
+                            trail.setdefault(
+                                (int(number), field), [(pep.get(field), None)]
+                            ).append((value, timestamp))
+                history.apply(state, delta)
+
+        new = sorted(number for number in state if number not in baseline)
+        removed = sorted(number for number in baseline if number not in state)
+        if not (new or removed or trail):
+            sys.stderr.write(f"No changes to the PEP index since {heading}\n")
+            return 1
 
+        print(f"\nChanges to the PEP index since {heading}")
+        print("---------------------------------------")
+        if new:
+            print("\nNew PEPs:")
+            for number in new:
+                print(format_searched_pep({"number": number, **state[number]}))
+        for field in ("status", "type", "title"):
+            changed = sorted(number for number, name in trail if name == field)
+            if not changed:
+                continue
+            print(f"\n{field.capitalize()} changes:")
+            for number in changed:
+                values = trail[number, field]
+                path = repr(values[0][0]) if field == "title" else values[0][0]
+                for value, timestamp in values[1:]:
+                    value = repr(value) if field == "title" else value
+                    path += f" → {value} ({date(timestamp)[:10]})"
+                if field == "title":
+                    print(f"PEP {number}: {path}")
+                else:
+                    title = state.get(number, {}).get("title", "")
+                    print(f"PEP {number} – {title}: {path}")
+        if removed:
+            print("\nRemoved:")
+            for number in removed:
+                print(f"PEP {number}")
+        sys.stdout.write("\n")
+        return 0
+
+    def fuzzy(self, *query_list):
+        query = " ".join(query_list)
+        cutoff = float(self.config.get("FUZZY_CUTOFF", FUZZY_CUTOFF))
+        index = _load_fuzzy_index(self.pepper_dir, self.config)
+        with TRACE.phase("query"):
+            results = index.search(query, cutoff, FUZZY_RESULTS)
+        index.close()
+        if not results:
+            sys.stderr.write(f"No PEP found matching the following query: '{query}'\n")
+            return 1
+
+        with TRACE.phase("render", results=len(results)):
+            print(f"\nResults for fuzzy query: '{query}'")
             print("---------------------------------------")
             print("| Type/Status | PEP | Title | Authors |")
             print("---------------------------------------\n")
-            for pep in peps:
-                print(pep)
+            for score, pep in results:
+                print(f"{format_searched_pep(pep)} ({score:.2f})")
+            sys.stdout.write("\n")
+        return 0
 
-        sys.stdout.write("\n")
+    def _export_results(self):
+        """Yield (number, record, error) for every PEP, local or not."""
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+        from urllib.error import HTTPError, URLError
+
+        paths = _local_pep_paths(self.pepper_dir)
+        if paths:
+            # parsing is CPU bound, so local PEPs are read by a pool of
+            # processes, a chunk of PEPs at a time
+            workers = os.cpu_count() or 1
+            chunks = [
+                paths[i : i + EXPORT_CHUNK_SIZE]
+                for i in range(0, len(paths), EXPORT_CHUNK_SIZE)
+            ]
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for results in _bounded_map(
+                    executor, _export_local_peps, chunks, workers * 2
+                ):
+                    yield from results
+            return
+
+        if self.config.get("USE_OFFLINE") == "true":
+            fatal_error(
+                "No local PEPs found to export...\n"
+                "Run `pepper generate_offline_docs`, or disable `USE_OFFLINE`."
+            )
+        # without a local copy, every header is fetched like `info` does it
+        numbers = [
+            str(pep["number"])
+            for pep in PepIndexCache(self.pepper_dir, self.config).load()
+        ]
+
+        def fetch(pep_id):
+            try:
+                record = _export_record(self._fetch_pep_info(pep_id))
+            except HTTPError as exc:
+                return int(pep_id), None, f"HTTP error {exc.code}"
+            except URLError:
+                raise
+            except Exception as exc:
+                return int(pep_id), None, f"{type(exc).__name__}: {exc}"
+            return int(pep_id), record, None
+
+        workers = int(self.config.get("INFO_WORKERS", INFO_WORKERS))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            try:
+                yield from _bounded_map(executor, fetch, numbers, workers * 4)
+            except URLError as exc:
+                fatal_error(f"Unable to reach peps.python.org ({exc.reason})")
+
+    def export(self, fmt: str, output: str = "-"):
+        if fmt not in EXPORTERS:
+            fatal_error(f"Unknown export format '{fmt}' (expected jsonl or sqlite)")
+        start = time.perf_counter()
+        exporter = EXPORTERS[fmt](output)
+        exported = failed = 0
+        try:
+            for number, record, error in self._export_results():
+                if error is not None:
+                    sys.stderr.write(
+                        f"pepper: Unable to export PEP {number} ({error})\n"
+                    )
+                    failed += 1
+                    continue
+                exporter.write(record)
+                exported += 1
+        except BaseException:
+            exporter.abort()
+            raise
+        exporter.close()
+
+        sys.stderr.write(
+            f"Exported {exported} PEPs"
+            + (f" to '{output}'" if output != "-" else "")
+            + f" in {time.perf_counter() - start:.2f}s"
+            + (f" ({failed} failed)" if failed else "")
+            + "\n"
+        )
+        return 1 if failed else 0
+
+    def _build_metadata_store(self, store: MetadataStore) -> None:
+        sys.stderr.write("Building the PEP metadata store...\n")
+        source = "local" if _local_pep_paths(self.pepper_dir) else "network"
+
+        def records():
+            for number, record, error in self._export_results():
+                if error is not None:
+                    sys.stderr.write(f"pepper: Unable to read PEP {number} ({error})\n")
+                    continue
+                yield record
+
+        store.build(records(), source)
+
+    def query(self, *query_list):
+        query = " ".join(query_list)
+        try:
+            compiled = MetadataQuery(query)
+        except QuerySyntaxError as exc:
+            fatal_error(f"Invalid query: {exc}")
+
+        # a store built from local PEPs is rebuilt along with them, one
+        # built from peps.python.org expires like the PEP 0 index does
+        store = MetadataStore(self.pepper_dir)
+        info = store.info()
+        ttl = int(self.config.get("INDEX_TTL", PEP_INDEX_TTL))
+        if info is None:
+            TRACE.cache("metadata", "miss")
+            self._build_metadata_store(store)
+        elif (
+            info.get("source") == "network"
+            and self.config.get("USE_OFFLINE") != "true"
+            and time.time() - float(info["built"]) > ttl
+        ):
+            TRACE.cache("metadata", "expired")
+            self._build_metadata_store(store)
+        else:
+            TRACE.cache("metadata", "hit")
+
+        with TRACE.phase("query"):
+            peps = store.query(compiled)
+        if not peps:
+            sys.stderr.write(f"No PEP found matching the following query: '{query}'\n")
+            return 1
+
+        with TRACE.phase("render", results=len(peps)):
+            print(f"\nResults for query: '{query}'")
+            print("---------------------------------------")
+            print("| Type/Status | PEP | Title | Authors |")
+            print("---------------------------------------\n")
+            for pep in peps:
+                authors = [
+                    _author_name(author).split()[-1]
+                    for author in pep["header"].get("Author", [])
+                    if _author_name(author)
+                ]
+                print(
+                    format_searched_pep(
+                        {
+                            "type": pep["type"] or "?",
+                            "status": pep["status"] or "?",
+                            "number": pep["number"],
+                            "title": pep["title"],
+                            "authors": authors,
+                        }
+                    )
+                )
+            sys.stdout.write("\n")
         return 0
 
     def generate_offline_docs(self):
+        import shutil
+
         ensure_interactive_mode()
         ensure_module("venv")
         storage_dir = self.pepper_dir.joinpath("peps")
@@ -516,61 +5427,139 @@ class Commands:
             storage_dir.mkdir()
 
         os.chdir(storage_dir)
-        sys.stdout.write("Generating build environment...\n")
-        builder = venv.EnvBuilder(clear=True, with_pip=True, symlinks=False)
-        builder.ensure_directories(storage_dir.joinpath(".venv"))
-        builder.create(storage_dir.joinpath(".venv"))
+        _create_build_env(storage_dir.joinpath(".venv"), self.config)
 
-        install_proc = subprocess.run(
-            [
-                storage_dir.joinpath(".venv", "bin", "pip"),
-                "install",
-                "-U",
-                "Pygments >= 2.9.0",
-                "Sphinx >= 5.1.1, != 6.1.0, != 6.1.1",
-                "docutils >= 0.19.0",
-            ],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-        )
-        if install_proc.returncode != 0:
-            sys.stderr.write("**ERROR** pip failed with the following output:\n\n")
-            sys.stderr.write(install_proc.stdout.decode())
-            raise SystemExit(1)
+        if storage_dir.joinpath("git-ds", ".git").exists():
+            os.chdir("git-ds")
+            if self.config.get("USE_OFFLINE") == "true":
+                sys.stdout.write("Using the existing PEPs checkout (USE_OFFLINE)...\n")
+            else:
+                import subprocess
 
-        sys.stdout.write("Downloading PEPs...\n")
-        git_proc = subprocess.run(
-            ["git", "clone", "--depth=1", "https://github.com/python/peps.git"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-        )
-        if git_proc.returncode != 0:
-            sys.stderr.write("**ERROR** git failed with the following output:\n\n")
-            sys.stderr.write(git_proc.stdout.decode())
-            raise SystemExit(1)
-        shutil.move("peps", "git-ds")
+                sys.stdout.write("Updating PEPs...\n")
+                proc = subprocess.run(
+                    ["git", "pull"], stdout=subprocess.PIPE, stderr=subprocess.STDOUT
+                )
+                if proc.returncode != 0:
+                    # i.e. no network: the checkout we have can still be built
+                    sys.stderr.write(
+                        "**WARNING** git pull failed, building the existing "
+                        "checkout instead:\n\n" + proc.stdout.decode() + "\n"
+                    )
+        else:
+            sys.stdout.write("Downloading PEPs...\n")
+            _run_or_exit(
+                ["git", "clone", "--depth=1", "https://github.com/python/peps.git"],
+                "git",
+            )
+            shutil.move("peps", "git-ds")
 
         sys.stdout.write("Building PEPs...\n")
-        os.chdir("git-ds")
-        build_proc = subprocess.run(
-            [storage_dir.joinpath(".venv", "bin", "python3"), "build.py"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-        )
-        if build_proc.returncode != 0:
-            sys.stderr.write("**ERROR** python failed with the following output:\n\n")
-            sys.stderr.write(build_proc.stdout.decode())
-            raise SystemExit(1)
+        _build_peps(storage_dir, BuildManifest(storage_dir))
         if not storage_dir.joinpath("peps-html").exists():
             os.system(
                 f'ln -sf {storage_dir.joinpath("git-ds", "build")} {storage_dir.joinpath("peps-html")}'
             )
 
+        _precompress_site(storage_dir.joinpath("peps-html"))
+        if _site_archive_path(self.pepper_dir).exists():
+            _pack_site(self.pepper_dir)
+        _load_fulltext_index(self.pepper_dir, rebuild=True).close()
+        _update_ref_graph(self.pepper_dir)
+        self._build_metadata_store(MetadataStore(self.pepper_dir))
+
         sys.stderr.write(
             f"Finished! All current PEPs have been built in the '{storage_dir.joinpath('peps-html')}' directory!\n"
         )
         return 0
 
+    def mirror(self):
+        from concurrent.futures import ThreadPoolExecutor
+        from urllib.error import URLError
+
+        if self.config.get("USE_OFFLINE") == "true":
+            fatal_error("Mirroring needs peps.python.org, disable `USE_OFFLINE` first.")
+        storage_dir = self.pepper_dir.joinpath("peps")
+        site_dir = storage_dir.joinpath("peps-html")
+        site_dir.mkdir(parents=True, exist_ok=True)
+        manifest = MirrorManifest(storage_dir)
+        pool = self.http.pool
+
+        peps = PepIndexCache(self.pepper_dir, self.config, pool).load()
+        pages = {"pep-0000.html": PEP_0_URL + "/"}
+        for pep in peps:
+            pages[f"pep-{pep['number']:04}.html"] = f"{PEP_URL_BASE}{pep['number']:04}/"
+        peps.close()
+
+        workers = int(self.config.get("MIRROR_WORKERS", MIRROR_WORKERS))
+        counts = Counter()
+
+        def fetch(item):
+            name, url = item
+            return _mirror_file(pool, site_dir, name, url, manifest.files.get(name))
+
+        def run(files: dict, label: str) -> dict:
+            assets = {}
+            sys.stderr.write(f"Mirroring {len(files)} {label}...\n")
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = _bounded_map(executor, fetch, files.items(), workers * 4)
+                for count, (name, record, changed, error) in enumerate(results, 1):
+                    if error is not None:
+                        sys.stderr.write(f"pepper: Unable to mirror {name} ({error})\n")
+                        counts["failed"] += 1
+                        continue
+                    counts["downloaded" if changed else "unchanged"] += 1
+                    manifest.files[name] = record
+                    if name.endswith(".html"):
+                        with suppress(OSError):
+                            data = site_dir.joinpath(name).read_bytes()
+                            assets.update(_mirror_assets(record["url"], data))
+                    if count % 50 == 0:
+                        manifest.save()
+            return assets
+
+        try:
+            assets = run(pages, "pages")
+            run(assets, "theme assets")
+        except URLError as exc:
+            fatal_error(f"Unable to reach peps.python.org ({exc.reason})")
+        finally:
+            # also when interrupted, so the next run picks up where this one stopped
+            manifest.save()
+
+        sys.stderr.write(
+            f"{counts['downloaded']} downloaded, {counts['unchanged']} unchanged, "
+            f"{counts['failed']} failed\n"
+        )
+        if (
+            counts["downloaded"]
+            or not self.pepper_dir.joinpath("fulltext-index.bin").exists()
+        ):
+            _precompress_site(site_dir)
+            if _site_archive_path(self.pepper_dir).exists():
+                _pack_site(self.pepper_dir)
+            _load_fulltext_index(self.pepper_dir, rebuild=True).close()
+            _update_ref_graph(self.pepper_dir)
+            self._build_metadata_store(MetadataStore(self.pepper_dir))
+        return 1 if counts["failed"] else 0
+
+    def pack(self):
+        site_dir = self.pepper_dir.joinpath("peps", "peps-html")
+        if not site_dir.exists():
+            fatal_error(
+                "No offline docs found to pack...\n"
+                "Run `pepper generate_offline_docs` or `pepper mirror` first."
+            )
+        _pack_site(self.pepper_dir)
+        archive_path = _site_archive_path(self.pepper_dir)
+        sys.stderr.write(
+            f"Wrote '{archive_path}' ({archive_path.stat().st_size / 2**20:.1f} MiB), "
+            "which is kept up to date along with the offline docs from now on.\n"
+            "The offline docs are still needed (to update, mirror and index them), "
+            "so this adds to the disk space they use.\n"
+        )
+        return 0
+
     def update_offline_docs(self):
         ensure_interactive_mode()
         storage_dir = self.pepper_dir.joinpath("peps")
@@ -582,27 +5571,37 @@ class Commands:
 
         sys.stdout.write("Checking for new upstream commits...\n")
         os.chdir(storage_dir.joinpath("git-ds"))
-        git_proc = subprocess.run(
-            ["git", "pull"], stdout=subprocess.PIPE, stderr=subprocess.STDOUT
-        )
-        if git_proc.returncode != 0:
-            sys.stderr.write("**ERROR** git failed with the following output:\n\n")
-            sys.stderr.write(git_proc.stdout.decode())
-            raise SystemExit(1)
-        if git_proc.stdout == b"Already up to date.\n":
+        old_head = _run_or_exit(["git", "rev-parse", "HEAD"], "git").strip()
+        _run_or_exit(["git", "pull"], "git")
+        new_head = _run_or_exit(["git", "rev-parse", "HEAD"], "git").strip()
+        changed = _run_or_exit(
+            ["git", "diff", "--name-only", old_head, new_head], "git"
+        ).decode()
+
+        manifest = BuildManifest(storage_dir)
+        changed = [name for name in changed.split("\n") if name]
+        if not changed and not manifest.pending:
             sys.stdout.write("Local repository up-to-date.\n")
             return 0
 
-        sys.stdout.write("Running builder...\n")
-        build_proc = subprocess.run(
-            [storage_dir.joinpath(".venv", "bin", "python3"), "build.py"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-        )
-        if build_proc.returncode != 0:
-            sys.stderr.write("**ERROR** python failed with the following output:\n\n")
-            sys.stderr.write(build_proc.stdout.decode())
-            raise SystemExit(1)
+        if not manifest.sources or not all(map(manifest.is_source, changed)):
+            # changes to the build itself (templates, extensions, ...) can
+            # affect every page
+            sys.stdout.write("Running full build...\n")
+            _build_peps(storage_dir, manifest)
+        else:
+            outdated = manifest.outdated(changed)
+            sys.stdout.write(
+                f"Rebuilding {len(set(outdated) | set(manifest.pending))} changed PEP(s)...\n"
+            )
+            _build_peps(storage_dir, manifest, outdated)
+
+        _precompress_site(storage_dir.joinpath("peps-html"))
+        if _site_archive_path(self.pepper_dir).exists():
+            _pack_site(self.pepper_dir)
+        _load_fulltext_index(self.pepper_dir, rebuild=True).close()
+        _update_ref_graph(self.pepper_dir)
+        self._build_metadata_store(MetadataStore(self.pepper_dir))
 
         sys.stderr.write(
             f"Finished! All current PEPs have been built in the '{storage_dir.joinpath('peps-html')}' directory!\n"
@@ -610,15 +5609,11 @@ class Commands:
         return 0
 
     def run_cmd(self, cmd, args):
-        members = inspect.getmembers(self, predicate=inspect.ismethod)
-        func = None
-        for name, ref in members:
-            if cmd == name:
-                func = ref
-        if func is None or func.__name__ == "run_cmd":
+        if cmd not in self.COMMANDS:
             fatal_error(f"No such command ({cmd})...")
+        func = getattr(self, cmd)
 
-        param_count = len(inspect.signature(func).parameters)
+        param_count = self.COMMANDS[cmd]
         if param_count > len(args):
             fatal_error(
                 f"Not enough arguments (expected {param_count}, got {len(args)})."
@@ -626,10 +5621,337 @@ class Commands:
         raise SystemExit(func(*args))
 
 
+class _DaemonOutput(io.TextIOBase):
+    """
+    Stand-in for stdout or stderr while the daemon runs a command, sending
+    what is written to the client as it goes, as `{name: text}` lines.
+
+    Like stdout into a pipe, writes are held back until the command flushes
+    (or `BUFFER_SIZE` characters are waiting), so commands that flush as
+    their results come in stream them to the client too. With `buffered`
+    false (for stderr), every write is sent at once. Once the client has
+    gone away, every write raises BrokenPipeError.
+    """
+
+    BUFFER_SIZE = 8192
+
+    def __init__(self, stream, name: str, buffered: bool = True) -> None:
+        super().__init__()
+        self._stream = stream
+        self._name = name
+        self._buffered = buffered
+        self._pending = []
+        self._size = 0
+        self._broken = False
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        self._pending.append(text)
+        self._size += len(text)
+        if not self._buffered or self._size >= self.BUFFER_SIZE:
+            self.flush()
+        return len(text)
+
+    def flush(self) -> None:
+        import json
+
+        if self._broken:
+            raise BrokenPipeError("the client has gone away")
+        if not self._pending:
+            return
+        text = "".join(self._pending)
+        self._pending, self._size = [], 0
+        try:
+            self._stream.write(json.dumps({self._name: text}).encode() + b"\n")
+            self._stream.flush()
+        except OSError:
+            self._broken = True
+            raise BrokenPipeError("the client has gone away") from None
+
+
+class PepperDaemon:
+    """
+    Long-running server that answers pepper commands over a Unix socket.
+
+    It keeps what one-off `pepper` processes have to load again every time
+    (the interpreter and its imports, the HTTP cache's index and its
+    keep-alive connections, parsed PEP headers) in memory, and runs the
+    read-only commands in `COMMANDS` on behalf of the CLI.
+
+    The protocol is one JSON object per line: the client sends a request,
+    i.e. `{"version": ..., "command": "search", "args": [...], "columns":
+    80}`, and the daemon streams the command's output back as it is
+    written, as `{"stdout": ...}` and `{"stderr": ...}` lines, ending with
+    `{"status": 0}`. It replies with just `{"error": ...}` if it can't run
+    the command (the CLI then runs it itself). Besides commands, it
+    understands `ping` and `shutdown`.
+
+    Only one daemon runs per pepper directory: it holds an exclusive
+    `flock` on `daemon.lock` for as long as it runs, which the kernel
+    releases however it exits, so a crashed daemon never leaves a stale
+    lock behind (a stale socket is replaced by the next daemon).
+    """
+
+    COMMANDS = (
+        "info",
+        "search",
+        "fulltext",
+        "fuzzy",
+        "query",
+        "refs",
+        "changes",
+        "keys",
+    )
+
+    def __init__(self, pepper_dir: pathlib.Path) -> None:
+        self.pepper_dir = pepper_dir
+        self.socket_path = pepper_dir.joinpath("daemon.sock")
+        self.lock_path = pepper_dir.joinpath("daemon.lock")
+        self.started = time.time()
+        self.served = 0
+        self.stopping = False
+        self._config = None
+        self._http = None
+        self._local_headers = {}
+        self._pep_indexes = {}
+
+    def is_running(self) -> bool:
+        """Whether a daemon holds the lock (it may still be starting up)."""
+        import fcntl
+
+        with suppress(FileNotFoundError), open(self.lock_path, "rb") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_SH | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return True
+        return False
+
+    def _lock(self):
+        """Take the daemon lock, returning its open file (or None if taken)."""
+        import fcntl
+
+        lock = open(self.lock_path, "a+")
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock.close()
+            return None
+        lock.truncate(0)
+        lock.write(str(os.getpid()))
+        lock.flush()
+        return lock
+
+    def _commands(self) -> Commands:
+        commands = Commands()
+        commands.__dict__["pepper_dir"] = self.pepper_dir
+        # state is kept between requests, as long as pepper.conf doesn't change
+        if commands.config != self._config:
+            if self._http is not None:
+                self._http.close()
+            self._config = commands.config
+            self._http = HttpCache(self.pepper_dir, self._config)
+            self._local_headers = {}
+            self._pep_indexes = {}
+        commands.__dict__["http"] = self._http
+        commands.local_headers = self._local_headers
+        commands.pep_indexes = self._pep_indexes
+        return commands
+
+    def handle(self, request: dict, stream) -> dict:
+        """
+        Answer `request`, returning the reply to end it with.
+
+        A command's output is written to `stream` (the client's connection)
+        while it runs.
+        """
+        import traceback
+
+        command = request.get("command")
+        if request.get("version") != __version__:
+            return {"error": f"daemon runs pepper {__version__}"}
+        if command == "ping":
+            return {"pid": os.getpid(), "uptime": time.time() - self.started}
+        if command == "shutdown":
+            self.stopping = True
+            return {"status": 0}
+        if command not in self.COMMANDS:
+            return {"error": f"unsupported command '{command}'"}
+
+        stdout = _DaemonOutput(stream, "stdout")
+        stderr = _DaemonOutput(stream, "stderr", buffered=False)
+        saved = sys.stdout, sys.stderr, os.environ.get("COLUMNS")
+        sys.stdout, sys.stderr = stdout, stderr
+        os.environ["COLUMNS"] = str(request.get("columns") or 80)
+        status = 0
+        try:
+            # in here, so that a pepper.conf it can't read is reported like
+            # any other error (with stdout and stderr restored after it)
+            commands = self._commands()
+            commands.run_cmd(command, [str(arg) for arg in request.get("args", [])])
+        except SystemExit as exc:
+            status = exc.code if isinstance(exc.code, int) else 1
+        except BrokenPipeError:
+            status = 1  # the client stopped reading (i.e. `| head`)
+        except Exception:
+            with suppress(BrokenPipeError):
+                traceback.print_exc()
+            status = 1
+        finally:
+            try:
+                stdout.flush()
+            except BrokenPipeError:
+                status = 1
+            sys.stdout, sys.stderr = saved[:2]
+            if saved[2] is None:
+                del os.environ["COLUMNS"]
+            else:
+                os.environ["COLUMNS"] = saved[2]
+            if self._http is not None:
+                self._http.save()
+        self.served += 1
+        return {"status": status}
+
+    def serve(self, idle_timeout: float) -> None:
+        """Serve requests until shut down, or idle for `idle_timeout` seconds."""
+        import json
+        import signal
+        import socket
+
+        lock = self._lock()
+        if lock is None:
+            fatal_error("A pepper daemon is already running...")
+        with suppress(FileNotFoundError):
+            self.socket_path.unlink()  # left behind by a daemon that crashed
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(str(self.socket_path))
+        os.chmod(self.socket_path, stat.S_IRUSR | stat.S_IWUSR)
+        server.listen(16)
+        server.settimeout(idle_timeout or None)
+
+        def stop(*_):
+            self.stopping = True
+            server.close()  # wakes up accept()
+
+        signal.signal(signal.SIGTERM, stop)
+        try:
+            while not self.stopping:
+                try:
+                    connection, _ = server.accept()
+                except socket.timeout:
+                    break
+                except OSError:
+                    if self.stopping:
+                        break
+                    raise
+                with connection, connection.makefile("rwb") as stream:
+                    try:
+                        reply = self.handle(json.loads(stream.readline()), stream)
+                    except ValueError:
+                        reply = {"error": "malformed request"}
+                    with suppress(OSError):
+                        stream.write(json.dumps(reply).encode() + b"\n")
+        finally:
+            server.close()
+            with suppress(FileNotFoundError):
+                self.socket_path.unlink()
+            if self._http is not None:
+                self._http.close()
+            lock.close()
+
+
+def _daemon_request(
+    pepper_dir: pathlib.Path,
+    request: dict,
+    timeout: float = None,
+    stdout=None,
+    stderr=None,
+):
+    """
+    Send `request` to the pepper daemon and return its (final) reply.
+
+    Output the daemon sends while a command runs is written to `stdout`
+    and `stderr` as it arrives. Returns None when no daemon is running (or
+    it can't answer) before any output arrived, so the caller can run the
+    command itself.
+    """
+    socket_path = pepper_dir.joinpath("daemon.sock")
+    if not socket_path.exists():
+        return None
+
+    import json
+    import socket
+
+    request = dict(request, version=__version__)
+    outputs = {"stdout": stdout, "stderr": stderr}
+    written = False
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.settimeout(timeout)
+            client.connect(str(socket_path))
+            stream = client.makefile("rwb")
+            stream.write(json.dumps(request).encode() + b"\n")
+            stream.flush()
+        except OSError:
+            return None  # i.e. a socket left behind by a daemon that crashed
+        with stream:
+            while True:
+                try:
+                    reply = json.loads(stream.readline())
+                except (OSError, ValueError):
+                    if not written:
+                        return None
+                    # too late to run the command here instead
+                    if stderr is not None:
+                        stderr.write("pepper: lost the connection to the daemon\n")
+                    return {"status": 1}
+                if not outputs.keys() & reply.keys():
+                    return None if "error" in reply else reply
+                for name, text in reply.items():
+                    if outputs.get(name) is not None:
+                        outputs[name].write(text)
+                        outputs[name].flush()
+                written = True
+
+
+@contextmanager
+def _exit_on_broken_pipe():
+    try:
+        yield
+    except BrokenPipeError:
+        # whatever read the output has stopped (i.e. `| head`), so stop too,
+        # without Python failing to flush stdout again on the way out
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        raise SystemExit(1)
+
+
 def main():
-    if len(sys.argv) == 1:
+    args = sys.argv[1:]
+    trace = os.environ.get("PEPPER_TRACE", "")
+    if args and args[0].startswith("--trace"):
+        trace = args.pop(0).partition("=")[2] or "text"
+    if len(args) == 0:
         Commands().help()
         raise SystemExit(1)
+    if trace and trace != "0":
+        TRACE.enable(trace)
     os.umask(stat.S_IWGRP | stat.S_IWOTH)  # ensure umask is 022
+    if args[0] in PepperDaemon.COMMANDS and not TRACE.enabled:
+        with _exit_on_broken_pipe():
+            reply = _daemon_request(
+                pathlib.Path.home().joinpath(".pepper"),
+                {"command": args[0], "args": args[1:], "columns": _terminal_columns()},
+                timeout=60,
+                stdout=sys.stdout,
+                stderr=sys.stderr,
+            )
+        if reply is not None:
+            raise SystemExit(reply["status"])
     commands = Commands()
-    commands.run_cmd(sys.argv[1], sys.argv[2:])
+    try:
+        with _exit_on_broken_pipe():
+            commands.run_cmd(args[0], args[1:])
+    finally:
+        commands.close()
+        TRACE.summary()
@@ -0,0 +1,66 @@
+"""Shared fixtures for pepper's tests.
+
+Tests that need a server use the benchmarks' local stand-in for
+peps.python.org (benchmarks/server.py), serving benchmarks/fixtures/.
+"""
+
+import json
+import pathlib
+import shutil
+import sys
+import time
+
+import pytest
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT.joinpath("benchmarks")))
+
+from fixtures import FIXTURES_DIR  # noqa: E402
+from server import FixtureServer  # noqa: E402
+
+import pepper_cli  # noqa: E402
+
+PROXY_VARIABLES = ("http_proxy", "https_proxy", "no_proxy", "all_proxy")
+
+
+@pytest.fixture(autouse=True)
+def no_proxies(monkeypatch):
+    """Reach the local servers directly, whatever proxy the machine uses."""
+    for name in PROXY_VARIABLES:
+        monkeypatch.delenv(name, raising=False)
+        monkeypatch.delenv(name.upper(), raising=False)
+
+
+@pytest.fixture
+def fixture_server():
+    with FixtureServer() as server:
+        yield server
+
+
+@pytest.fixture(scope="session")
+def pep_zero():
+    """The fixture copy of PEP 0, parsed."""
+    return pepper_cli.PepZeroParser.parse(
+        FIXTURES_DIR.joinpath("pep-0000.html").read_bytes()
+    )
+
+
+@pytest.fixture
+def pepper_dir(tmp_path):
+    """A pepper directory whose offline docs are the fixture pages."""
+    site_dir = tmp_path.joinpath("peps", "peps-html")
+    site_dir.mkdir(parents=True)
+    for page in FIXTURES_DIR.glob("pep-*.html"):
+        shutil.copy(page, site_dir)
+    return tmp_path
+
+
+@pytest.fixture
+def index_dir(tmp_path, pep_zero):
+    """A pepper directory with a fresh PEP 0 index, so nothing is fetched."""
+    pepper_cli.PepIndex.write(tmp_path.joinpath("pep0-index.bin"), pep_zero)
+    tmp_path.joinpath("pep0-index.json").write_text(
+        json.dumps({"fetched": time.time(), "etag": None, "last_modified": None})
+    )
+    return tmp_path
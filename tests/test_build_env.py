@@ -0,0 +1,90 @@
+import venv
+
+import pytest
+
+import pepper_cli
+from pepper_cli import _build_env_fingerprint, _build_env_is_current, _create_build_env
+
+
+def _fake_env(env_dir, works: bool = True):
+    """A build environment whose python only passes the health check if `works`."""
+    bin_dir = env_dir.joinpath("bin")
+    bin_dir.mkdir(parents=True)
+    python = bin_dir.joinpath("python3")
+    python.write_text(f"#!/bin/sh\nexit {0 if works else 1}\n")
+    python.chmod(0o755)
+    env_dir.joinpath("pepper-fingerprint").write_text(_build_env_fingerprint())
+    return env_dir
+
+
+@pytest.fixture
+def pip_runs(monkeypatch):
+    """Create environments without running venv or pip, recording pip's runs."""
+    runs = []
+    monkeypatch.setattr(venv.EnvBuilder, "create", lambda self, env_dir: None)
+    monkeypatch.setattr(
+        pepper_cli, "_run_or_exit", lambda args, name: runs.append(args[1:])
+    )
+    return runs
+
+
+def test_fingerprint_follows_the_requirements(monkeypatch):
+    fingerprint = _build_env_fingerprint()
+    assert _build_env_fingerprint() == fingerprint
+    requirements = pepper_cli.BUILD_REQUIREMENTS[:-1] + ("docutils >= 0.21",)
+    monkeypatch.setattr(pepper_cli, "BUILD_REQUIREMENTS", requirements)
+    assert _build_env_fingerprint() != fingerprint
+
+
+def test_fingerprint_follows_the_interpreter(monkeypatch):
+    fingerprint = _build_env_fingerprint()
+    monkeypatch.setattr(pepper_cli.sys, "executable", "/usr/bin/python3.99")
+    assert _build_env_fingerprint() != fingerprint
+
+
+def test_is_current(tmp_path, monkeypatch):
+    assert not _build_env_is_current(tmp_path.joinpath("missing"))
+    env_dir = _fake_env(tmp_path.joinpath("env"))
+    assert _build_env_is_current(env_dir)
+    monkeypatch.setattr(pepper_cli, "BUILD_REQUIREMENTS", ("Sphinx",))
+    assert not _build_env_is_current(env_dir)
+
+
+def test_broken_env_is_not_current(tmp_path):
+    assert not _build_env_is_current(_fake_env(tmp_path, works=False))
+
+
+def test_current_env_is_reused(tmp_path, pip_runs, capsys):
+    env_dir = _fake_env(tmp_path.joinpath("env"))
+    _create_build_env(env_dir, {})
+    assert capsys.readouterr().out == "Reusing existing build environment...\n"
+    assert pip_runs == []
+
+
+def test_changed_requirements_rebuild_the_env(tmp_path, pip_runs, monkeypatch):
+    env_dir = _fake_env(tmp_path.joinpath("env"))
+    requirements = ("Sphinx >= 7",)
+    monkeypatch.setattr(pepper_cli, "BUILD_REQUIREMENTS", requirements)
+    _create_build_env(env_dir, {})
+    assert pip_runs == [["install", "-U", "Sphinx >= 7"]]
+    assert env_dir.joinpath("pepper-fingerprint").read_text() == (
+        _build_env_fingerprint()
+    )
+
+
+def test_wheel_cache(tmp_path, pip_runs):
+    wheel_cache = str(tmp_path.joinpath("wheels"))
+    requirements = list(pepper_cli.BUILD_REQUIREMENTS)
+    _create_build_env(tmp_path.joinpath("env"), {"WHEEL_CACHE": wheel_cache})
+    _create_build_env(
+        tmp_path.joinpath("offline"),
+        {"WHEEL_CACHE": wheel_cache, "USE_OFFLINE": "true"},
+    )
+    install = ["install", "--no-index", "--find-links", wheel_cache] + requirements
+    assert pip_runs == [
+        ["wheel", "--wheel-dir", wheel_cache, "--find-links", wheel_cache]
+        + requirements,
+        install,
+        # and offline, only what the cache already has
+        install,
+    ]
@@ -0,0 +1,125 @@
+import os
+
+import pytest
+
+from pepper_cli import BuildManifest
+
+
+@pytest.fixture
+def storage_dir(tmp_path):
+    """A checkout of the PEPs repository, with its current layout."""
+    source_dir = tmp_path.joinpath("git-ds", "peps")
+    source_dir.mkdir(parents=True)
+    source_dir.joinpath("conf.py").write_text("")
+    for number in (1, 8, 20):
+        source_dir.joinpath(f"pep-{number:04}.rst").write_text(f"PEP: {number}\n")
+    source_dir.joinpath("pep-0000.txt").write_text("PEP: 0\n")
+    return tmp_path
+
+
+def test_first_build_is_of_everything(storage_dir):
+    manifest = BuildManifest(storage_dir)
+    names = manifest.all_sources()
+    assert names == [
+        "peps/pep-0000.txt",
+        "peps/pep-0001.rst",
+        "peps/pep-0008.rst",
+        "peps/pep-0020.rst",
+    ]
+    assert manifest.outdated(names) == names
+    manifest.mark_built(names)
+    assert manifest.outdated(names) == []
+    # and it is remembered
+    assert BuildManifest(storage_dir).outdated(names) == []
+
+
+def test_changed_source(storage_dir):
+    manifest = BuildManifest(storage_dir)
+    manifest.mark_built(manifest.all_sources())
+    path = storage_dir.joinpath("git-ds", "peps", "pep-0008.rst")
+    path.write_text("PEP: 8\nTitle: Changed\n")
+    manifest = BuildManifest(storage_dir)
+    assert manifest.outdated(manifest.all_sources()) == ["peps/pep-0008.rst"]
+
+
+def test_touched_source_is_not_rebuilt(storage_dir):
+    # a checkout rewrites files it doesn't change; only their hash counts
+    manifest = BuildManifest(storage_dir)
+    manifest.mark_built(manifest.all_sources())
+    path = storage_dir.joinpath("git-ds", "peps", "pep-0008.rst")
+    path.write_text(path.read_text())
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**10))
+    manifest = BuildManifest(storage_dir)
+    assert manifest.outdated(manifest.all_sources()) == []
+
+
+def test_added_and_removed_sources(storage_dir):
+    manifest = BuildManifest(storage_dir)
+    manifest.mark_built(manifest.all_sources())
+    source_dir = storage_dir.joinpath("git-ds", "peps")
+    source_dir.joinpath("pep-0020.rst").unlink()
+    source_dir.joinpath("pep-0484.rst").write_text("PEP: 484\n")
+    changed = ["peps/pep-0020.rst", "peps/pep-0484.rst"]
+    assert manifest.outdated(changed + ["peps/pep-0001.rst"]) == changed
+    manifest.mark_built(changed)
+    assert "peps/pep-0020.rst" not in manifest.sources
+    assert manifest.outdated(changed) == []
+
+
+def test_pending_is_kept_until_built(storage_dir):
+    manifest = BuildManifest(storage_dir)
+    manifest.pending = ["peps/pep-0008.rst"]
+    manifest.save()
+    # an interrupted build leaves it to the next one
+    manifest = BuildManifest(storage_dir)
+    assert manifest.pending == ["peps/pep-0008.rst"]
+    manifest.mark_built(manifest.pending)
+    assert BuildManifest(storage_dir).pending == []
+
+
+def test_unreadable_manifest_is_a_fresh_start(storage_dir):
+    storage_dir.joinpath("build-manifest.json").write_text("{not json")
+    manifest = BuildManifest(storage_dir)
+    assert (manifest.sources, manifest.pending) == ({}, [])
+
+
+def test_is_source(storage_dir):
+    manifest = BuildManifest(storage_dir)
+    assert manifest.is_source("peps/pep-0008.rst")
+    assert manifest.is_source("peps/pep-9999.txt")
+    assert not manifest.is_source("peps/conf.py")
+    assert not manifest.is_source("pep-0008.rst")
+    assert not manifest.is_source("peps/topic/pep-0008.rst")
+
+
+def test_old_repository_layout(tmp_path):
+    repo_dir = tmp_path.joinpath("git-ds")
+    repo_dir.mkdir()
+    repo_dir.joinpath("pep-0008.txt").write_text("PEP: 8\n")
+    manifest = BuildManifest(tmp_path)
+    assert manifest.all_sources() == ["pep-0008.txt"]
+    assert manifest.is_source("pep-0008.txt")
+
+
+def test_index_pages_and_removed_outputs(storage_dir):
+    manifest = BuildManifest(storage_dir)
+    build_dir = manifest.build_dir
+    build_dir.joinpath("topic").mkdir(parents=True)
+    build_dir.joinpath(".doctrees").mkdir()
+    for page in ("pep-0000.html", "numerical.html", "topic/packaging.html"):
+        build_dir.joinpath(page).write_text("")
+    for source in ("numerical.rst", "topic/packaging.rst"):
+        manifest.source_dir.joinpath(source).parent.mkdir(exist_ok=True)
+        manifest.source_dir.joinpath(source).write_text("")
+    # (pep-0000.rst isn't there: the index page is made from pep-0000.txt)
+    assert manifest.index_pages() == ["peps/numerical.rst", "peps/topic/packaging.rst"]
+
+    for path in ("pep-0020.html", "pep-0020.html.gz", ".doctrees/pep-0020.doctree"):
+        build_dir.joinpath(path).write_text("")
+    manifest.remove_outputs(["peps/pep-0020.rst"])
+    assert sorted(
+        path.relative_to(build_dir).as_posix()
+        for path in build_dir.rglob("*")
+        if path.is_file()
+    ) == ["numerical.html", "pep-0000.html", "topic/packaging.html"]
@@ -0,0 +1,174 @@
+import io
+import json
+import os
+import socket
+import stat
+import subprocess
+import sys
+import time
+
+import pytest
+
+import pepper_cli
+from conftest import ROOT
+from pepper_cli import Commands, PepIndex, PepperDaemon, _daemon_request
+
+SEARCH = {"command": "search", "args": ["title", "python"], "columns": 80}
+
+
+def _start(pepper_dir):
+    return subprocess.Popen(
+        [
+            sys.executable,
+            "-c",
+            "import pathlib, sys, pepper_cli; "
+            "pepper_cli.PepperDaemon(pathlib.Path(sys.argv[1])).serve(30)",
+            str(pepper_dir),
+        ],
+        cwd=ROOT,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+
+
+@pytest.fixture
+def daemon(index_dir):
+    process = _start(index_dir)
+    for _ in range(100):
+        if _daemon_request(index_dir, {"command": "ping"}, 1):
+            break
+        time.sleep(0.05)
+    else:
+        process.kill()
+        pytest.fail("the daemon didn't start")
+    yield process
+    if process.poll() is None:
+        _daemon_request(index_dir, {"command": "shutdown"}, 5)
+        process.wait(5)
+
+
+def _run_in_process(pepper_dir, capsys, command, args):
+    commands = Commands()
+    commands.__dict__["pepper_dir"] = pepper_dir
+    try:
+        status = commands.run_cmd(command, args)
+    except SystemExit as exc:
+        status = exc.code
+    return status, capsys.readouterr()
+
+
+def _handle(daemon, request) -> tuple:
+    """Have `daemon` answer `request`, returning the lines sent and the reply."""
+    stream = io.BytesIO()
+    reply = daemon.handle(dict(request, version=pepper_cli.__version__), stream)
+    return [json.loads(line) for line in stream.getvalue().splitlines()], reply
+
+
+def test_start_up_and_lock(index_dir, daemon):
+    socket_path = index_dir.joinpath("daemon.sock")
+    assert stat.S_IMODE(socket_path.stat().st_mode) == 0o600
+    assert PepperDaemon(index_dir).is_running()
+    assert index_dir.joinpath("daemon.lock").read_text() == str(daemon.pid)
+
+    # a second daemon for the same directory refuses to start
+    second = _start(index_dir)
+    assert second.wait(10) == 1
+    assert "already running" in second.stderr.read()
+    second.stderr.close()
+    assert _daemon_request(index_dir, {"command": "ping"}, 5)["pid"] == daemon.pid
+
+    assert _daemon_request(index_dir, {"command": "shutdown"}, 5) == {"status": 0}
+    assert daemon.wait(5) == 0
+    daemon.stderr.close()
+    assert not PepperDaemon(index_dir).is_running()
+    assert not socket_path.exists()
+
+
+def test_round_trip(index_dir, daemon, capsys):
+    stdout, stderr = io.StringIO(), io.StringIO()
+    reply = _daemon_request(index_dir, SEARCH, 5, stdout, stderr)
+    daemon.stderr.close()
+    status, captured = _run_in_process(index_dir, capsys, "search", SEARCH["args"])
+    assert reply == {"status": status}
+    assert captured.out and stdout.getvalue() == captured.out
+    assert stderr.getvalue() == captured.err
+
+
+def test_stale_socket_falls_back_to_running_in_process(
+    tmp_path_factory, index_dir, monkeypatch, capsys
+):
+    # as left behind by a daemon that was killed: nothing is listening
+    home = tmp_path_factory.mktemp("home")
+    home.joinpath(".pepper").symlink_to(index_dir)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stale:
+        stale.bind(str(index_dir.joinpath("daemon.sock")))
+    assert _daemon_request(index_dir, SEARCH, 5, io.StringIO()) is None
+
+    monkeypatch.setenv("HOME", str(home))
+    monkeypatch.delenv("PEPPER_TRACE", raising=False)
+    monkeypatch.setattr(sys, "argv", ["pepper", "search", *SEARCH["args"]])
+    with pytest.raises(SystemExit) as exc_info:
+        pepper_cli.main()
+    captured = capsys.readouterr()
+    status, expected = _run_in_process(index_dir, capsys, "search", SEARCH["args"])
+    assert exc_info.value.code == status
+    assert captured.out and captured.out == expected.out
+
+
+def test_output_is_streamed_as_it_is_written(index_dir):
+    daemon = PepperDaemon(index_dir)
+    args = ["--format=jsonl", "title", "python", "nosuchtitle"]
+    request = {"command": "search", "args": args}
+    lines, reply = _handle(daemon, request)
+    assert reply == {"status": 1}
+    # the results were flushed before the unmatched query was reported
+    assert [list(line) for line in lines] == [["stdout"], ["stderr"]]
+    records = [json.loads(record) for record in lines[0]["stdout"].splitlines()]
+    assert records and all(record["query"] == "python" for record in records)
+    assert "nosuchtitle" in lines[1]["stderr"]
+
+
+def test_output_buffering():
+    stream = io.BytesIO()
+    stdout = pepper_cli._DaemonOutput(stream, "stdout")
+    stdout.write("one\n")
+    stdout.write("two\n")
+    assert stream.getvalue() == b""
+    stdout.flush()
+    stdout.write("x" * pepper_cli._DaemonOutput.BUFFER_SIZE)
+    stderr = pepper_cli._DaemonOutput(stream, "stderr", buffered=False)
+    stderr.write("oops\n")
+    assert [json.loads(line) for line in stream.getvalue().splitlines()] == [
+        {"stdout": "one\ntwo\n"},
+        {"stdout": "x" * pepper_cli._DaemonOutput.BUFFER_SIZE},
+        {"stderr": "oops\n"},
+    ]
+
+
+def test_client_going_away(index_dir):
+    class HungUp(io.BytesIO):
+        def write(self, data):
+            raise BrokenPipeError
+
+    daemon = PepperDaemon(index_dir)
+    request = dict(SEARCH, version=pepper_cli.__version__)
+    assert daemon.handle(request, HungUp()) == {"status": 1}
+    assert not isinstance(sys.stdout, pepper_cli._DaemonOutput)
+    assert not isinstance(sys.stderr, pepper_cli._DaemonOutput)
+
+
+def test_index_is_kept_open_between_requests(index_dir, pep_zero):
+    daemon = PepperDaemon(index_dir)
+    _handle(daemon, SEARCH)
+    (index,) = [index for _, index in daemon._pep_indexes.values()]
+    _handle(daemon, SEARCH)
+    assert [index for _, index in daemon._pep_indexes.values()] == [index]
+
+    # until the index is replaced, i.e. by a refresh in another process
+    path = index_dir.joinpath("pep0-index.bin")
+    tmp_path = path.with_suffix(".new")
+    PepIndex.write(tmp_path, pep_zero[:10])
+    os.replace(tmp_path, path)
+    lines, _ = _handle(daemon, {"command": "search", "args": ["number:0-9999"]})
+    (new_index,) = [index for _, index in daemon._pep_indexes.values()]
+    assert new_index is not index and len(new_index) == 10
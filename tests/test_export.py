@@ -0,0 +1,111 @@
+import json
+import sqlite3
+
+import pytest
+
+from fixtures import FIXTURES_DIR
+from pepper_cli import (
+    Commands,
+    JsonLinesExporter,
+    SqliteExporter,
+    _export_record,
+    _read_local_pep_info,
+)
+
+
+@pytest.fixture(scope="module")
+def records():
+    """The records exported from the fixture pages, in PEP order."""
+    return [
+        _export_record(_read_local_pep_info(path))
+        for path in sorted(FIXTURES_DIR.glob("pep-*.html"))
+        if path.name != "pep-0000.html"
+    ]
+
+
+def _export(pepper_dir, *args) -> int:
+    commands = Commands()
+    commands.__dict__["pepper_dir"] = pepper_dir
+    with pytest.raises(SystemExit) as exc_info:
+        commands.run_cmd("export", list(args))
+    return exc_info.value.code
+
+
+def test_jsonl_round_trip(pepper_dir, records, capsys):
+    output = pepper_dir.joinpath("peps.jsonl")
+    assert _export(pepper_dir, "jsonl", str(output)) == 0
+    assert f"Exported {len(records)} PEPs to '{output}'" in capsys.readouterr().err
+    lines = output.read_text("utf-8").splitlines()
+    assert [json.loads(line) for line in lines] == records
+    assert not output.with_name("peps.jsonl.tmp").exists()
+
+
+def test_jsonl_to_stdout(pepper_dir, records, capsys):
+    assert _export(pepper_dir, "jsonl") == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert [json.loads(line) for line in lines] == records
+
+
+def test_sqlite_round_trip(pepper_dir, records):
+    output = pepper_dir.joinpath("peps.db")
+    assert _export(pepper_dir, "sqlite", str(output)) == 0
+    db = sqlite3.connect(output)
+    rows = db.execute("SELECT * FROM peps ORDER BY number").fetchall()
+    assert len(rows) == len(records)
+    for row, record in zip(rows, records):
+        number, title, status, pep_type, created, python_version, header = row
+        assert {"number": number, "title": title, **json.loads(header)} == record
+        assert (status, pep_type, created, python_version) == (
+            record.get("Status"),
+            record.get("Type"),
+            record.get("Created"),
+            record.get("Python-Version"),
+        )
+
+    # list fields have a row per entry, in order
+    pep_8 = next(record for record in records if record["number"] == 8)
+    history = db.execute(
+        "SELECT value FROM fields WHERE number = 8 AND name = 'Post-History'"
+        " ORDER BY position"
+    ).fetchall()
+    assert [value for value, in history] == pep_8["Post-History"]
+    (processes,) = db.execute(
+        "SELECT count(*) FROM peps WHERE type = 'Process'"
+    ).fetchone()
+    assert processes == sum(record.get("Type") == "Process" for record in records)
+    (fields,) = db.execute("SELECT count(*) FROM fields").fetchone()
+    assert fields == sum(
+        len(value) if isinstance(value, list) else 1
+        for record in records
+        for key, value in record.items()
+        if key not in ("number", "title")
+    )
+    db.close()
+
+
+def test_sqlite_replaces_an_earlier_export(tmp_path, records):
+    output = str(tmp_path.joinpath("peps.db"))
+    for batch in (records, records[:2]):
+        exporter = SqliteExporter(output)
+        for record in batch:
+            exporter.write(record)
+        exporter.close()
+    db = sqlite3.connect(output)
+    assert db.execute("SELECT number FROM peps").fetchall() == [
+        (record["number"],) for record in records[:2]
+    ]
+    db.close()
+
+
+@pytest.mark.parametrize("exporter_class", [JsonLinesExporter, SqliteExporter])
+def test_abort_leaves_nothing_behind(tmp_path, records, exporter_class):
+    output = tmp_path.joinpath("peps.out")
+    exporter = exporter_class(str(output))
+    exporter.write(records[0])
+    exporter.abort()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_sqlite_needs_a_file(pepper_dir, capsys):
+    assert _export(pepper_dir, "sqlite") == 1
+    assert "An output file is needed" in capsys.readouterr().err
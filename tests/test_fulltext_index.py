@@ -0,0 +1,45 @@
+import pytest
+
+from fixtures import FIXTURES_DIR
+from pepper_cli import FullTextIndex, PepTextParser, _local_pep_paths
+
+
+@pytest.fixture
+def fulltext(pepper_dir):
+    path = pepper_dir.joinpath("fulltext-index.bin")
+    FullTextIndex.build(path, _local_pep_paths(pepper_dir, prefer="html"))
+    index = FullTextIndex(path)
+    yield index
+    index.close()
+
+
+def test_fulltext_round_trip(fulltext):
+    pages = sorted(FIXTURES_DIR.glob("pep-*.html"))[1:]  # without PEP 0
+    assert fulltext._doc_count == len(pages)
+    for doc, page in enumerate(pages):
+        number, _, title, _ = fulltext.document(doc)
+        assert number == int(page.stem[4:])
+        assert (title, fulltext.text(doc)) == PepTextParser.parse(page.read_bytes())
+
+
+def test_fulltext_terms_are_sorted(fulltext):
+    terms = [fulltext.term(position) for position in range(fulltext._term_count)]
+    assert terms == sorted(terms)
+
+
+def test_fulltext_search(fulltext):
+    for doc in range(fulltext._doc_count):
+        number, _, title, _ = fulltext.document(doc)
+        results = fulltext.search(title)
+        assert results[0][1] == number
+        assert results == sorted(results, key=lambda result: -result[0])
+    assert fulltext.search("nosuchwordanywhere") == []
+
+
+def test_fulltext_prefix_search(fulltext):
+    term = fulltext.term(0)
+    assert fulltext.expand(term) == [0]
+    matches = fulltext.expand(term[:2] + "*")
+    assert 0 in matches
+    assert all(fulltext.term(position).startswith(term[:2]) for position in matches)
+    assert fulltext.search(term[:2] + "*")
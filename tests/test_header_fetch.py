@@ -0,0 +1,104 @@
+import threading
+
+import pytest
+
+from fixtures import FIXTURES_DIR
+from pepper_cli import (
+    HEADER_RANGE_SIZE,
+    ConnectionPool,
+    PepFileHeaderParser,
+    RangeReader,
+)
+from server import FixtureHandler, FixtureHTTPServer
+
+
+class CountingHandler(FixtureHandler):
+    """Record every connection made, and the size of every body sent."""
+
+    honour_range = True
+    connections = []
+    sent = []
+
+    def setup(self) -> None:
+        super().setup()
+        self.connections.append(self.client_address)
+
+    def do_GET(self, head: bool = False) -> None:
+        if not self.honour_range:
+            del self.headers["Range"]
+        super().do_GET(head)
+
+    def send_header(self, keyword: str, value: str) -> None:
+        if keyword == "Content-Length":
+            self.sent.append(int(value))
+        super().send_header(keyword, value)
+
+
+class CountingReader:
+    """Pass reads through to `stream`, counting the bytes they return."""
+
+    def __init__(self, stream) -> None:
+        self.stream = stream
+        self.received = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.stream.read(size)
+        self.received += len(data)
+        return data
+
+    def close(self) -> None:
+        self.stream.close()
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def serve(honour_range=True):
+        attrs = {"honour_range": honour_range, "connections": [], "sent": []}
+        handler = type("Handler", (CountingHandler,), attrs)
+        httpd = FixtureHTTPServer(("127.0.0.1", 0), handler)
+        httpd.url_base = f"http://127.0.0.1:{httpd.server_port}/pep-"
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        servers.append(httpd)
+        return httpd
+
+    yield serve
+    for httpd in servers:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+@pytest.fixture
+def pool():
+    pool = ConnectionPool(timeout=5)
+    yield pool
+    pool.close()
+
+
+@pytest.mark.parametrize("range_size", [1024, HEADER_RANGE_SIZE])
+def test_header_only_fetch(serve, pool, range_size):
+    server = serve()
+    page = FIXTURES_DIR.joinpath("pep-0008.html").read_bytes()
+    reader = CountingReader(RangeReader(pool, server.url_base + "0008", range_size))
+    assert PepFileHeaderParser.parse_stream(reader) == PepFileHeaderParser.parse(page)
+
+    # pieces are only asked for until the one the header ends in
+    header_end = page.index(b"</dl>") + len(b"</dl>")
+    pieces = (header_end - 1) // range_size + 1
+    assert server.RequestHandlerClass.sent == [range_size] * pieces
+    assert header_end <= reader.received <= pieces * range_size < len(page)
+
+
+def test_header_fetch_from_server_ignoring_range(serve, pool):
+    server = serve(honour_range=False)
+    page = FIXTURES_DIR.joinpath("pep-0008.html").read_bytes()
+    reader = CountingReader(RangeReader(pool, server.url_base + "0008", 1024))
+    assert PepFileHeaderParser.parse_stream(reader) == PepFileHeaderParser.parse(page)
+
+    # the whole page is sent at once, but reading stops after the header
+    assert server.RequestHandlerClass.sent == [len(page)]
+    assert reader.received < len(page) // 4
+    # and the connection, with the rest of the page unread, is dropped
+    pool.request(server.url_base + "0020").read()
+    assert len(server.RequestHandlerClass.connections) == 2
@@ -0,0 +1,99 @@
+import os
+import threading
+import time
+
+import pytest
+
+from fixtures import FIXTURES_DIR
+from pepper_cli import HttpCache
+from server import FixtureHandler, FixtureHTTPServer
+
+
+@pytest.fixture
+def upstream(tmp_path):
+    """A fixture server whose pages can be changed, in `pages_dir`."""
+    pages_dir = tmp_path.joinpath("upstream")
+    pages_dir.mkdir()
+    handler = type("Handler", (FixtureHandler,), {"fixtures_dir": pages_dir})
+    httpd = FixtureHTTPServer(("127.0.0.1", 0), handler)
+    httpd.pages_dir = pages_dir
+    httpd.url_base = f"http://127.0.0.1:{httpd.server_port}/pep-"
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _read_all(reader, size=-1) -> bytes:
+    data = b""
+    while True:
+        chunk = reader.read(size)
+        if not chunk:
+            return data
+        data += chunk
+
+
+def _read(pepper_dir, url, size=-1, count=None) -> bytes:
+    cache = HttpCache(pepper_dir, {})
+    reader = cache.open(url, 4096)
+    data = _read_all(reader, size) if count is None else reader.read(count)
+    reader.close()
+    cache.close()
+    return data
+
+
+def test_body_is_cached(tmp_path, fixture_server):
+    url = fixture_server.url_base + "0008"
+    page = FIXTURES_DIR.joinpath("pep-0008.html").read_bytes()
+    assert _read(tmp_path, url) == page
+    cache = HttpCache(tmp_path, {})
+    assert cache.entries[url]["size"] == len(page)
+    cache.close()
+
+
+def test_rest_of_cached_prefix(tmp_path, fixture_server):
+    url = fixture_server.url_base + "0484"
+    page = FIXTURES_DIR.joinpath("pep-0484.html").read_bytes()
+    assert _read(tmp_path, url, count=1000) == page[:1000]
+    assert _read(tmp_path, url, size=1000) == page
+    assert _read(tmp_path, url) == page
+
+
+def test_changed_body_replaces_cached_prefix(tmp_path, upstream):
+    page = upstream.pages_dir.joinpath("pep-0008.html")
+    old = FIXTURES_DIR.joinpath("pep-0008.html").read_bytes()
+    page.write_bytes(old)
+    url = upstream.url_base + "0008"
+    pepper_dir = tmp_path.joinpath("pepper")
+    pepper_dir.mkdir()
+    assert _read(pepper_dir, url, count=1000) == old[:1000]
+
+    new = FIXTURES_DIR.joinpath("pep-0484.html").read_bytes()
+    assert new[:1000] != old[:1000]
+    page.write_bytes(new)
+    _read(pepper_dir, url)
+    cache = HttpCache(pepper_dir, {})
+    reader = cache.open(url, 4096)
+    assert _read_all(reader) == new  # not the old prefix with the rest appended
+    reader.close()
+    cache.close()
+
+
+def test_orphaned_bodies_are_swept(tmp_path, fixture_server):
+    url = fixture_server.url_base + "0008"
+    _read(tmp_path, url)
+    objects = tmp_path.joinpath("http-cache", "objects")
+    orphans = [objects.joinpath("ff", "0" * 62), objects.joinpath("ff", "1" * 62)]
+    orphans[0].parent.mkdir(exist_ok=True)
+    for orphan in orphans:
+        orphan.write_bytes(b"left by a process that never saved")
+    old = time.time() - HttpCache.ORPHAN_AGE - 60
+    os.utime(orphans[0], (old, old))  # the other may still be about to be saved
+
+    tmp_path.joinpath("http-cache", "swept").unlink()
+    _read(tmp_path, fixture_server.url_base + "0020")
+    assert not orphans[0].exists() and orphans[1].exists()
+    cache = HttpCache(tmp_path, {})
+    for entry in cache.entries.values():
+        assert cache._blob_path(entry["blob"]).exists()
+    cache.close()
@@ -0,0 +1,83 @@
+import datetime
+
+import pytest
+
+from pepper_cli import (
+    MetadataQuery,
+    MetadataStore,
+    QuerySyntaxError,
+    _export_local_peps,
+    _local_pep_paths,
+)
+
+
+@pytest.fixture
+def records(pepper_dir):
+    results = _export_local_peps(_local_pep_paths(pepper_dir))
+    assert all(error is None for _, _, error in results)
+    return [record for _, record, _ in results]
+
+
+@pytest.fixture
+def store(pepper_dir, records):
+    store = MetadataStore(pepper_dir)
+    assert store.build(records, "test") == len(records)
+    return store
+
+
+def _created(record):
+    return datetime.datetime.strptime(record["Created"], "%d-%b-%Y").date()
+
+
+def _version(record):
+    return tuple(map(int, record["Python-Version"].split(".")))
+
+
+METADATA_QUERIES = {
+    "status=Final": lambda record: record["Status"] == "Final",
+    "type:S": lambda record: record["Type"] == "Standards Track",
+    "author:cannon": lambda record: any(
+        "cannon" in x.lower() for x in record["Author"]
+    ),
+    "number>=500": lambda record: record["number"] >= 500,
+    "number<20": lambda record: record["number"] < 20,
+    "created>2010": lambda record: _created(record).year > 2010,
+    "created:2008": lambda record: _created(record).year == 2008,
+    "python-version>=3.8": lambda record: _version(record) >= (3, 8),
+    "python-version:3": lambda record: _version(record)[0] == 3,
+    "discussions-to:discuss.python.org": lambda record: "discuss.python.org"
+    in record["Discussions-To"],
+    "NOT type:S OR created<2005": lambda record: record["Type"] != "Standards Track"
+    or _created(record).year < 2005,
+}
+
+
+@pytest.mark.parametrize("query", METADATA_QUERIES)
+def test_metadata_query(query, store, records):
+    expected = sorted(
+        record["number"] for record in records if METADATA_QUERIES[query](record)
+    )
+    assert [pep["number"] for pep in store.query(MetadataQuery(query))] == expected
+
+
+def test_metadata_store_round_trip(store, records):
+    by_number = {
+        pep["number"]: pep for pep in store.query(MetadataQuery("number:0-9999"))
+    }
+    assert sorted(by_number) == sorted(record["number"] for record in records)
+    for record in records:
+        pep = by_number[record["number"]]
+        assert pep["title"] == record["title"]
+        assert pep["header"] == {
+            key: value
+            for key, value in record.items()
+            if key not in ("number", "title")
+        }
+
+
+@pytest.mark.parametrize(
+    "query", ["title>foo", "created:yesterday", "python-version:three", "status:nope"]
+)
+def test_metadata_query_syntax_errors(query):
+    with pytest.raises(QuerySyntaxError):
+        MetadataQuery(query)
@@ -0,0 +1,92 @@
+import hashlib
+import threading
+
+import pytest
+
+from fixtures import FIXTURES_DIR
+from pepper_cli import ConnectionPool, _mirror_assets, _mirror_file
+from server import FixtureHandler, FixtureHTTPServer
+
+
+@pytest.fixture
+def pool():
+    pool = ConnectionPool(timeout=5)
+    yield pool
+    pool.close()
+
+
+def _mirror(pool, site_dir, url, known=None):
+    return _mirror_file(pool, site_dir, "pep-0008.html", url, known)
+
+
+def test_mirror_page(tmp_path, pool, fixture_server):
+    url = fixture_server.url_base + "0008/"
+    name, record, changed, error = _mirror(pool, tmp_path, url)
+    assert (name, changed, error) == ("pep-0008.html", True, None)
+
+    data = tmp_path.joinpath("pep-0008.html").read_bytes()
+    assert record["sha256"] == hashlib.sha256(data).hexdigest()
+    assert record["size"] == len(data) and record["etag"]
+    # links to other PEPs point at the pages the mirror saves, the rest is as is
+    upstream = FIXTURES_DIR.joinpath("pep-0008.html").read_bytes()
+    assert b'href="../pep-' in upstream
+    assert b'href="../pep-' not in data and b'href="pep-0000.html"' in data
+    assert _mirror_assets(url, data) == _mirror_assets(url, upstream)
+    assert "_static/style.css" in _mirror_assets(url, data)
+
+
+def test_mirror_unchanged_page(tmp_path, pool, fixture_server):
+    url = fixture_server.url_base + "0008/"
+    _, record, _, _ = _mirror(pool, tmp_path, url)
+    assert _mirror(pool, tmp_path, url, record) == (
+        "pep-0008.html",
+        record,
+        False,
+        None,
+    )
+
+
+def test_mirror_refetches_pages_with_upstream_links(tmp_path, pool, fixture_server):
+    url = fixture_server.url_base + "0008/"
+    upstream = FIXTURES_DIR.joinpath("pep-0008.html").read_bytes()
+    _, record, _, _ = _mirror(pool, tmp_path, url)
+    # as saved (and recorded) before links were rewritten
+    known = dict(record, sha256=hashlib.sha256(upstream).hexdigest())
+    tmp_path.joinpath("pep-0008.html").write_bytes(upstream)
+    _, _, changed, error = _mirror(pool, tmp_path, url, known)
+    assert (changed, error) == (True, None)
+    assert b'href="../pep-' not in tmp_path.joinpath("pep-0008.html").read_bytes()
+
+
+def test_mirror_missing_page(tmp_path, pool, fixture_server):
+    url = fixture_server.url_base + "9999/"
+    assert _mirror(pool, tmp_path, url) == (
+        "pep-0008.html",
+        None,
+        False,
+        "HTTP error 404",
+    )
+    assert not tmp_path.joinpath("pep-0008.html").exists()
+
+
+def test_mirror_incomplete_page(tmp_path, pool):
+    pages_dir = tmp_path.joinpath("upstream")
+    pages_dir.mkdir()
+    page = FIXTURES_DIR.joinpath("pep-0008.html").read_bytes()
+    pages_dir.joinpath("pep-0008.html").write_bytes(page[: len(page) // 2])
+    handler = type("Handler", (FixtureHandler,), {"fixtures_dir": pages_dir})
+    httpd = FixtureHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    try:
+        url = f"http://127.0.0.1:{httpd.server_port}/pep-0008/"
+        site_dir = tmp_path.joinpath("site")
+        assert _mirror(pool, site_dir, url) == (
+            "pep-0008.html",
+            None,
+            False,
+            "incomplete page",
+        )
+        assert not site_dir.joinpath("pep-0008.html").exists()
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
@@ -0,0 +1,137 @@
+import csv
+import io
+import json
+import sys
+import threading
+
+import pytest
+
+from fixtures import FIXTURES_DIR
+from pepper_cli import Commands, PepFileHeaderParser, RecordWriter, _export_record
+
+
+class RecordingStdout(io.StringIO):
+    """A stdout that keeps what had been written at each flush."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.flushes = []
+        self.flushed = threading.Event()
+
+    def flush(self) -> None:
+        self.flushes.append(self.getvalue())
+        self.flushed.set()
+
+
+def _record_stdout(monkeypatch) -> RecordingStdout:
+    # set in the test itself, as pytest puts its own back after fixtures run
+    stdout = RecordingStdout()
+    monkeypatch.setattr(sys, "stdout", stdout)
+    return stdout
+
+
+def _run(pepper_dir, command, *args) -> int:
+    commands = Commands()
+    commands.__dict__["pepper_dir"] = pepper_dir
+    with pytest.raises(SystemExit) as exc_info:
+        commands.run_cmd(command, list(args))
+    return exc_info.value.code
+
+
+def _searched(pep) -> list:
+    return [
+        str(pep["number"]),
+        pep["type"],
+        pep["status"],
+        pep["title"],
+        ", ".join(pep["authors"]),
+    ]
+
+
+def test_jsonl(monkeypatch, pep_zero):
+    stdout = _record_stdout(monkeypatch)
+    writer = RecordWriter("jsonl", RecordWriter.SEARCH_COLUMNS)
+    for pep in pep_zero:
+        writer.write(pep)
+    writer.write({"number": 1, "authors": ["Łukasz Langa"]})
+    records = [json.loads(line) for line in stdout.getvalue().splitlines()]
+    assert records[:-1] == pep_zero
+    # written as is, not escaped
+    assert stdout.getvalue().endswith('{"number": 1, "authors": ["Łukasz Langa"]}\n')
+
+
+def test_csv(monkeypatch, pep_zero):
+    stdout = _record_stdout(monkeypatch)
+    writer = RecordWriter("csv", RecordWriter.SEARCH_COLUMNS)
+    for pep in pep_zero:
+        writer.write(pep)
+    rows = list(csv.reader(io.StringIO(stdout.getvalue())))
+    assert rows[0] == list(RecordWriter.SEARCH_COLUMNS)
+    assert rows[1:] == [_searched(pep) for pep in pep_zero]
+
+
+def test_tsv(monkeypatch, pep_zero):
+    stdout = _record_stdout(monkeypatch)
+    writer = RecordWriter("tsv", RecordWriter.SEARCH_COLUMNS)
+    for pep in pep_zero:
+        writer.write(pep)
+    writer.write(dict(pep_zero[0], title="Tabs\tand\nnewlines"))
+    lines = stdout.getvalue().split("\n")
+    assert lines.pop() == ""
+    assert lines[0] == "\t".join(RecordWriter.SEARCH_COLUMNS)
+    assert [line.split("\t") for line in lines[1:-1]] == [
+        _searched(pep) for pep in pep_zero
+    ]
+    assert lines[-1].split("\t")[3] == "Tabs and newlines"
+
+
+def test_missing_and_list_values(monkeypatch):
+    stdout = _record_stdout(monkeypatch)
+    writer = RecordWriter("csv", RecordWriter.INFO_COLUMNS)
+    writer.write({"number": 8, "title": "T", "Author": ["A", "B"], "url": "u"})
+    row = list(csv.reader(io.StringIO(stdout.getvalue())))[1]
+    assert row == ["8", "T", "A, B", "", "", "", "", "", "", "", "", "u"]
+
+
+def test_records_are_not_flushed_one_by_one(monkeypatch, pep_zero):
+    stdout = _record_stdout(monkeypatch)
+    writer = RecordWriter("jsonl", RecordWriter.SEARCH_COLUMNS)
+    for pep in pep_zero:
+        writer.write(pep)
+    assert stdout.flushes == []
+
+
+@pytest.mark.parametrize("fmt", RecordWriter.FORMATS)
+def test_search_flushes_once(monkeypatch, index_dir, pep_zero, fmt):
+    stdout = _record_stdout(monkeypatch)
+    assert _run(index_dir, "search", f"--format={fmt}", "type:S") == 0
+    expected = [pep for pep in pep_zero if pep["type"] == "Standards Track"]
+    assert stdout.flushes == [stdout.getvalue()]
+    lines = stdout.getvalue().splitlines()
+    if fmt == "jsonl":
+        assert [json.loads(line) for line in lines] == expected
+    else:
+        assert len(lines) == len(expected) + 1
+
+
+def test_info_flushes_while_the_next_pep_is_fetched(tmp_path, monkeypatch):
+    stdout = _record_stdout(monkeypatch)
+    pages = {
+        pep_id: PepFileHeaderParser.parse(
+            FIXTURES_DIR.joinpath(f"pep-{pep_id:0>4}.html").read_bytes()
+        )
+        for pep_id in ("8", "20")
+    }
+
+    def fetch(self, pep_id):
+        if pep_id == "20":
+            # not ready until what came before has been written out
+            assert stdout.flushed.wait(5)
+        return pages[pep_id]
+
+    monkeypatch.setattr(Commands, "_fetch_pep_info", fetch)
+    assert _run(tmp_path, "info", "--format=jsonl", "8", "20") == 0
+    records = [json.loads(line) for line in stdout.getvalue().splitlines()]
+    assert [record["number"] for record in records] == [8, 20]
+    assert records[0] == {**_export_record(pages["8"]), "url": records[0]["url"]}
+    assert [len(flushed.splitlines()) for flushed in stdout.flushes] == [1, 2]
@@ -0,0 +1,42 @@
+import pytest
+
+from pepper_cli import PepIndex
+
+
+def test_round_trip(tmp_path, pep_zero):
+    path = tmp_path.joinpath("index.bin")
+    PepIndex.write(path, pep_zero)
+    index = PepIndex(path)
+    assert len(index) == len(pep_zero)
+    assert [pep.to_dict() for pep in index] == pep_zero
+    assert index[-1].to_dict() == pep_zero[-1]
+    assert index[0]["title"] == pep_zero[0]["title"]
+    assert index[0].get("number") == pep_zero[0]["number"]
+    with pytest.raises(IndexError):
+        index[len(pep_zero)]
+    index.close()
+
+
+def test_unknown_type_and_status(tmp_path):
+    peps = [
+        {"number": 1, "type": "Unknown", "status": "Odd", "title": "", "authors": []},
+        {
+            "number": 2,
+            "type": "Process",
+            "status": "Final",
+            "title": "T",
+            "authors": ["A", "A"],
+        },
+    ]
+    path = tmp_path.joinpath("index.bin")
+    PepIndex.write(path, peps)
+    index = PepIndex(path)
+    assert [pep.to_dict() for pep in index] == peps
+    index.close()
+
+
+def test_not_an_index(tmp_path):
+    path = tmp_path.joinpath("index.bin")
+    path.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        PepIndex(path)
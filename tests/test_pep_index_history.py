@@ -0,0 +1,69 @@
+import json
+
+from pepper_cli import PepIndexHistory
+
+
+def _pep(number, status="Draft", title=None, authors=("Someone",)):
+    return {
+        "number": number,
+        "type": "Standards Track",
+        "status": status,
+        "title": title or f"PEP {number}",
+        "authors": list(authors),
+    }
+
+
+def test_history_records_deltas(tmp_path):
+    history = PepIndexHistory(tmp_path.joinpath("history.jsonl"))
+    first = [_pep(1), _pep(2), _pep(3)]
+    assert history.record(first)
+    assert not history.record(first)  # nothing changed, nothing logged
+
+    second = [_pep(1, status="Final"), _pep(3, authors=["Someone", "Else"]), _pep(4)]
+    assert history.record(second)
+    deltas = [delta for _, _, delta in history.snapshots()]
+    assert len(deltas) == 2
+    assert set(deltas[0]["added"]) == {"1", "2", "3"}
+    assert deltas[1]["added"] == {
+        "4": ["Standards Track", "Draft", "PEP 4", ["Someone"]]
+    }
+    assert deltas[1]["changed"] == {
+        "1": {"status": "Final"},
+        "3": {"authors": ["Someone", "Else"]},
+    }
+    assert deltas[1]["removed"] == [2]
+
+    expected = {
+        pep["number"]: {field: pep[field] for field in PepIndexHistory.FIELDS}
+        for pep in second
+    }
+    assert history.state() == expected
+
+
+def test_history_diff_and_apply_are_inverse(pep_zero):
+    old = {
+        pep["number"]: {field: pep[field] for field in PepIndexHistory.FIELDS}
+        for pep in pep_zero[: len(pep_zero) // 2]
+    }
+    new = {
+        pep["number"]: {field: pep[field] for field in PepIndexHistory.FIELDS}
+        for pep in pep_zero[len(pep_zero) // 4 :]
+    }
+    new[pep_zero[-1]["number"]]["title"] = "Renamed"
+    state = json.loads(json.dumps(old, ensure_ascii=False))
+    state = {int(number): fields for number, fields in state.items()}
+    PepIndexHistory.apply(state, PepIndexHistory.diff(old, new))
+    assert state == new
+    assert PepIndexHistory.diff(new, new) == {}
+
+
+def test_history_skips_incomplete_line(tmp_path):
+    path = tmp_path.joinpath("history.jsonl")
+    history = PepIndexHistory(path)
+    history.record([_pep(1)])
+    with open(path, "a") as log:
+        log.write('{"time": 1, "added": {"2": ["Standards')  # interrupted write
+    assert list(history.state()) == [1]
+    # the next refresh is logged on a line of its own, and replays correctly
+    assert history.record([_pep(1), _pep(2)])
+    assert sorted(history.state()) == [1, 2]
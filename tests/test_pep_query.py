@@ -0,0 +1,47 @@
+import pytest
+
+from pepper_cli import PepIndex, PepQuery, QuerySyntaxError, filter_peps
+
+PEP_QUERIES = {
+    "status:Final": lambda pep: pep["status"] == "Final",
+    "type:S": lambda pep: pep["type"] == "Standards Track",
+    "status:A": lambda pep: pep["status"] in ("Accepted", "Active"),
+    "number:400-499": lambda pep: 400 <= pep["number"] <= 499,
+    "author:cannon": lambda pep: any("cannon" in x.lower() for x in pep["authors"]),
+    "author=Cannon": lambda pep: "cannon" in [x.lower() for x in pep["authors"]],
+    'title:"type*"': lambda pep: "type" in pep["title"].lower(),
+    "type:S status:Final": lambda pep: pep["type"] == "Standards Track"
+    and pep["status"] == "Final",
+    "status:Final OR status:Withdrawn": lambda pep: pep["status"]
+    in ("Final", "Withdrawn"),
+    "NOT status:Final": lambda pep: pep["status"] != "Final",
+    "-status:Final type:P": lambda pep: pep["status"] != "Final"
+    and pep["type"] == "Process",
+    "(status:Final OR status:Rejected) AND -author:stinner": lambda pep: pep["status"]
+    in ("Final", "Rejected")
+    and not any("stinner" in x.lower() for x in pep["authors"]),
+}
+
+
+@pytest.mark.parametrize("query", PEP_QUERIES)
+def test_pep_query(query, pep_zero):
+    expected = [pep for pep in pep_zero if PEP_QUERIES[query](pep)]
+    assert expected  # the fixtures should exercise every query
+    assert [pep for pep in pep_zero if PepQuery(query)(pep)] == expected
+
+
+def test_pep_query_over_pep_index(tmp_path, pep_zero):
+    path = tmp_path.joinpath("index.bin")
+    PepIndex.write(path, pep_zero)
+    index = PepIndex(path)
+    queries = list(PEP_QUERIES)
+    assert filter_peps(index, queries) == filter_peps(pep_zero, queries)
+    index.close()
+
+
+@pytest.mark.parametrize(
+    "query", ["", "(status:Final", "status:Final)", "colour:red", "number:x"]
+)
+def test_pep_query_syntax_errors(query):
+    with pytest.raises(QuerySyntaxError):
+        PepQuery(query)
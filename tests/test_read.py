@@ -0,0 +1,122 @@
+import html
+import re
+
+import pytest
+
+from fixtures import FIXTURES_DIR
+from pepper_cli import Commands, PepDocument, PepTextRenderer
+
+COLUMNS = 60
+
+
+@pytest.fixture
+def pep_8(monkeypatch) -> PepDocument:
+    monkeypatch.setenv("COLUMNS", str(COLUMNS))
+    return PepDocument(FIXTURES_DIR.joinpath("pep-0008.html").read_text("utf-8"))
+
+
+def _code_blocks(page: str) -> list:
+    """The text of every literal block on `page`, without the highlighting."""
+    return [
+        html.unescape(re.sub(r"<[^>]*>", "", code)).strip("\n").split("\n")
+        for code in re.findall(r"<pre>(.*?)</pre>", page, re.S)
+    ]
+
+
+def _render(markup: str) -> list:
+    renderer = PepTextRenderer()
+    renderer.feed(markup)
+    renderer.close()
+    return renderer.take_lines()
+
+
+def test_headings_are_underlined(pep_8):
+    lines = [line for section in pep_8.render() for line in section]
+    assert lines[:2] == ["PEP 8 – Style Guide for Python Code", "=" * 35]
+    for _, level, title, _ in pep_8.sections:
+        position = lines.index(title)
+        underline = PepTextRenderer.HEADINGS[f"h{level}"]
+        assert lines[position - 1] == ""
+        assert lines[position + 1] == underline * len(title)
+
+
+def test_paragraphs_are_wrapped(pep_8):
+    lines = [line for section in pep_8.render() for line in section]
+    code = {"    " + line for block in _code_blocks(pep_8.html) for line in block}
+    prose = [line for line in lines if line not in code]
+    assert all(len(line) <= COLUMNS or " " not in line for line in prose)
+    # and filled, rather than broken early
+    assert max(map(len, prose)) > COLUMNS - 10
+
+
+def test_literal_blocks_are_kept_as_they_are(pep_8):
+    lines = [line for section in pep_8.render() for line in section]
+    blocks = _code_blocks(pep_8.html)
+    assert len(blocks) == 5
+    for block in blocks:
+        indented = ["    " + line if line else "" for line in block]
+        starts = [
+            start
+            for start in range(len(lines))
+            if lines[start : start + len(indented)] == indented
+        ]
+        assert starts and all(lines[start - 1] == "" for start in starts)
+
+
+def test_render_markup():
+    markup = (
+        "<h3>Rationale<a class='headerlink' href='#r'>¶</a></h3>"
+        "<p>One <em>two</em>\n  three.</p>"
+        "<ul><li><p>first</p></li><li>second</li></ul>"
+        "<ol><li>one</li><li>two</li></ol>"
+        "<blockquote><p>quoted</p></blockquote>"
+        "<pre>if x &lt; 1:\n\tpass\n</pre>"
+    )
+    assert _render(markup) == [
+        "Rationale",
+        "---------",
+        "",
+        "One two three.",
+        "",
+        "- first",
+        "- second",
+        "",
+        "1. one",
+        "2. two",
+        "",
+        "    quoted",
+        "",
+        "    if x < 1:",
+        "            pass",
+    ]
+
+
+def test_render_from_a_section(pep_8):
+    position = pep_8.find("statement garbage")
+    assert pep_8.sections[position][:3] == ("section-6", 2, "Statement Garbage")
+    assert pep_8.find("section-6") == position
+    assert pep_8.find("no such section") is None
+
+    sections = [lines for lines in pep_8.render(position) if lines]
+    assert sections[0][:2] == ["Statement Garbage", "================="]
+    # the same text as the end of the whole PEP, bar the blank line before
+    text = "\n".join(line for lines in sections for line in lines)
+    everything = "\n".join(line for lines in pep_8.render() for line in lines)
+    assert everything.endswith("\n\n" + text)
+
+
+def test_read_without_a_tty(pepper_dir, pep_8, monkeypatch, capsys):
+    # text for a pipe is written out as it is, and never through the pager
+    marker = pepper_dir.joinpath("paged")
+    monkeypatch.setenv("PAGER", f"touch {marker}")
+    commands = Commands()
+    commands.__dict__["pepper_dir"] = pepper_dir
+    with pytest.raises(SystemExit) as exc_info:
+        commands.run_cmd("read", ["8"])
+    captured = capsys.readouterr()
+    assert exc_info.value.code == 0
+    assert not marker.exists()
+    assert captured.err == ""
+    assert captured.out == "".join(
+        "\n".join(lines) + "\n" for lines in pep_8.render() if lines
+    )
@@ -0,0 +1,73 @@
+import pytest
+
+from pepper_cli import RefGraph, _local_pep_paths
+
+
+@pytest.fixture
+def references(pepper_dir):
+    return {
+        number: RefGraph.references(path)
+        for number, path in _local_pep_paths(pepper_dir)
+    }
+
+
+@pytest.fixture
+def graph(tmp_path, references):
+    path = tmp_path.joinpath("refs-graph.bin")
+    RefGraph.build(path, references)
+    graph = RefGraph(path)
+    yield graph
+    graph.close()
+
+
+def test_round_trip(graph, references):
+    for number, (title, refs) in references.items():
+        assert graph.title(graph.find(number)) == title
+        assert sorted(
+            (depth, target, kind)
+            for depth, target, kind, _, _ in graph.traverse(number)
+        ) == [(1, target, RefGraph.KINDS[kind]) for target, kind in refs]
+
+
+def test_reverse(graph, references):
+    for number in references:
+        referrers = {
+            source for _, source, _, _, _ in graph.traverse(number, reverse=True)
+        }
+        assert referrers == {
+            source for source, (_, refs) in references.items() if number in dict(refs)
+        }
+
+
+def test_transitive(graph, references):
+    start = next(iter(references))
+    results = graph.traverse(start, transitive=True)
+    numbers = [number for _, number, _, _, _ in results]
+    assert len(numbers) == len(set(numbers)) and start not in numbers
+    depths = [depth for depth, _, _, _, _ in results]
+    assert depths == sorted(depths)  # breadth-first
+    reached = {start}
+    for depth, number, _, _, via in results:
+        assert via in reached
+        reached.add(number)
+
+
+def test_kinds(tmp_path):
+    path = tmp_path.joinpath("refs-graph.bin")
+    RefGraph.build(
+        path,
+        {
+            1: ("One", [(2, 1), (3, 0)]),
+            2: ("Two", [(4, 3)]),
+        },
+    )
+    graph = RefGraph(path)
+    assert graph.traverse(1, kinds=["requires"]) == [(1, 2, "requires", "Two", 1)]
+    assert graph.traverse(4, reverse=True, transitive=True) == [
+        (1, 2, "superseded-by", "Two", 4),
+        (2, 1, "requires", "One", 2),
+    ]
+    # PEPs only referred to are in the graph, without a title
+    assert graph.title(graph.find(3)) == ""
+    assert graph.find(5) is None and graph.traverse(5) == []
+    graph.close()
@@ -0,0 +1,69 @@
+import pytest
+
+from pepper_cli import SiteArchive, _precompress_site
+
+
+@pytest.fixture
+def site_dir(pepper_dir):
+    site_dir = pepper_dir.joinpath("peps", "peps-html")
+    site_dir.joinpath("_static").mkdir()
+    site_dir.joinpath("_static", "style.css").write_text("body { margin: 0 }\n")
+    site_dir.joinpath("_static", "py.png").write_bytes(bytes(range(256)))
+    site_dir.joinpath(".doctrees").mkdir()
+    site_dir.joinpath(".doctrees", "pep-0008.doctree").write_bytes(b"doctree")
+    _precompress_site(site_dir)
+    return site_dir
+
+
+def test_round_trip(tmp_path, site_dir):
+    path = tmp_path.joinpath("site.pack")
+    files = {
+        file.relative_to(site_dir).as_posix(): file.read_bytes()
+        for file in site_dir.rglob("*")
+        if file.is_file()
+        and file.suffix != ".gz"
+        and not file.relative_to(site_dir).as_posix().startswith(".")
+    }
+    assert SiteArchive.build(path, site_dir) == len(files)
+    archive = SiteArchive(path)
+    assert len(archive) == len(files)
+    for name, data in files.items():
+        entry = archive.find(name)
+        assert archive.read(entry) == data
+        assert archive.is_gzipped(entry) == name.endswith((".html", ".css"))
+    # the gzipped copies made for the local server are reused as they are
+    entry = archive.find("pep-0008.html")
+    assert archive.raw(entry) == site_dir.joinpath("pep-0008.html.gz").read_bytes()
+    archive.close()
+
+
+def test_hidden_and_gzipped_copies_are_left_out(tmp_path, site_dir):
+    path = tmp_path.joinpath("site.pack")
+    SiteArchive.build(path, site_dir)
+    archive = SiteArchive(path)
+    assert archive.find(".doctrees/pep-0008.doctree") is None
+    assert archive.find("pep-0008.html.gz") is None
+    assert archive.find("pep-9999.html") is None
+    archive.close()
+
+
+def test_etags_follow_contents(tmp_path, site_dir):
+    path = tmp_path.joinpath("site.pack")
+    SiteArchive.build(path, site_dir)
+    archive = SiteArchive(path)
+    first = archive.etag(archive.find("_static/style.css"))
+    assert first == archive.etag(archive.find("_static/style.css"))
+    archive.close()
+
+    site_dir.joinpath("_static", "style.css").write_text("body { margin: 1px }\n")
+    SiteArchive.build(path, site_dir)
+    archive = SiteArchive(path)
+    assert archive.etag(archive.find("_static/style.css")) != first
+    archive.close()
+
+
+def test_not_an_archive(tmp_path):
+    path = tmp_path.joinpath("site.pack")
+    path.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        SiteArchive(path)
@@ -0,0 +1,69 @@
+from pepper_cli import PepSourceHeaderParser
+
+HEADER = b"""\
+PEP: 8
+Title: Style Guide for Python Code
+Author: Guido van Rossum <guido@python.org>,
+        Barry Warsaw <barry@python.org>
+Status: Active
+Type: Process
+Created: 05-Jul-2001
+Post-History: `05-Jul-2001 <https://mail.python.org/a>`__,
+   `01-Aug-2013 <https://mail.python.org/b>`__
+"""
+
+EXPECTED = {
+    "raw_title": "PEP 8 – Style Guide for Python Code",
+    "title": "Style Guide for Python Code",
+    "number": "8",
+    "header": {
+        "Author": [
+            "Guido van Rossum <guido at python.org>",
+            "Barry Warsaw <barry at python.org>",
+        ],
+        "Status": "Active",
+        "Type": "Process",
+        "Created": "05-Jul-2001",
+        "Post-History": ["05-Jul-2001", "01-Aug-2013"],
+    },
+}
+
+
+def _read(tmp_path, source: bytes) -> bytes:
+    path = tmp_path.joinpath("pep-0008.rst")
+    path.write_bytes(source)
+    return PepSourceHeaderParser.read_header(path)
+
+
+def test_continuation_lines(tmp_path):
+    source = HEADER + b"\n\nAbstract\n========\n\nThis PEP: a style guide.\n"
+    assert _read(tmp_path, source) == HEADER
+    assert PepSourceHeaderParser.parse(source) == EXPECTED
+
+
+def test_missing_blank_line(tmp_path):
+    # the header ends at the first line that isn't a field, blank or not
+    source = HEADER + b"Abstract\n========\n\nThis PEP: a style guide.\n"
+    assert _read(tmp_path, source) == HEADER
+    assert PepSourceHeaderParser.parse(source) == EXPECTED
+
+
+def test_header_after_a_comment(tmp_path):
+    source = (
+        b"\n.. This file is generated, edit: the template instead\n"
+        b"   (see the README).\n\n"
+        b"..\n   Another: comment\n\n" + HEADER + b"\nAbstract\n========\n"
+    )
+    assert _read(tmp_path, source) == HEADER
+    assert PepSourceHeaderParser.parse(source) == EXPECTED
+
+
+def test_crlf_line_endings(tmp_path):
+    source = HEADER.replace(b"\n", b"\r\n") + b"\r\nAbstract\r\n"
+    assert PepSourceHeaderParser.parse(_read(tmp_path, source)) == EXPECTED
+
+
+def test_no_header(tmp_path):
+    assert _read(tmp_path, b"Abstract\n========\n\nText: here.\n") == b""
+    parsed = PepSourceHeaderParser.parse(b"")
+    assert parsed == {"raw_title": "PEP 0 – ", "title": "", "number": "0", "header": {}}
@@ -0,0 +1,121 @@
+import json
+import re
+import sys
+
+import pytest
+
+import pepper_cli
+from pepper_cli import Tracer
+
+ELAPSED = r"\[trace \+\d+\.\dms\] "
+
+
+def _tracer(mode: str) -> Tracer:
+    tracer = Tracer()
+    tracer.enable(mode)
+    tracer.record("connect", 0.0123, host="peps.python.org")
+    tracer.record("body", 0.5, bytes=2048, status=200)
+    tracer.record("body", 0.25, bytes=1024)
+    tracer.cache("http", "hit", url="/pep-0008/")
+    tracer.cache("http", "miss")
+    tracer.cache("page", "local", pep="8")
+    return tracer
+
+
+def test_disabled_is_silent(capsys):
+    tracer = Tracer()
+    tracer.record("connect", 0.1)
+    with tracer.phase("parse") as fields:
+        fields["status"] = 200
+    tracer.cache("http", "hit")
+    tracer.summary()
+    assert capsys.readouterr().err == ""
+
+
+def test_text(capsys):
+    _tracer("1").summary()
+    lines = capsys.readouterr().err.splitlines()
+    patterns = [
+        "connect     12.30ms host=peps.python.org",
+        "body       500.00ms bytes=2048 status=200",
+        "body       250.00ms bytes=1024",
+        "cache               cache=http result=hit url=/pep-0008/",
+        "cache               cache=http result=miss",
+        "cache               cache=page result=local pep=8",
+    ]
+    assert len(lines) == len(patterns) + 5
+    for line, pattern in zip(lines, patterns):
+        assert re.fullmatch(ELAPSED + re.escape(pattern), line), line
+    assert re.fullmatch(r"\[trace\] total \d+\.\d\dms", lines[6])
+    assert lines[7:] == [
+        "[trace]   connect    1 x     12.30ms",
+        "[trace]   body       2 x    750.00ms       3072 bytes",
+        "[trace]   cache http: 1 hit, 1 miss",
+        "[trace]   cache page: 1 local",
+    ]
+
+
+def test_json(capsys):
+    _tracer("json").summary()
+    records = [json.loads(line) for line in capsys.readouterr().err.splitlines()]
+    summary = records.pop()["summary"]
+    for record in records:
+        assert record.pop("t") >= 0
+    assert records == [
+        {"phase": "connect", "ms": 12.3, "host": "peps.python.org"},
+        {"phase": "body", "ms": 500.0, "bytes": 2048, "status": 200},
+        {"phase": "body", "ms": 250.0, "bytes": 1024},
+        {"event": "cache", "cache": "http", "result": "hit", "url": "/pep-0008/"},
+        {"event": "cache", "cache": "http", "result": "miss"},
+        {"event": "cache", "cache": "page", "result": "local", "pep": "8"},
+    ]
+    assert summary.pop("total_ms") >= 0
+    assert summary == {
+        "phases": {
+            "connect": {"count": 1, "ms": 12.3, "bytes": 0},
+            "body": {"count": 2, "ms": 750.0, "bytes": 3072},
+        },
+        "cache": {"http": {"hit": 1, "miss": 1}, "page": {"local": 1}},
+    }
+
+
+def test_phase_fields(capsys):
+    tracer = Tracer()
+    tracer.enable("json")
+    with tracer.phase("ttfb", host="localhost") as fields:
+        fields["status"] = 304
+    (record,) = [json.loads(line) for line in capsys.readouterr().err.splitlines()]
+    assert record["phase"] == "ttfb" and record["ms"] >= 0
+    assert (record["host"], record["status"]) == ("localhost", 304)
+
+
+def test_invalid_mode(capsys):
+    with pytest.raises(SystemExit) as exc_info:
+        Tracer().enable("yaml")
+    assert exc_info.value.code == 1
+    assert "Invalid trace mode 'yaml'" in capsys.readouterr().err
+
+
+def test_trace_a_command(tmp_path_factory, pepper_dir, monkeypatch, capsys):
+    home = tmp_path_factory.mktemp("home")
+    home.joinpath(".pepper").symlink_to(pepper_dir)
+    monkeypatch.setenv("HOME", str(home))
+    monkeypatch.delenv("PEPPER_TRACE", raising=False)
+    monkeypatch.setattr(pepper_cli, "TRACE", Tracer())
+    monkeypatch.setattr(sys, "argv", ["pepper", "--trace=json", "read", "8"])
+    with pytest.raises(SystemExit) as exc_info:
+        pepper_cli.main()
+    assert exc_info.value.code == 0
+    captured = capsys.readouterr()
+    assert captured.out.startswith("PEP 8 – Style Guide for Python Code\n")
+    records = [json.loads(line) for line in captured.err.splitlines()]
+    summary = records.pop()["summary"]
+    assert {"event": "cache", "cache": "page", "result": "local", "pep": "8"} in [
+        {key: value for key, value in record.items() if key != "t"}
+        for record in records
+    ]
+    assert summary["phases"]["load"]["count"] == 1
+    assert summary["phases"]["render"]["count"] == len(
+        [record for record in records if record.get("phase") == "render"]
+    )
+    assert summary["cache"] == {"page": {"local": 1}}
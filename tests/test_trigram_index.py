@@ -0,0 +1,43 @@
+import pytest
+
+from pepper_cli import PepIndex, TrigramIndex
+
+
+@pytest.fixture
+def trigrams(tmp_path, pep_zero):
+    path = tmp_path.joinpath("fuzzy-index.bin")
+    full_names = {1: ["Victor Stinner", "Steve Dower"]}
+    TrigramIndex.build(path, pep_zero, full_names)
+    index = TrigramIndex(path)
+    yield index
+    index.close()
+
+
+def test_trigram_round_trip(trigrams, pep_zero):
+    # full names are only searched, the PEPs are kept as PEP 0 lists them
+    assert [trigrams.pep(position) for position in range(len(pep_zero))] == pep_zero
+
+
+def test_trigram_search_tolerates_typos(trigrams, pep_zero):
+    pep = next(pep for pep in pep_zero if pep["number"] == 484)
+    typo = pep["title"].lower().replace("type", "tpye")
+    results = trigrams.search(typo, cutoff=0.5, limit=5)
+    assert pep["number"] in [indexed["number"] for _, indexed in results]
+    assert results == sorted(results, key=lambda result: -result[0])
+
+
+def test_trigram_search_full_names(trigrams):
+    results = trigrams.search("victor", cutoff=0.9, limit=1000)
+    assert 1 in [pep["number"] for _, pep in results]
+
+
+def test_trigram_index_from_pep_index(tmp_path, pep_zero):
+    index_path = tmp_path.joinpath("index.bin")
+    PepIndex.write(index_path, pep_zero)
+    peps = PepIndex(index_path)
+    path = tmp_path.joinpath("fuzzy-index.bin")
+    TrigramIndex.build(path, peps, {})
+    peps.close()
+    index = TrigramIndex(path)
+    assert index.pep(0)["title"] == pep_zero[0]["title"]
+    index.close()